@@ -1,21 +1,51 @@
 # This file can be empty 
 
-from flask import Flask # type: ignore
+import atexit
+import time
+from flask import Flask, g, request # type: ignore
 from app.api.endpoints import ultravox
+from app.api.services import check_stream_settings
 from app.core.config import settings
-import logging
+from app.utils.logger import setup_logging
+from app.utils.metrics import observe_request
+from app.utils.transport import http_clients
 
 def create_app():
-    """Create and configure the Flask application."""
+    """
+    Create and configure the Flask application.
+
+    Raises:
+        RuntimeError: If MEDIA_RELAY_ENABLED is set; the relay's WebSocket
+            endpoint is only served by the ASGI app
+    """
+    if settings.MEDIA_RELAY_ENABLED:
+        raise RuntimeError(
+            "MEDIA_RELAY_ENABLED=true needs the ASGI app (asgi:app), which serves /media/relay; "
+            "the Flask app would point every call's stream at a missing endpoint"
+        )
     app = Flask(__name__)
     
     # Configure logging
-    logging.basicConfig(
-        level=getattr(logging, settings.LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    setup_logging()
+    check_stream_settings()
+    
+    # Close the pooled upstream connections when the worker exits
+    atexit.register(http_clients.close)
     
     # Register blueprints
     app.register_blueprint(ultravox.router, url_prefix='')
     
+    # Time every request into http_request_duration_seconds by route template
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_duration(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe_request(request.method, endpoint, response.status_code, time.perf_counter() - start)
+        return response
+    
     return app 
\ No newline at end of file
@@ -1,19 +1,119 @@
 
 
-from fastapi import APIRouter, Request, Depends, Form # type: ignore
+import asyncio
+import time
+import uuid
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Depends, Form, Query # type: ignore
 from fastapi.responses import PlainTextResponse # type: ignore
-from typing import Optional
+from typing import AsyncIterator, Dict, Optional, Tuple
 
-from app.services.openai_service import generate_ai_response
+from app.core.config import settings
+from app.services.openai_service import (
+    FALLBACK_RESPONSE, generate_ai_response, get_cache_stats, stream_ai_response, warm_response_cache
+)
 from app.services.plivo_service import PlivoService
+from app.services import plivo_xml
+from app.api.services import conversations, plivo_service
 from app.utils.logger import get_logger
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+VOICE_SYSTEM_PROMPT = "You are a helpful voice assistant. Keep your responses concise and natural for voice."
+GREETING_PROMPT = "Greet the caller and ask how you can help them today."
+CONTINUE_PROMPT = "Continue your last answer from where it stopped, without repeating what you already said."
+
+# How long a generated remainder waits for Plivo to fetch it before it is dropped
+CONTINUATION_TTL = 60.0
+
+# Pending rest of a streamed response, keyed by CallUUID: (turn token, task
+# generating the remaining sentences, prompt, first sentence). The caller's
+# words stay here; the redirect URL only carries the opaque token.
+_continuations: Dict[str, Tuple[str, "asyncio.Task[str]", str, str]] = {}
+
 # Dependencies
-def get_plivo_service():
-    return PlivoService()
+def get_plivo_service() -> PlivoService:
+    return plivo_service
+
+def _remember_turn(call_uuid: str, prompt: str, answer: str):
+    conversations.add(call_uuid, "user", prompt)
+    if answer != FALLBACK_RESPONSE:
+        conversations.add(call_uuid, "assistant", answer)
+
+async def _collect_remaining(call_uuid: str, prompt: str, first_sentence: str,
+                             sentences: AsyncIterator[str]) -> str:
+    parts = []
+    try:
+        async for sentence in sentences:
+            parts.append(sentence)
+    except asyncio.CancelledError:
+        _remember_turn(call_uuid, prompt, " ".join([first_sentence, *parts]))
+        raise
+    # Recorded once the whole answer is known, so the next turn sees all of it.
+    # On failure the continuation regenerates the rest and records the turn instead
+    _remember_turn(call_uuid, prompt, " ".join([first_sentence, *parts]))
+    return " ".join(parts)
+
+def _drop_continuation(call_uuid: str, turn: str):
+    pending = _continuations.get(call_uuid)
+    if pending is not None and pending[0] == turn:
+        del _continuations[call_uuid]
+        pending[1].cancel()
+
+def _continuation_url(turn: str) -> str:
+    """
+    Public URL of the continuation endpoint for one streamed turn.
+
+    Built from BASE_URL rather than the request, which behind a TLS-terminating
+    proxy has the internal http:// address. It only carries the turn token;
+    what the caller said never goes into a URL that Plivo and proxies log.
+    """
+    return f"{settings.BASE_URL}{settings.PLIVO_ROUTER_PREFIX}/webhook/continue?{urlencode({'turn': turn})}"
+
+async def _regenerate_remaining(call_uuid: str, prompt: str, first_sentence: str) -> str:
+    """Generate the rest of an answer whose streamed remainder failed."""
+    history = conversations.messages(call_uuid) + [
+        {"role": "user", "content": prompt},
+        {"role": "assistant", "content": first_sentence}
+    ]
+    remaining = await generate_ai_response(CONTINUE_PROMPT, VOICE_SYSTEM_PROMPT, history=history)
+    _remember_turn(call_uuid, prompt, f"{first_sentence} {remaining}")
+    return remaining
+
+async def _speak_streamed(call_uuid: str, prompt: str, plivo_service: PlivoService, start_time: float) -> str:
+    """
+    Speak the first sentence of a streamed response right away.
+
+    The returned XML speaks the first sentence and redirects Plivo to the
+    continuation endpoint, which serves the rest of the response once it has
+    finished generating - usually before the first sentence is done playing.
+    """
+    sentences = stream_ai_response(prompt, VOICE_SYSTEM_PROMPT, history=conversations.messages(call_uuid))
+    try:
+        first_sentence = await sentences.__anext__()
+    except StopAsyncIteration:
+        conversations.add(call_uuid, "user", prompt)
+        return plivo_service.generate_speak_xml("I'm sorry, I didn't catch that.")
+
+    time_to_first_audio = time.perf_counter() - start_time
+    logger.info("Time to first audio for call %s: %.0fms", call_uuid, time_to_first_audio * 1000)
+
+    loop = asyncio.get_running_loop()
+    task = loop.create_task(_collect_remaining(call_uuid, prompt, first_sentence, sentences))
+    turn = uuid.uuid4().hex
+    previous = _continuations.get(call_uuid)
+    if previous is not None:
+        previous[1].cancel()
+    _continuations[call_uuid] = (turn, task, prompt, first_sentence)
+    loop.call_later(CONTINUATION_TTL, _drop_continuation, call_uuid, turn)
+
+    return plivo_service.generate_speak_xml(first_sentence, redirect_url=_continuation_url(turn))
+
+@router.on_event("startup")
+async def warm_greetings():
+    """Pre-generate greeting variants so answered calls skip the LLM round trip."""
+    asyncio.get_running_loop().create_task(warm_response_cache(GREETING_PROMPT, VOICE_SYSTEM_PROMPT))
 
 @router.post("/webhook", response_class=PlainTextResponse)
 async def handle_plivo_webhook(
@@ -29,32 +129,80 @@ async def handle_plivo_webhook(
     This endpoint receives events when a call is answered, text is received, etc.
     """
     try:
-        logger.info(f"Received Plivo webhook: CallUUID={CallUUID}, From={From}, To={To}")
-        
+        start_time = time.perf_counter()
+        logger.info("Received Plivo webhook: CallUUID=%s, From=%s, To=%s", CallUUID, From, To)
+
         # If we received speech-to-text
         if Text:
-            logger.info(f"Received text from caller: {Text}")
-            
-            # Generate AI response
+            logger.info("Received text from caller: %s", Text)
+
+            if settings.OPENAI_STREAMING:
+                return await _speak_streamed(CallUUID, Text, plivo_service, start_time)
+
+            # Generate AI response with the call's earlier turns
             ai_response = await generate_ai_response(
-                Text,
-                "You are a helpful voice assistant. Keep your responses concise and natural for voice."
+                Text, VOICE_SYSTEM_PROMPT, history=conversations.messages(CallUUID)
             )
-            
+            logger.info("Time to first audio for call %s: %.0fms", CallUUID, (time.perf_counter() - start_time) * 1000)
+            _remember_turn(CallUUID, Text, ai_response)
+
             # Return Plivo XML to speak the response
             return plivo_service.generate_speak_xml(ai_response)
-        
+
         # Initial answer - welcome message
-        welcome_message = await generate_ai_response(
-            "Greet the caller and ask how you can help them today.",
-            "You are a helpful voice assistant. Keep your responses concise and natural for voice."
-        )
-        
+        welcome_message = await generate_ai_response(GREETING_PROMPT, VOICE_SYSTEM_PROMPT)
+        if welcome_message != FALLBACK_RESPONSE:
+            conversations.add(CallUUID, "assistant", welcome_message)
+
         return plivo_service.generate_speak_xml(welcome_message)
-        
+
     except Exception as e:
-        logger.error(f"Error handling Plivo webhook: {str(e)}")
+        logger.error("Error handling Plivo webhook: %s", str(e))
         # Return a simple response in case of error
-        return plivo_service.generate_speak_xml(
-            "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        ) 
\ No newline at end of file
+        return PlainTextResponse(plivo_xml.speak_document(plivo_xml.ERROR_SPEECH))
+
+@router.post("/webhook/continue", response_class=PlainTextResponse)
+async def handle_plivo_continuation(
+    CallUUID: str = Form(...),
+    turn: Optional[str] = Query(None),
+    plivo_service: PlivoService = Depends(get_plivo_service)
+):
+    """
+    Speak the rest of a streamed response once the first sentence has played.
+
+    If generating the remainder failed, the rest is generated again from the
+    turn's prompt and first sentence, which are kept with the pending task.
+    When this worker holds no remainder for the turn (another worker streamed
+    it, or it expired), a short fallback is spoken rather than ending the
+    turn in silence.
+    """
+    pending = _continuations.get(CallUUID)
+    if pending is None or pending[0] != turn:
+        logger.warning("No pending continuation for call %s", CallUUID)
+        return plivo_service.generate_speak_xml(FALLBACK_RESPONSE)
+    del _continuations[CallUUID]
+
+    _, task, prompt, spoken = pending
+    try:
+        remaining = await asyncio.wait_for(task, timeout=settings.UPSTREAM_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error("Timed out finishing streamed response for call %s", CallUUID)
+        remaining = FALLBACK_RESPONSE
+    except Exception as e:
+        logger.error("Error finishing streamed response for call %s, generating the rest again: %s",
+                     CallUUID, str(e))
+        remaining = await _regenerate_remaining(CallUUID, prompt, spoken)
+
+    if not remaining:
+        return plivo_xml.response()
+    return plivo_service.generate_speak_xml(remaining)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Report hit-rate metrics for the AI response cache."""
+    return get_cache_stats()
+
+@router.get("/conversations/stats")
+async def conversation_stats():
+    """Report per-call conversation memory: calls held, history size and summarization counts."""
+    return conversations.stats()
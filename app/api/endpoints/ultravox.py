@@ -1,17 +1,23 @@
-from flask import Blueprint, request, Response, jsonify, render_template # type: ignore
-from app.services.plivo_service import PlivoService
-from app.services.ultravox_service import UltravoxService
-from app.core.config import settings
+"""
+Legacy Flask routes. The FastAPI router in ultravox_async.py is the
+implementation; these views only parse the Flask request and call the
+same handlers in app/api/services.py.
+"""
+from flask import Blueprint, request, Response, render_template # type: ignore
+from app.services.campaign_service import parse_csv_numbers
+from app.services.event_ingestion import ULTRAVOX_EVENT, STREAM_EVENT
+from app.api.services import (
+    InitiationRequest, STATS_ROUTES, call_initiator, handle_initiate_call, handle_initiation_status,
+    handle_get_call, handle_create_campaign, handle_list_campaigns, handle_get_campaign,
+    handle_cancel_campaign, handle_webhook, handle_answer, handle_call_status
+)
+from app.utils import metrics
 import logging
-import json
 import time
 
 logger = logging.getLogger(__name__)
 router = Blueprint('ultravox', __name__)
 
-plivo_service = PlivoService()
-ultravox_service = UltravoxService()
-
 # Index page route
 @router.route("/", methods=["GET"])
 def index():
@@ -24,184 +30,111 @@ def initiate_call():
     """
     Initiate a call with dynamic number handling.
     Can be called via GET or POST, and can accept to_number parameter.
+    Pass mode=async to get a 202 with a tracking id instead of waiting
+    for the Ultravox and Plivo round trips, stream_content_type to
+    pick the audio format of this call's Plivo stream, and profile to
+    pick the agent profile. Duplicates of an initiation, by Idempotency-Key
+    header (or idempotency_key) or by identical parameters within
+    IDEMPOTENCY_WINDOW, share its response instead of dialing again.
     """
     start_time = time.time()
     logger.info("Call initiation requested")
-    
-    # Extract to_number from query parameters, form, or JSON body
-    to_number = None
+
+    fields = body = None
     if request.method == "POST":
         if request.is_json:
-            to_number = request.json.get("to_number")
+            body = request.json or {}
         else:
-            to_number = request.form.get("to_number")
-    else:  # GET
-        to_number = request.args.get("to_number")
-    
-    # Use the provided number or fall back to settings
-    target_number = to_number or settings.TO_NUMBER
-    
-    logger.info(f"Target phone number: {target_number}")
-    
+            fields = request.form
     try:
-        logger.info("Creating Ultravox call...")
-        ultravox_data = ultravox_service.create_call()
-        
-        if not isinstance(ultravox_data, dict):
-            logger.error(f"Unexpected response format: {ultravox_data}")
-            raise ValueError(f"Unexpected response format: {ultravox_data}")
-            
-        join_url = ultravox_data.get("joinUrl")
-        if not join_url:
-            logger.error("No joinUrl in Ultravox response")
-            raise ValueError("No joinUrl in response")
-            
-        logger.info(f"Ultravox joinUrl retrieved successfully")
-        logger.debug(f"Join URL: {join_url}")
-
-        plivo_response = plivo_service.create_call(join_url, to_number=target_number)
-        logger.info(f"Call initiated with Plivo, request_uuid={plivo_response['request_uuid']}")
-
-        # Calculate processing time
-        elapsed_time = time.time() - start_time
-        logger.info(f"Call initiation completed in {elapsed_time:.2f} seconds")
-
-        return {
-            "message": "Call initiated successfully",
-            "plivo_call_uuid": plivo_response["request_uuid"],
-            "to_number": settings.TO_NUMBER,
-            "elapsed_time": f"{elapsed_time:.2f}s"
-        }, 200
-
-    except Exception as e:
-        elapsed_time = time.time() - start_time
-        logger.exception(f"Error during initiate_call (after {elapsed_time:.2f}s)")
-        return {"error": str(e), "elapsed_time": f"{elapsed_time:.2f}s"}, 500
+        params = InitiationRequest(request.args, fields, body, request.headers.get("Idempotency-Key"))
+    except ValueError as e:
+        return {"error": str(e)}, 400
 
-@router.route("/webhook", methods=["POST"])
-def webhook():
-    """Handle real-time events from Ultravox and Plivo stream events."""
+    # The initiation runs on the background loop; this worker thread waits for it
+    return call_initiator.loop.run(handle_initiate_call(params, start_time))
+
+@router.route("/initiate_call/<tracking_id>", methods=["GET"])
+def initiate_call_status(tracking_id):
+    """Poll the outcome of an async call initiation."""
+    return handle_initiation_status(tracking_id)
+
+for path, report in STATS_ROUTES.items():
+    router.add_url_rule(path, view_func=report, methods=["GET"])
+
+@router.route("/calls/<call_id>", methods=["GET"])
+def get_registered_call(call_id):
+    """Look a call up by Plivo request_uuid or CallUUID, Ultravox call id or joinUrl."""
+    return handle_get_call(call_id)
+
+@router.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Expose request and stage timing histograms in Prometheus text format."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@router.route("/campaigns", methods=["POST"])
+def create_campaign():
+    """
+    Start a dialing campaign.
+    Accepts a JSON body with a "numbers" list, a CSV file upload in the
+    "file" form field, or a raw text/csv body.
+    """
     try:
-        # Track processing time
-        start_time = time.time()
-        logger.info("Webhook event received")
-        
-        # Check if it's a JSON request (Ultravox event)
+        name = request.args.get("name")
         if request.is_json:
-            data = request.json
-            logger.info(f"Received webhook data (JSON)")
-            logger.debug(f"Webhook JSON data: {json.dumps(data, indent=2)}")
-            
-            # Process Ultravox events
-            if "type" in data:
-                event_type = data.get("type")
-                logger.info(f"Ultravox event type: {event_type}")
-                
-                if event_type == "transcription":
-                    text = data.get("text", "")
-                    logger.info(f"User said: {text}")
-                    
-                    # Get response templates
-                    templates = settings.get_response_templates()
-                    
-                    # Create a response based on user's text
-                    lower_text = text.lower()
-                    if any(greeting in lower_text for greeting in ["hello", "hi", "hey"]):
-                        response_text = templates["greeting"]
-                    elif "weather" in lower_text:
-                        response_text = templates["weather"]
-                    elif "name" in lower_text:
-                        response_text = templates["name"]
-                    elif any(bye in lower_text for bye in ["bye", "goodbye", "see you"]):
-                        response_text = templates["goodbye"]
-                    else:
-                        response_text = templates["default"].format(text=text)
-                    
-                    logger.info(f"AI response: {response_text}")
-                    
-                elif event_type == "call.ended":
-                    reason = data.get("reason", "unknown")
-                    logger.info(f"Call ended. Reason: {reason}")
-            
-            # Calculate and log processing time
-            elapsed_time = time.time() - start_time
-            logger.info(f"Webhook processed in {elapsed_time:.2f} seconds")
-            return {"status": "success", "processing_time": f"{elapsed_time:.2f}s"}, 200
-        
-        # If it's not JSON, it might be a Plivo stream event
+            body = request.json or {}
+            if not isinstance(body, dict):
+                raise ValueError("Expected a JSON object")
+            numbers = body.get("numbers", [])
+            name = body.get("name", name)
+        elif "file" in request.files:
+            numbers = parse_csv_numbers(request.files["file"].read().decode("utf-8-sig"))
+            name = request.form.get("name", name)
         else:
-            form_data = request.form.to_dict()
-            logger.info(f"Received form data webhook")
-            logger.debug(f"Form data: {form_data}")
-            
-            # Process Plivo stream events
-            event = form_data.get("event")
-            if event:
-                logger.info(f"Plivo stream event: {event}")
-                
-                if event == "stream.start":
-                    logger.info("Audio streaming has started!")
-                elif event == "stream.end":
-                    logger.info("Audio streaming has ended!")
-                    
-            # Calculate and log processing time
-            elapsed_time = time.time() - start_time
-            logger.info(f"Form webhook processed in {elapsed_time:.2f} seconds")
-            return {"status": "success", "processing_time": f"{elapsed_time:.2f}s"}, 200
-            
-    except Exception as e:
-        logger.error(f"Webhook error: {str(e)}")
-        return {"error": str(e)}, 500
+            numbers = parse_csv_numbers(request.get_data(as_text=True))
+    except (ValueError, UnicodeDecodeError) as e:
+        return {"error": str(e)}, 400
+
+    return handle_create_campaign(numbers, name)
+
+@router.route("/campaigns", methods=["GET"])
+def list_campaigns():
+    """List campaigns with their progress."""
+    return handle_list_campaigns()
+
+@router.route("/campaigns/<campaign_id>", methods=["GET"])
+def get_campaign(campaign_id):
+    """Report progress and throughput for a campaign."""
+    return handle_get_campaign(campaign_id, request.args.get("results"))
+
+@router.route("/campaigns/<campaign_id>/cancel", methods=["POST"])
+def cancel_campaign(campaign_id):
+    """Stop dialing the remaining targets of a campaign."""
+    return handle_cancel_campaign(campaign_id)
+
+@router.route("/webhook", methods=["POST"])
+def webhook():
+    """Handle real-time events from Ultravox and Plivo stream events."""
+    start_time = time.time()
+    logger.debug("Webhook event received")
+
+    # JSON is an Ultravox event, form data a Plivo stream event
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {"error": "Expected a JSON object"}, 400
+        return handle_webhook(ULTRAVOX_EVENT, data, start_time)
+    return handle_webhook(STREAM_EVENT, request.form.to_dict(), start_time)
 
 @router.route("/answer_url", methods=["GET", "POST"])
 def answer_url():
     """Handle the initial call setup."""
-    try:
-        start_time = time.time()
-        logger.info("Answer URL called")
-        
-        # Get join URL from query parameters
-        join_url = request.args.get("join_url", "")
-        if not join_url:
-            logger.error("No join_url provided in answer_url request")
-            return Response("Error: No join URL provided", status=400)
-            
-        logger.info(f"Generating answer XML for join URL")
-        logger.debug(f"Join URL: {join_url}")
-        
-        # Generate XML response
-        xml_str = plivo_service.generate_answer_xml(join_url)
-        
-        # Calculate processing time
-        elapsed_time = time.time() - start_time
-        logger.info(f"Answer URL processed in {elapsed_time:.2f} seconds")
-        
-        return Response(xml_str, mimetype="text/xml")
-    except Exception as e:
-        logger.error(f"Error in answer_url: {str(e)}")
-        return Response(f"<Response><Speak>Error: {str(e)}</Speak></Response>", 
-                     mimetype="text/xml")
+    start_time = time.time()
+    logger.info("Answer URL called")
+    return handle_answer(request.args.get("join_url", ""), request.values,
+                         request.args.get("content_type"), start_time)
 
 @router.route("/call_status", methods=["POST"])
 def call_status():
     """Handle Plivo call status updates."""
-    try:
-        start_time = time.time()
-        data = request.form.to_dict()
-        logger.info(f"Call status update received")
-        logger.debug(f"Call status data: {data}")
-        
-        # Extract useful status information
-        call_uuid = data.get("CallUUID", "unknown")
-        call_status = data.get("CallStatus", "unknown")
-        
-        logger.info(f"Call {call_uuid} status: {call_status}")
-        
-        # Calculate processing time
-        elapsed_time = time.time() - start_time
-        logger.info(f"Call status processed in {elapsed_time:.2f} seconds")
-        
-        return {"status": "success", "call_status": call_status}, 200
-    except Exception as e:
-        logger.error(f"Call status error: {str(e)}")
-        return {"error": str(e)}, 500 
\ No newline at end of file
+    return handle_call_status(request.form.to_dict(), time.time())
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Tuple
+from fastapi import APIRouter, Request, WebSocket # type: ignore
+from fastapi.responses import JSONResponse, Response # type: ignore
+from fastapi.templating import Jinja2Templates # type: ignore
+from starlette.datastructures import UploadFile # type: ignore
+
+from app.utils import metrics
+from app.services.campaign_service import parse_csv_numbers
+from app.services.event_ingestion import ULTRAVOX_EVENT, STREAM_EVENT
+from app.api.services import (
+    InitiationRequest, STATS_ROUTES, media_relay, handle_initiate_call, handle_initiation_status,
+    handle_get_call, handle_create_campaign, handle_list_campaigns, handle_get_campaign,
+    handle_cancel_campaign, handle_webhook, handle_answer, handle_call_status, inline_ingestion
+)
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates"))
+
+def _json(result: Tuple) -> JSONResponse:
+    """Turn a Flask-style (body, status[, headers]) tuple into a JSONResponse."""
+    body, status, *rest = result
+    return JSONResponse(body, status_code=status, headers=rest[0] if rest else None)
+
+def _text(result: Tuple) -> Response:
+    """Turn a (text, status, headers) tuple into a plain Response."""
+    body, status, headers = result
+    return Response(body, status_code=status, headers=headers)
+
+def _is_json(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type == "application/json" or content_type.endswith("+json")
+
+async def _ingest(handler: Callable[..., Tuple], *args: Any) -> Tuple:
+    """Run a webhook handler, in a worker thread when it processes the event inline."""
+    if inline_ingestion():
+        return await asyncio.to_thread(handler, *args)
+    return handler(*args)
+
+async def _json_object(request: Request) -> Dict[str, Any]:
+    """
+    Parse a JSON request body that must be an object.
+
+    Raises:
+        ValueError: If the body is not valid JSON or not an object
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        raise ValueError("Invalid JSON body")
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data
+
+@router.get("/")
+async def index(request: Request):
+    """Render the home page with call button."""
+    logger.info("Rendering index page")
+    return templates.TemplateResponse(request, "index.html")
+
+@router.api_route("/initiate_call", methods=["GET", "POST"])
+async def initiate_call(request: Request):
+    """
+    Initiate a call with dynamic number handling.
+    Accepts to_number, mode=async, stream_content_type, profile,
+    idempotency_key (or an Idempotency-Key header) and, in a JSON body,
+    the per-call agent overrides. The Ultravox and Plivo legs run on the
+    background loop, so the worker keeps serving other requests;
+    duplicates await the initiation already in flight.
+    """
+    start_time = time.time()
+    logger.info("Call initiation requested")
+
+    fields = body = None
+    try:
+        if request.method == "POST":
+            if _is_json(request):
+                body = await _json_object(request)
+            else:
+                fields = await request.form()
+        params = InitiationRequest(request.query_params, fields, body, request.headers.get("idempotency-key"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return _json(await handle_initiate_call(params, start_time))
+
+@router.get("/initiate_call/{tracking_id}")
+async def initiate_call_status(tracking_id: str):
+    """Poll the outcome of an async call initiation."""
+    return _json(handle_initiation_status(tracking_id))
+
+# Registered before /calls/{call_id:path}, which would otherwise match /calls/stats
+for path, report in STATS_ROUTES.items():
+    router.add_api_route(path, report, methods=["GET"])
+
+@router.get("/calls/{call_id:path}")
+async def get_registered_call(call_id: str):
+    """Look a call up by Plivo request_uuid or CallUUID, Ultravox call id or joinUrl."""
+    # A miss falls back to SQLite, kept off the event loop
+    return _json(await asyncio.to_thread(handle_get_call, call_id))
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Expose request and stage timing histograms in Prometheus text format."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.websocket("/media/relay")
+async def media_relay_socket(websocket: WebSocket, join_url: str = "", content_type: str = ""):
+    """Bridge Plivo's bidirectional audio stream to the call's Ultravox joinUrl."""
+    await websocket.accept()
+    if not join_url:
+        logger.error("No join_url provided for media relay")
+        await websocket.close(code=1008)
+        return
+    await media_relay.bridge(websocket, join_url, content_type or None)
+
+@router.get("/media/stats")
+async def media_stats():
+    """Report per-stream frame, loss, jitter and latency statistics of the media relay."""
+    return media_relay.stats()
+
+@router.get("/media/stats/{call_id}")
+async def media_call_stats(call_id: str):
+    """Report media relay statistics for one call by Plivo CallUUID or stream id."""
+    stats = media_relay.get(call_id)
+    if stats is None:
+        return JSONResponse({"error": f"No media stream for call: {call_id}"}, status_code=404)
+    return stats
+
+@router.post("/campaigns")
+async def create_campaign(request: Request):
+    """
+    Start a dialing campaign.
+    Accepts a JSON body with a "numbers" list, a CSV file upload in the
+    "file" form field, or a raw text/csv body.
+    """
+    try:
+        name = request.query_params.get("name")
+        content_type = request.headers.get("content-type", "")
+        if _is_json(request):
+            body = await _json_object(request)
+            numbers = body.get("numbers", [])
+            name = body.get("name", name)
+        elif content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise ValueError("No CSV file in the 'file' field")
+            numbers = parse_csv_numbers((await upload.read()).decode("utf-8-sig"))
+            name = form.get("name", name)
+        else:
+            numbers = parse_csv_numbers((await request.body()).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return _json(handle_create_campaign(numbers, name))
+
+@router.get("/campaigns")
+async def list_campaigns():
+    """List campaigns with their progress."""
+    return _json(handle_list_campaigns())
+
+@router.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str, results: str = ""):
+    """Report progress and throughput for a campaign."""
+    return _json(handle_get_campaign(campaign_id, results))
+
+@router.post("/campaigns/{campaign_id}/cancel")
+async def cancel_campaign(campaign_id: str):
+    """Stop dialing the remaining targets of a campaign."""
+    return _json(handle_cancel_campaign(campaign_id))
+
+@router.post("/webhook")
+async def webhook(request: Request):
+    """Handle real-time events from Ultravox and Plivo stream events."""
+    start_time = time.time()
+    logger.debug("Webhook event received")
+
+    # JSON is an Ultravox event, form data a Plivo stream event
+    if _is_json(request):
+        try:
+            data = await _json_object(request)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return _json(await _ingest(handle_webhook, ULTRAVOX_EVENT, data, start_time))
+    return _json(await _ingest(handle_webhook, STREAM_EVENT, dict(await request.form()), start_time))
+
+@router.api_route("/answer_url", methods=["GET", "POST"])
+async def answer_url(request: Request):
+    """Handle the initial call setup."""
+    start_time = time.time()
+    logger.info("Answer URL called")
+
+    # Plivo sends the CallUUID (and RequestUUID for outbound calls) as query or form parameters
+    values = dict(request.query_params)
+    if request.method == "POST":
+        values.update(await request.form())
+    # The registry update may write to SQLite; keep it off the event loop
+    return _text(await asyncio.to_thread(
+        handle_answer, request.query_params.get("join_url", ""), values,
+        request.query_params.get("content_type"), start_time
+    ))
+
+@router.post("/call_status")
+async def call_status(request: Request):
+    """Handle Plivo call status updates."""
+    start_time = time.time()
+    return _json(await _ingest(handle_call_status, dict(await request.form()), start_time))
@@ -0,0 +1,461 @@
+"""
+Service instances and request handlers shared by the WSGI (Flask) and ASGI
+(FastAPI) endpoints, so both entry points drive the same pools, registries
+and queues within a worker process.
+
+The handlers below hold the logic of every Ultravox route. The FastAPI
+router in app/api/endpoints/ultravox_async.py serves them; the legacy
+Flask blueprint only parses its request the same way and calls them.
+Handlers return Flask-style (body, status[, headers]) tuples.
+
+Each service is built on first use rather than at import, so a worker
+starts serving before it has constructed SDK clients it may never need.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from app.core.config import settings
+from app.models.schemas import InactivityMessage, Message
+from app.services import plivo_xml
+from app.services.agent_profiles import AgentProfileRegistry
+from app.services.plivo_service import PlivoService
+from app.services.ultravox_service import UltravoxService
+from app.services.call_initiator import CallInitiator, InitiationQueueFull
+from app.services.join_url_pool import JoinUrlPool
+from app.services.call_registry import CallRegistry
+from app.services.intent_router import IntentRouter
+from app.services.campaign_service import CampaignDialer, CampaignUnavailable, normalize_numbers
+from app.services.event_ingestion import (
+    ULTRAVOX_EVENT, CALL_STATUS_EVENT, EventIngestor, WebhookEventProcessor
+)
+from app.services.media_relay import MediaRelay
+from app.services.idempotency import IdempotencyConflict, IdempotencyStore, request_fingerprint
+from app.services.conversation_memory import ConversationStore
+from app.services.event_archive import EventArchive
+from app.services.openai_service import summarize_conversation
+from app.utils.lazy import LazyService
+from app.utils.resilience import CircuitOpenError, get_upstream_stats
+from app.utils.transport import http_clients
+
+logger = logging.getLogger(__name__)
+
+plivo_service = LazyService(PlivoService)
+agent_profiles = LazyService(AgentProfileRegistry)
+ultravox_service = LazyService(lambda: UltravoxService(agent_profiles))
+join_url_pool = LazyService(lambda: JoinUrlPool(ultravox_service))
+call_registry = LazyService(CallRegistry)
+call_initiator = LazyService(
+    lambda: CallInitiator(ultravox_service, plivo_service, join_url_pool, call_registry)
+)
+campaign_dialer = LazyService(lambda: CampaignDialer(ultravox_service, plivo_service, call_registry))
+intent_router = LazyService(IntentRouter)
+conversations = LazyService(lambda: ConversationStore(summarize_conversation))
+event_archive = LazyService(EventArchive)
+event_processor = LazyService(
+    lambda: WebhookEventProcessor(intent_router, campaign_dialer, call_registry, conversations, event_archive)
+)
+event_ingestor = LazyService(lambda: EventIngestor(event_processor.process_batch))
+media_relay = LazyService(MediaRelay)
+idempotency = LazyService(IdempotencyStore)
+
+# Body fields that change what /initiate_call does, besides its named parameters
+OVERRIDE_FIELDS = ("system_prompt", "inactivity_messages", "initial_messages")
+
+# Response when a duplicate gave up waiting for the initiation it joined
+IDEMPOTENCY_PENDING = (
+    {"error": "A call initiation with the same idempotency key is still in progress"}, 409, {"Retry-After": "1"}
+)
+
+XML_HEADERS = {"Content-Type": "text/xml"}
+
+def call_overrides(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Collect the per-call CreateCallRequest fields present in a JSON body."""
+    overrides = {}
+    if body.get("system_prompt"):
+        overrides["system_prompt"] = body["system_prompt"]
+    if body.get("inactivity_messages") is not None:
+        overrides["inactivity_messages"] = [
+            InactivityMessage(text=m) if isinstance(m, str) else InactivityMessage.model_validate(m)
+            for m in body["inactivity_messages"]
+        ]
+    if body.get("initial_messages") is not None:
+        overrides["initial_messages"] = [
+            Message(text=m) if isinstance(m, str) else Message.model_validate(m)
+            for m in body["initial_messages"]
+        ]
+    return overrides
+
+def initiation_fingerprint(to_number: str, mode: Optional[str], content_type: Optional[str],
+                           profile: Optional[str], body: Dict[str, Any]) -> str:
+    """Fingerprint of an /initiate_call request, to detect duplicates and reused keys."""
+    return request_fingerprint(
+        to_number=to_number,
+        mode=mode or "sync",
+        content_type=content_type,
+        profile=profile,
+        overrides={field: body.get(field) for field in OVERRIDE_FIELDS if body.get(field) is not None}
+    )
+
+def replayed(response: Tuple) -> Tuple:
+    """Mark a shared or cached response, as (body, status, headers)."""
+    body, status, *rest = response
+    headers = dict(rest[0]) if rest else {}
+    headers["Idempotent-Replayed"] = "true"
+    return body, status, headers
+
+def stream_content_type(value: str) -> str:
+    """
+    Validate a per-call stream format for this deployment.
+
+    Raises:
+        ValueError: If the format is unsupported, or narrowband without the media relay
+    """
+    return plivo_xml.stream_content_type(value, transcoding=settings.MEDIA_RELAY_ENABLED)
+
+def check_stream_settings():
+    """
+    Validate PLIVO_STREAM_CONTENT_TYPE when the app is created, so a bad
+    value fails the worker at startup instead of every answered call.
+
+    Raises:
+        ValueError: If the configured format cannot be used
+    """
+    settings.PLIVO_STREAM_CONTENT_TYPE = stream_content_type(settings.PLIVO_STREAM_CONTENT_TYPE)
+
+def answer_content_type(value: Optional[str]) -> Optional[str]:
+    """Validate the stream format passed through answer_url, falling back to the default."""
+    if not value:
+        return None
+    try:
+        return stream_content_type(value)
+    except ValueError as e:
+        logger.warning("Ignoring %s", str(e))
+        return None
+
+def inline_ingestion() -> bool:
+    """Whether webhook events are processed in the request, with registry and archive writes."""
+    return settings.WEBHOOK_INGESTION_MODE != "queued"
+
+def ingest(kind: str, data: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Process an event inline, or hand it to the ingestion queue in queued mode.
+
+    Returns:
+        A (body, status[, headers]) response tuple if the event was queued or
+        dropped, else None
+    """
+    if inline_ingestion():
+        event_processor.process(kind, data)
+        return None
+    if event_ingestor.submit(kind, data):
+        return {"status": "accepted"}, 202
+    logger.warning("Webhook ingestion queue full, dropped %s event", kind)
+    return {"error": "Event queue is full, retry later"}, 503, {"Retry-After": "1"}
+
+def get_ingestion_stats() -> Dict[str, Any]:
+    stats = event_ingestor.stats()
+    stats["mode"] = settings.WEBHOOK_INGESTION_MODE
+    return stats
+
+class InitiationRequest:
+    """Validated parameters of an /initiate_call request."""
+
+    def __init__(self, query: Mapping[str, Any], fields: Optional[Mapping[str, Any]] = None,
+                 body: Optional[Any] = None, client_key: Optional[str] = None):
+        """
+        Collect the parameters from the query string and the POST body.
+
+        Args:
+            query: Query string parameters
+            fields: Form fields of a form POST
+            body: Decoded JSON body of a JSON POST
+            client_key: Idempotency-Key header
+
+        Raises:
+            ValueError: If the body is not an object, or the overrides,
+                stream format or profile are invalid
+        """
+        if body is not None and not isinstance(body, dict):
+            raise ValueError("Expected a JSON object")
+        source = body if body is not None else fields
+        # A GET takes to_number from the query string, a POST only from its body
+        to_number = query.get("to_number") if source is None else source.get("to_number")
+        source = source if source is not None else {}
+        self.to_number = to_number or settings.TO_NUMBER
+        self.mode = source.get("mode", query.get("mode"))
+        self.content_type = source.get("stream_content_type", query.get("stream_content_type"))
+        self.profile = source.get("profile", query.get("profile"))
+        self.client_key = client_key or query.get("idempotency_key") or source.get("idempotency_key")
+        self.body: Dict[str, Any] = body or {}
+        self.overrides: Dict[str, Any] = {}
+        if body:
+            try:
+                self.overrides = call_overrides(body)
+            except Exception as e:
+                raise ValueError(f"Invalid call overrides: {str(e)}")
+        if self.content_type:
+            self.content_type = stream_content_type(self.content_type)
+        if self.profile:
+            agent_profiles.get(self.profile)
+
+    def fingerprint(self) -> str:
+        return initiation_fingerprint(self.to_number, self.mode, self.content_type, self.profile, self.body)
+
+async def handle_initiate_call(params: InitiationRequest, start_time: float) -> Tuple:
+    """
+    Run or queue a call initiation. Duplicates, by idempotency key or by
+    identical parameters within IDEMPOTENCY_WINDOW, await the initiation
+    already in flight and share its response instead of dialing again.
+    """
+    logger.info("Target phone number: %s", params.to_number)
+    fingerprint = params.fingerprint()
+    key, ttl = idempotency.key_for(params.client_key, fingerprint)
+    if key is None:
+        return await _initiate(params, start_time)
+
+    try:
+        owner, future = idempotency.claim(key, fingerprint, ttl)
+    except IdempotencyConflict as e:
+        return {"error": str(e)}, 422
+    if not owner:
+        # A duplicate: wait for the initiation already running, or replay its response.
+        # Shielded so a waiter timing out never cancels the owner's future
+        logger.info("Coalescing duplicate call initiation to %s", params.to_number)
+        try:
+            response = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), settings.IDEMPOTENCY_WAIT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return IDEMPOTENCY_PENDING
+        return replayed(response)
+
+    response: Tuple = ({"error": "Call initiation was interrupted"}, 500)
+    try:
+        response = await _initiate(params, start_time)
+        return response
+    finally:
+        idempotency.resolve(key, future, response, keep=response[1] < 400)
+
+async def _initiate(params: InitiationRequest, start_time: float) -> Tuple:
+    """Run or queue one call initiation and return the (body, status[, headers]) response."""
+    target_number = params.to_number
+    if params.mode == "async":
+        if not target_number:
+            return {"error": "No target phone number provided (TO_NUMBER)"}, 400
+        try:
+            record = call_initiator.submit(target_number, params.overrides, params.content_type, params.profile)
+        except InitiationQueueFull as e:
+            logger.warning("Rejecting async call initiation: %s", str(e))
+            return {"error": str(e)}, 503
+
+        status_url = f"/initiate_call/{record['tracking_id']}"
+        return {
+            "message": "Call initiation accepted",
+            "tracking_id": record["tracking_id"],
+            "status_url": status_url,
+            "to_number": target_number
+        }, 202, {"Location": status_url}
+
+    try:
+        if not target_number:
+            raise ValueError("No target phone number provided (TO_NUMBER)")
+        # The Ultravox and Plivo legs run on the background loop
+        result = await call_initiator.loop.run_async(
+            call_initiator.initiate(target_number, params.overrides, params.content_type, params.profile)
+        )
+        logger.info("Call initiated with Plivo, request_uuid=%s", result["plivo_call_uuid"])
+
+        elapsed_time = time.time() - start_time
+        logger.info("Call initiation completed in %.2f seconds", elapsed_time)
+        return {
+            "message": "Call initiated successfully",
+            "plivo_call_uuid": result["plivo_call_uuid"],
+            "to_number": settings.TO_NUMBER,
+            "elapsed_time": f"{elapsed_time:.2f}s"
+        }, 200
+
+    except CircuitOpenError as e:
+        logger.warning("Failing call initiation fast: %s", str(e))
+        return {"error": str(e)}, 503, {"Retry-After": str(max(1, round(e.retry_after)))}
+
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        logger.exception("Error during initiate_call (after %.2fs)", elapsed_time)
+        return {"error": str(e), "elapsed_time": f"{elapsed_time:.2f}s"}, 500
+
+def handle_initiation_status(tracking_id: str) -> Tuple:
+    """Poll the outcome of an async call initiation."""
+    status = call_initiator.get_status(tracking_id)
+    if status is None:
+        return {"error": f"Unknown tracking id: {tracking_id}"}, 404
+    return status, 200
+
+def handle_get_call(call_id: str) -> Tuple:
+    """Look a call up by Plivo request_uuid or CallUUID, Ultravox call id or joinUrl."""
+    record = call_registry.get(call_id)
+    if record is None:
+        return {"error": f"Unknown call: {call_id}"}, 404
+    return record.to_dict(), 200
+
+def handle_create_campaign(numbers: Any, name: Optional[str]) -> Tuple:
+    """Start a dialing campaign over a list of numbers."""
+    try:
+        targets = normalize_numbers(numbers)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if not targets:
+        return {"error": "No target numbers provided"}, 400
+
+    try:
+        campaign = campaign_dialer.create_campaign(targets, name=name)
+    except CampaignUnavailable as e:
+        return {"error": str(e)}, 409
+    status_url = f"/campaigns/{campaign.campaign_id}"
+    return campaign.to_dict(), 202, {"Location": status_url}
+
+def handle_list_campaigns() -> Tuple:
+    """List campaigns with their progress."""
+    return {
+        "campaigns": [campaign.to_dict() for campaign in campaign_dialer.list_campaigns()],
+        "limits": campaign_dialer.limits()
+    }, 200
+
+def handle_get_campaign(campaign_id: str, results: Optional[str]) -> Tuple:
+    """Report progress and throughput for a campaign, with per-target results if asked."""
+    campaign = campaign_dialer.get_campaign(campaign_id)
+    if campaign is None:
+        return {"error": f"Unknown campaign: {campaign_id}"}, 404
+
+    data = campaign.to_dict(include_results=(results or "").lower() in ("1", "true", "yes"))
+    data["limits"] = campaign_dialer.limits()
+    return data, 200
+
+def handle_cancel_campaign(campaign_id: str) -> Tuple:
+    """Stop dialing the remaining targets of a campaign."""
+    campaign = campaign_dialer.cancel_campaign(campaign_id)
+    if campaign is None:
+        return {"error": f"Unknown campaign: {campaign_id}"}, 404
+    return campaign.to_dict(), 200
+
+def handle_webhook(kind: str, data: Dict[str, Any], start_time: float) -> Tuple:
+    """Process or queue an Ultravox event (kind ULTRAVOX_EVENT) or a Plivo stream event."""
+    try:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Webhook %s data: %s", kind,
+                         json.dumps(data, indent=2) if kind == ULTRAVOX_EVENT else data)
+
+        queued = ingest(kind, data)
+        if queued is not None:
+            return queued
+
+        elapsed_time = time.time() - start_time
+        logger.info("Webhook processed in %.2f seconds", elapsed_time)
+        return {"status": "success", "processing_time": f"{elapsed_time:.2f}s"}, 200
+
+    except Exception as e:
+        logger.error("Webhook error: %s", str(e))
+        return {"error": str(e)}, 500
+
+def handle_answer(join_url: str, values: Mapping[str, Any], content_type: Optional[str],
+                  start_time: float) -> Tuple:
+    """
+    Answer a Plivo call with the XML that streams it to its Ultravox joinUrl.
+
+    Args:
+        join_url: The call's joinUrl, from the answer_url query string
+        values: Plivo's query and form parameters, with CallUUID and RequestUUID
+        content_type: Stream format chosen when the call was placed
+        start_time: When the request arrived
+
+    Returns:
+        (text, status, headers) with the answer XML
+    """
+    try:
+        if not join_url:
+            logger.error("No join_url provided in answer_url request")
+            return "Error: No join URL provided", 400, {"Content-Type": "text/plain"}
+
+        logger.info("Generating answer XML for join URL")
+        logger.debug("Join URL: %s", join_url)
+
+        # Plivo sends the CallUUID (and RequestUUID for outbound calls) on answer
+        call_registry.update(
+            status="answered",
+            request_uuid=values.get("RequestUUID"),
+            call_uuid=values.get("CallUUID"),
+            join_url=join_url
+        )
+
+        xml_str = plivo_service.generate_answer_xml(join_url, answer_content_type(content_type))
+
+        elapsed_time = time.time() - start_time
+        logger.info("Answer URL processed in %.2f seconds", elapsed_time)
+        return xml_str, 200, XML_HEADERS
+    except Exception as e:
+        logger.error("Error in answer_url: %s", str(e))
+        return plivo_xml.speak_document(plivo_xml.ERROR_SPEECH), 200, XML_HEADERS
+
+def handle_call_status(data: Dict[str, Any], start_time: float) -> Tuple:
+    """Process or queue a Plivo call status callback."""
+    try:
+        logger.debug("Call status data: %s", data)
+        status = data.get("CallStatus")
+        if not status:
+            return {"error": "Missing CallStatus"}, 400
+
+        queued = ingest(CALL_STATUS_EVENT, data)
+        if queued is not None:
+            return queued
+
+        elapsed_time = time.time() - start_time
+        logger.info("Call status processed in %.2f seconds", elapsed_time)
+        return {"status": "success", "call_status": status}, 200
+    except Exception as e:
+        logger.error("Call status error: %s", str(e))
+        return {"error": str(e)}, 500
+
+def idempotency_stats() -> Dict[str, Any]:
+    """Report coalesced and replayed duplicate call initiations."""
+    return idempotency.stats()
+
+def pool_stats() -> Dict[str, Any]:
+    """Report joinUrl pool size, hit/miss and waste counters."""
+    return join_url_pool.stats()
+
+def call_registry_stats() -> Dict[str, Any]:
+    """Report how many calls the registry is tracking."""
+    return call_registry.stats()
+
+def ingestion_stats() -> Dict[str, Any]:
+    """Report webhook ingestion queue depth, drops and processing lag."""
+    return get_ingestion_stats()
+
+def archive_stats() -> Dict[str, Any]:
+    """Report buffered, written and dropped events of the call event archive."""
+    return event_archive.stats()
+
+def list_agent_profiles() -> Dict[str, Any]:
+    """List the loaded agent profiles and their precompiled payload sizes."""
+    return agent_profiles.stats()
+
+def upstream_stats() -> Dict[str, Any]:
+    """Report retry counters and circuit breaker state per upstream."""
+    return get_upstream_stats()
+
+def http_pool_stats() -> Dict[str, Any]:
+    """Report connection pool utilization per upstream and DNS cache hits."""
+    return http_clients.stats()
+
+# GET routes that report a service's counters, registered by both apps
+STATS_ROUTES: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "/idempotency/stats": idempotency_stats,
+    "/pool/stats": pool_stats,
+    "/calls/stats": call_registry_stats,
+    "/ingestion/stats": ingestion_stats,
+    "/archive/stats": archive_stats,
+    "/profiles": list_agent_profiles,
+    "/upstreams/stats": upstream_stats,
+    "/http/stats": http_pool_stats
+}
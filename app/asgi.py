@@ -0,0 +1,32 @@
+from fastapi import FastAPI # type: ignore
+from app.api.endpoints import plivo, ultravox_async
+from app.api.services import check_stream_settings
+from app.core.config import settings
+from app.utils.logger import setup_logging
+from app.utils.metrics import MetricsMiddleware
+from app.utils.transport import http_clients
+
+def create_asgi_app() -> FastAPI:
+    """
+    Create the ASGI application.
+
+    Serves the Ultravox routes as async handlers at the root, with the same
+    paths as the Flask app, and the Plivo speech router under
+    PLIVO_ROUTER_PREFIX. Request durations are recorded for /metrics, and
+    the pooled upstream clients are closed when the app shuts down.
+    """
+    setup_logging()
+    check_stream_settings()
+
+    app = FastAPI(title="Ultravox Voice Agent")
+    app.include_router(ultravox_async.router)
+    app.include_router(plivo.router, prefix=settings.PLIVO_ROUTER_PREFIX)
+    app.add_middleware(MetricsMiddleware)
+
+    async def close_http_clients():
+        await http_clients.aclose()
+        http_clients.close()
+
+    app.add_event_handler("shutdown", close_http_clients)
+
+    return app
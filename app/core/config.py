@@ -11,14 +11,38 @@ class Settings(BaseSettings):
     APP_NAME: str = os.getenv("APP_NAME", "Voice Agent API")
     API_V1_STR: str = "/api/v1"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Hand log records to a background writer thread instead of writing on the request thread
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_DIR: str = os.getenv("LOG_DIR", "logs")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "10"))
     
     # OpenAI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    # Empty uses the SDK default (https://api.openai.com/v1)
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+    # Stream completions and speak the first sentence while the rest is generated
+    OPENAI_STREAMING: bool = os.getenv("OPENAI_STREAMING", "false").lower() == "true"
+    # Cache of generated responses keyed on (model, system prompt, prompt)
+    OPENAI_CACHE_ENABLED: bool = os.getenv("OPENAI_CACHE_ENABLED", "true").lower() == "true"
+    OPENAI_CACHE_TTL: float = float(os.getenv("OPENAI_CACHE_TTL", "3600"))
+    OPENAI_CACHE_MAX_ENTRIES: int = int(os.getenv("OPENAI_CACHE_MAX_ENTRIES", "1024"))
+    # Greeting variants generated at startup; 0 disables pre-generation
+    OPENAI_GREETING_VARIANTS: int = int(os.getenv("OPENAI_GREETING_VARIANTS", "3"))
+    # Per-call conversation history for the Plivo speech webhook; older turns are summarized
+    CONVERSATION_MEMORY_ENABLED: bool = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+    CONVERSATION_MAX_TOKENS: int = int(os.getenv("CONVERSATION_MAX_TOKENS", "1200"))
+    CONVERSATION_SUMMARY_TOKENS: int = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))
+    CONVERSATION_TTL: float = float(os.getenv("CONVERSATION_TTL", "3600"))
+    CONVERSATION_MAX_CALLS: int = int(os.getenv("CONVERSATION_MAX_CALLS", "10000"))
     
     # Plivo settings
     PLIVO_AUTH_ID: str = os.getenv("PLIVO_AUTH_ID", "")
     PLIVO_AUTH_TOKEN: str = os.getenv("PLIVO_AUTH_TOKEN", "")
     PLIVO_PHONE_NUMBER: str = os.getenv("PLIVO_PHONE_NUMBER", "")
+    # REST base for the Call and Speak APIs
+    PLIVO_API_URL: str = os.getenv("PLIVO_API_URL", "https://api.plivo.com/v1")
     
     # Dynamic TO_NUMBER handling
     TO_NUMBER: str = os.getenv("TO_NUMBER", "")
@@ -26,6 +50,7 @@ class Settings(BaseSettings):
     # UltraVox settings
     ULTRAVOX_API_KEY: str = os.getenv("ULTRAVOX_API_KEY", "")
     ULTRAVOX_PHONE_NUMBER: Optional[str] = os.getenv("ULTRAVOX_PHONE_NUMBER", None)
+    ULTRAVOX_API_URL: str = os.getenv("ULTRAVOX_API_URL", "https://api.ultravox.ai/api")
     
     # Base URL (for webhooks)
     BASE_URL: str = os.getenv("BASE_URL", "")
@@ -207,6 +232,95 @@ Make it a proper prompt like structure,The below is the example prompt format
     AI_MODEL: str = os.getenv("AI_MODEL", "fixie-ai/ultravox-70B")
     AI_TEMPERATURE: float = float(os.getenv("AI_TEMPERATURE", "0.7"))
     
+    # Async call initiation settings
+    INITIATION_MAX_IN_FLIGHT: int = int(os.getenv("INITIATION_MAX_IN_FLIGHT", "200"))
+    INITIATION_MAX_PENDING: int = int(os.getenv("INITIATION_MAX_PENDING", "5000"))
+    INITIATION_RESULT_TTL: float = float(os.getenv("INITIATION_RESULT_TTL", "600"))
+    UPSTREAM_TIMEOUT: float = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+    ULTRAVOX_LIST_PAGE_SIZE: int = int(os.getenv("ULTRAVOX_LIST_PAGE_SIZE", "100"))
+    ULTRAVOX_BULK_CONCURRENCY: int = int(os.getenv("ULTRAVOX_BULK_CONCURRENCY", "20"))
+    ULTRAVOX_CALL_CACHE_SIZE: int = int(os.getenv("ULTRAVOX_CALL_CACHE_SIZE", "10000"))
+    
+    # Pooled upstream HTTP clients, per upstream and event loop; HTTP/2 needs the h2 package
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    # Seconds to reuse resolved upstream addresses; 0 resolves on every new connection
+    DNS_CACHE_TTL: float = float(os.getenv("DNS_CACHE_TTL", "300"))
+    
+    # Upstream resilience settings; a deadline bounds a whole call including retries
+    ULTRAVOX_DEADLINE: float = float(os.getenv("ULTRAVOX_DEADLINE", "15"))
+    PLIVO_DEADLINE: float = float(os.getenv("PLIVO_DEADLINE", "15"))
+    UPSTREAM_RETRY_ATTEMPTS: int = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+    UPSTREAM_RETRY_BASE_DELAY: float = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+    UPSTREAM_RETRY_MAX_DELAY: float = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4"))
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RESET_TIMEOUT: float = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+    
+    # Idempotency settings for /initiate_call; a window of 0 only coalesces requests with a key
+    IDEMPOTENCY_KEY_TTL: float = float(os.getenv("IDEMPOTENCY_KEY_TTL", "3600"))
+    IDEMPOTENCY_WINDOW: float = float(os.getenv("IDEMPOTENCY_WINDOW", "30"))
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    IDEMPOTENCY_WAIT_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+    
+    # Campaign dialer settings
+    PLIVO_CALLS_PER_SECOND: float = float(os.getenv("PLIVO_CALLS_PER_SECOND", "2"))
+    ULTRAVOX_MAX_CONCURRENT_CALLS: int = int(os.getenv("ULTRAVOX_MAX_CONCURRENT_CALLS", "10"))
+    CAMPAIGN_LOOKAHEAD: int = int(os.getenv("CAMPAIGN_LOOKAHEAD", "4"))
+    CAMPAIGN_MAX_TARGETS: int = int(os.getenv("CAMPAIGN_MAX_TARGETS", "100000"))
+    
+    # Pre-warmed Ultravox joinUrl pool settings
+    JOIN_URL_POOL_ENABLED: bool = os.getenv("JOIN_URL_POOL_ENABLED", "false").lower() == "true"
+    JOIN_URL_POOL_MIN_SIZE: int = int(os.getenv("JOIN_URL_POOL_MIN_SIZE", "0"))
+    JOIN_URL_POOL_MAX_SIZE: int = int(os.getenv("JOIN_URL_POOL_MAX_SIZE", "20"))
+    # Time to leave for Plivo to dial, ring and answer before joinTimeout runs out
+    JOIN_URL_POOL_RING_MARGIN: float = float(os.getenv("JOIN_URL_POOL_RING_MARGIN", "20"))
+    
+    # Intent routing settings
+    RESPONSE_TEMPLATES_FILE: str = os.getenv("RESPONSE_TEMPLATES_FILE", "")
+    RESPONSE_TEMPLATES_RELOAD_INTERVAL: float = float(os.getenv("RESPONSE_TEMPLATES_RELOAD_INTERVAL", "5"))
+    
+    # Agent profile settings (one <name>.json per profile in AGENT_PROFILES_DIR)
+    AGENT_PROFILES_DIR: str = os.getenv("AGENT_PROFILES_DIR", "")
+    AGENT_PROFILES_RELOAD_INTERVAL: float = float(os.getenv("AGENT_PROFILES_RELOAD_INTERVAL", "5"))
+    DEFAULT_AGENT_PROFILE: str = os.getenv("DEFAULT_AGENT_PROFILE", "default")
+    
+    # Webhook ingestion settings ("inline" processes before acking, "queued" acks first)
+    WEBHOOK_INGESTION_MODE: str = os.getenv("WEBHOOK_INGESTION_MODE", "inline").lower()
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "2"))
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+    
+    # Call registry settings (CALL_REGISTRY_DB enables SQLite persistence)
+    CALL_REGISTRY_TTL: float = float(os.getenv("CALL_REGISTRY_TTL", "3600"))
+    # 0 means JOIN_TIMEOUT + MAX_CALL_DURATION + 5 minutes
+    CALL_REGISTRY_MAX_AGE: float = float(os.getenv("CALL_REGISTRY_MAX_AGE", "0"))
+    CALL_REGISTRY_DB: str = os.getenv("CALL_REGISTRY_DB", "")
+    
+    # Event archive settings (EVENT_ARCHIVE_DIR enables one SQLite file per UTC day)
+    EVENT_ARCHIVE_DIR: str = os.getenv("EVENT_ARCHIVE_DIR", "")
+    EVENT_ARCHIVE_BATCH_SIZE: int = int(os.getenv("EVENT_ARCHIVE_BATCH_SIZE", "500"))
+    EVENT_ARCHIVE_FLUSH_INTERVAL: float = float(os.getenv("EVENT_ARCHIVE_FLUSH_INTERVAL", "5"))
+    EVENT_ARCHIVE_MAX_BUFFER: int = int(os.getenv("EVENT_ARCHIVE_MAX_BUFFER", "50000"))
+    
+    # ASGI app settings
+    PLIVO_ROUTER_PREFIX: str = os.getenv("PLIVO_ROUTER_PREFIX", "/plivo")
+    # Worker processes serving the app (gunicorn also reads it); campaigns need exactly one
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
+    # Media relay settings (ASGI app only)
+    MEDIA_RELAY_ENABLED: bool = os.getenv("MEDIA_RELAY_ENABLED", "false").lower() == "true"
+    MEDIA_JITTER_BUFFER_FRAMES: int = int(os.getenv("MEDIA_JITTER_BUFFER_FRAMES", "3"))
+    MEDIA_STATS_HISTORY: int = int(os.getenv("MEDIA_STATS_HISTORY", "100"))
+    # Default audio format of Plivo streams; 8 kHz mu-law halves bandwidth on PSTN calls
+    PLIVO_STREAM_CONTENT_TYPE: str = os.getenv("PLIVO_STREAM_CONTENT_TYPE", "audio/x-l16;rate=16000")
+    
+    # Metrics settings (Prometheus text format at /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Histogram bucket upper bounds in seconds
+    METRICS_BUCKETS: str = os.getenv("METRICS_BUCKETS", "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10")
+    
     # Response templates
     def get_response_templates(self) -> Dict[str, str]:
         """Get response templates from env or use defaults"""
@@ -218,12 +332,29 @@ Make it a proper prompt like structure,The below is the example prompt format
                 pass
                 
         # Default templates
-        return {
-            "greeting": "Hello there! How can I help you today?",
-            "weather": "I'm sorry, I don't have access to weather information yet.",
-            "name": "My name is Steve, your AI assistant.",
-            "goodbye": "Goodbye! Have a great day!",
-            "default": "I heard you say: {text}. How can I help with that?"
-        }
+        return dict(DEFAULT_RESPONSE_TEMPLATES)
+
+DEFAULT_RESPONSE_TEMPLATES: Dict[str, str] = {
+    "greeting": "Hello there! How can I help you today?",
+    "weather": "I'm sorry, I don't have access to weather information yet.",
+    "name": "My name is Steve, your AI assistant.",
+    "goodbye": "Goodbye! Have a great day!",
+    "default": "I heard you say: {text}. How can I help with that?"
+}
+
+# Keywords for each intent, in priority order
+DEFAULT_INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "greeting": ["hello", "hi", "hey"],
+    "weather": ["weather"],
+    "name": ["name"],
+    "goodbye": ["bye", "goodbye", "see you"]
+}
+
+def parse_duration(value: str) -> float:
+    """Convert an Ultravox duration string such as "30s" or "1.5s" to seconds."""
+    value = value.strip()
+    if value.endswith("s"):
+        value = value[:-1]
+    return float(value)
 
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,300 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.services.ultravox_payload import UltravoxPayloadBuilder
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_VAD_SETTINGS: Dict[str, Any] = {
+    "turnEndpointDelay": "1s",
+    "minimumTurnDuration": "0.15s",
+    "minimumInterruptionDuration": "0.5s",
+    "frameActivationThreshold": 0.1,
+}
+
+# Profile file keys and the Settings field each one defaults to (None: no setting)
+PROFILE_FIELDS: Dict[str, Optional[str]] = {
+    "description": None,
+    "system_prompt": "SYSTEM_PROMPT",
+    "system_prompt_file": None,
+    "voice": "VOICE_NAME",
+    "model": "AI_MODEL",
+    "language_hint": "LANGUAGE_HINT",
+    "temperature": "AI_TEMPERATURE",
+    "max_duration": "MAX_CALL_DURATION",
+    "time_exceeded_message": "TIME_EXCEEDED_MESSAGE",
+    "inactivity_duration": "INACTIVITY_DURATION",
+    "inactivity_messages": None,
+    "initial_messages": None,
+    "first_speaker": None,
+    "vad_settings": None,
+    "recording_enabled": None,
+}
+
+# Fields that must be strings; the rest are checked in _check_fields
+_STRING_FIELDS = (
+    "description", "system_prompt", "system_prompt_file", "voice", "model", "language_hint",
+    "max_duration", "time_exceeded_message", "inactivity_duration", "first_speaker",
+)
+
+def _check_messages(name: str, field: str, value: Any):
+    if not isinstance(value, list) or not all(
+        isinstance(message, str) or (isinstance(message, dict) and isinstance(message.get("text"), str))
+        for message in value
+    ):
+        raise ValueError(f"Agent profile {name!r}: {field} must be a list of strings or {{\"text\": ...}} objects")
+
+def _check_fields(name: str, fields: Dict[str, Any]):
+    """
+    Reject profile fields of the wrong type before they reach the payload builder.
+
+    Raises:
+        ValueError: If a field has the wrong type
+    """
+    for field in _STRING_FIELDS:
+        if field in fields and not isinstance(fields[field], str):
+            raise ValueError(f"Agent profile {name!r}: {field} must be a string")
+    temperature = fields.get("temperature", 0.0)
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+        raise ValueError(f"Agent profile {name!r}: temperature must be a number")
+    for field in ("inactivity_messages", "initial_messages"):
+        if field in fields:
+            _check_messages(name, field, fields[field])
+    if "vad_settings" in fields and not isinstance(fields["vad_settings"], dict):
+        raise ValueError(f"Agent profile {name!r}: vad_settings must be an object")
+    if "recording_enabled" in fields and not isinstance(fields["recording_enabled"], bool):
+        raise ValueError(f"Agent profile {name!r}: recording_enabled must be true or false")
+
+class UnknownProfileError(ValueError):
+    """Raised when a call asks for an agent profile that is not loaded."""
+
+class AgentProfile:
+    """
+    One agent persona: prompt, voice, model and call settings.
+
+    Fields missing from the profile file fall back to the process-wide
+    settings. The profile's Ultravox payload is precompiled when the
+    profile is loaded, so calls only pay for their per-call overrides.
+    """
+
+    def __init__(self, name: str, fields: Dict[str, Any], source: Optional[str] = None):
+        unknown = sorted(set(fields) - set(PROFILE_FIELDS))
+        if unknown:
+            raise ValueError(f"Agent profile {name!r} has unknown fields: {', '.join(unknown)}")
+        _check_fields(name, fields)
+        self.name = name
+        self.source = source
+        self.description = fields.get("description", "")
+        self.system_prompt = fields.get("system_prompt", settings.SYSTEM_PROMPT)
+        self.voice = fields.get("voice", settings.VOICE_NAME)
+        self.model = fields.get("model", settings.AI_MODEL)
+        self.language_hint = fields.get("language_hint", settings.LANGUAGE_HINT)
+        self.temperature = float(fields.get("temperature", settings.AI_TEMPERATURE))
+        self.max_duration = fields.get("max_duration", settings.MAX_CALL_DURATION)
+        self.time_exceeded_message = fields.get("time_exceeded_message", settings.TIME_EXCEEDED_MESSAGE)
+        self.inactivity_duration = fields.get("inactivity_duration", settings.INACTIVITY_DURATION)
+        self.inactivity_messages: Sequence[Any] = fields.get("inactivity_messages", [settings.INACTIVITY_MESSAGE])
+        self.initial_messages: Optional[Sequence[Any]] = fields.get("initial_messages")
+        self.first_speaker = fields.get("first_speaker", "FIRST_SPEAKER_USER")
+        self.vad_settings = dict(DEFAULT_VAD_SETTINGS, **fields.get("vad_settings", {}))
+        self.recording_enabled = bool(fields.get("recording_enabled", False))
+        self.builder = UltravoxPayloadBuilder(self.base_payload(), inactivity_duration=self.inactivity_duration)
+
+    def base_payload(self) -> Dict[str, Any]:
+        """The Ultravox call creation payload for this profile, without per-call overrides."""
+        if self.initial_messages is not None:
+            initial_messages = UltravoxPayloadBuilder.initial_messages(self.initial_messages)
+        else:
+            initial_messages = [
+                {
+                    "role": "MESSAGE_ROLE_USER",
+                    "text": "",
+                    "invocationId": "",
+                    "toolName": "",
+                    "errorDetails": "",
+                    "medium": "MESSAGE_MEDIUM_VOICE",
+                    "callStageMessageIndex": 1,
+                    "callStageId": "1",
+                }
+            ]
+        return {
+            "systemPrompt": self.system_prompt,
+            "temperature": self.temperature,
+            "model": self.model,
+            "voice": self.voice,
+            "languageHint": self.language_hint,
+            "initialMessages": initial_messages,
+            "joinTimeout": settings.JOIN_TIMEOUT,
+            "maxDuration": self.max_duration,
+            "timeExceededMessage": self.time_exceeded_message,
+            "inactivityMessages": UltravoxPayloadBuilder.inactivity_messages(
+                self.inactivity_messages, self.inactivity_duration
+            ),
+            "selectedTools": [
+                {
+                    "toolName": "hangUp",
+                }
+            ],
+            "medium": {"plivo": {}},
+            "recordingEnabled": self.recording_enabled,
+            "firstSpeaker": self.first_speaker,
+            "transcriptOptional": True,
+            "initialOutputMedium": "MESSAGE_MEDIUM_VOICE",
+            "vadSettings": self.vad_settings,
+            "firstSpeakerSettings": {
+                "user": {},
+            },
+            "experimentalSettings": {},
+            "metadata": {},
+            "initialState": {},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "source": self.source,
+            "voice": self.voice,
+            "model": self.model,
+            "language_hint": self.language_hint,
+            "temperature": self.temperature,
+            "max_duration": self.max_duration,
+            "system_prompt_chars": len(self.system_prompt),
+            "payload_bytes": len(self.builder.build())
+        }
+
+class AgentProfileRegistry:
+    """
+    Named agent profiles loaded from AGENT_PROFILES_DIR.
+
+    Each <name>.json file in the directory is one profile; its fields
+    (see PROFILE_FIELDS) override the process-wide settings, and
+    system_prompt_file reads the prompt from a file next to it. A profile
+    built from the settings alone is always available as "default" unless
+    a default.json replaces it. The directory is re-checked at most every
+    AGENT_PROFILES_RELOAD_INTERVAL seconds and every profile recompiled
+    when any file in it changes, without restarting workers.
+    """
+
+    def __init__(self, profiles_dir: Optional[str] = None, reload_interval: Optional[float] = None,
+                 default_profile: Optional[str] = None):
+        self.profiles_dir = settings.AGENT_PROFILES_DIR if profiles_dir is None else profiles_dir
+        self.reload_interval = (
+            settings.AGENT_PROFILES_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        )
+        self.default_name = default_profile or settings.DEFAULT_AGENT_PROFILE
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._source_version: Tuple = ()
+        self.reloads = 0
+        # Replaced as a whole on reload, so a lookup never sees a half-loaded set
+        self._profiles: Dict[str, AgentProfile] = {"default": AgentProfile("default", {})}
+        self.reload(force=True)
+
+    def get(self, name: Optional[str] = None) -> AgentProfile:
+        """
+        Look up a profile, or the default one when no name is given.
+
+        Raises:
+            UnknownProfileError: If no profile has that name
+        """
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        profiles = self._profiles
+        profile = profiles.get(name or self.default_name)
+        if profile is None:
+            raise UnknownProfileError(
+                f"Unknown agent profile {name or self.default_name!r}, available: {', '.join(sorted(profiles))}"
+            )
+        return profile
+
+    def is_default(self, name: Optional[str]) -> bool:
+        """Whether a requested profile name resolves to the default profile."""
+        return not name or name == self.default_name
+
+    def names(self) -> List[str]:
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return sorted(self._profiles)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Recompile the profiles if any file in the directory changed since the last check.
+
+        Returns:
+            True if new profiles were loaded
+        """
+        # Another thread is already checking; keep serving the current profiles
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            version = self._version()
+            if not force and version == self._source_version:
+                return False
+            self._source_version = version
+
+            try:
+                self._profiles = self._load()
+            except (OSError, ValueError) as e:
+                logger.error("Keeping previous agent profiles, reload failed: %s", str(e))
+                return False
+        finally:
+            self._lock.release()
+
+        self.reloads += 1
+        logger.info("Loaded %s agent profiles: %s", len(self._profiles), ", ".join(sorted(self._profiles)))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "profiles_dir": self.profiles_dir,
+            "default": self.default_name,
+            "reloads": self.reloads,
+            "profiles": [self._profiles[name].to_dict() for name in sorted(self._profiles)]
+        }
+
+    def _version(self) -> Tuple:
+        if not self.profiles_dir:
+            return ()
+        try:
+            entries = sorted(os.scandir(self.profiles_dir), key=lambda entry: entry.name)
+        except OSError:
+            return (-1,)
+        # Prompt files count too, so editing one reloads the profile that reads it
+        return tuple(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries if entry.is_file()
+        )
+
+    def _load(self) -> Dict[str, AgentProfile]:
+        profiles = {"default": AgentProfile("default", {})}
+        if not self.profiles_dir or not os.path.isdir(self.profiles_dir):
+            return profiles
+
+        for filename in sorted(os.listdir(self.profiles_dir)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.profiles_dir, filename)
+            with open(path, "r", encoding="utf-8") as f:
+                try:
+                    fields = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}: {str(e)}")
+            if not isinstance(fields, dict):
+                raise ValueError(f"{path} must contain a JSON object")
+
+            prompt_file = fields.pop("system_prompt_file", None)
+            if prompt_file:
+                with open(os.path.join(self.profiles_dir, prompt_file), "r", encoding="utf-8") as f:
+                    fields["system_prompt"] = f.read()
+            name = filename[:-len(".json")]
+            profiles[name] = AgentProfile(name, fields, source=path)
+
+        if self.default_name not in profiles:
+            raise ValueError(f"Default agent profile {self.default_name!r} not found in {self.profiles_dir}")
+        return profiles
@@ -0,0 +1,151 @@
+"""
+Vectorized transcoding between the audio formats Plivo streams can carry.
+
+G.711 μ-law/A-law are converted with 256- and 65536-entry lookup tables,
+and 8 kHz <-> 16 kHz resampling works on whole frames with NumPy slicing,
+so a 20 ms frame costs a handful of array operations and no per-sample
+Python.
+"""
+from typing import Callable, Dict, Tuple
+import numpy as np # type: ignore
+
+L16_16K = "audio/x-l16;rate=16000"
+L16_8K = "audio/x-l16;rate=8000"
+MULAW_8K = "audio/x-mulaw;rate=8000"
+ALAW_8K = "audio/x-alaw;rate=8000"
+
+SUPPORTED_CONTENT_TYPES = (L16_16K, L16_8K, MULAW_8K, ALAW_8K)
+
+# Linear PCM on the wire is 16-bit little-endian
+_PCM = np.dtype("<i2")
+
+def _mulaw_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((codes & 0x0F) << 3) + 0x84) << ((codes & 0x70) >> 4)
+    return np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.int16)
+
+def _alaw_decode_table() -> np.ndarray:
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    segment = (codes & 0x70) >> 4
+    magnitude = ((codes & 0x0F) << 4) + np.where(segment == 0, 8, 0x108)
+    magnitude = np.where(segment > 1, magnitude << np.maximum(segment - 1, 0), magnitude)
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+def _all_samples() -> np.ndarray:
+    """Every int16 value, ordered by its uint16 bit pattern, so tables index with .view(np.uint16)."""
+    return np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32)
+
+def _mulaw_encode_table() -> np.ndarray:
+    pcm = _all_samples() >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    pcm = np.minimum(np.where(pcm < 0, -pcm, pcm), 8159) + (0x84 >> 2)
+    segment = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), pcm)
+    code = (segment << 4) | ((pcm >> (segment + 1)) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, code) ^ mask).astype(np.uint8)
+
+def _alaw_encode_table() -> np.ndarray:
+    pcm = _all_samples() >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    pcm = np.where(pcm >= 0, pcm, -pcm - 1)
+    segment = np.searchsorted(np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]), pcm)
+    shift = np.where(segment < 2, 1, segment)
+    code = (segment << 4) | ((pcm >> shift) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, code) ^ mask).astype(np.uint8)
+
+MULAW_DECODE = _mulaw_decode_table()
+ALAW_DECODE = _alaw_decode_table()
+MULAW_ENCODE = _mulaw_encode_table()
+ALAW_ENCODE = _alaw_encode_table()
+
+def normalize_content_type(content_type: str) -> str:
+    """Lower-case a stream content type and drop whitespace, e.g. 'audio/x-mulaw; rate=8000'."""
+    return content_type.replace(" ", "").lower()
+
+def parse_content_type(content_type: str) -> Tuple[str, int]:
+    """
+    Split a stream content type into its encoding and sample rate.
+
+    Raises:
+        ValueError: If the content type is not one of SUPPORTED_CONTENT_TYPES
+    """
+    normalized = normalize_content_type(content_type)
+    if normalized not in SUPPORTED_CONTENT_TYPES:
+        raise ValueError(f"Unsupported stream content type: {content_type}")
+    encoding, rate = normalized.split(";rate=")
+    return encoding, int(rate)
+
+def decode(payload: bytes, encoding: str) -> np.ndarray:
+    """Decode a payload into int16 samples at its own sample rate."""
+    if encoding == "audio/x-l16":
+        # A trailing odd byte is not a whole sample and is dropped
+        return np.frombuffer(payload, dtype=_PCM, count=len(payload) // 2)
+    codes = np.frombuffer(payload, dtype=np.uint8)
+    return (MULAW_DECODE if encoding == "audio/x-mulaw" else ALAW_DECODE)[codes]
+
+def encode(samples: np.ndarray, encoding: str) -> bytes:
+    """Encode int16 samples into a payload."""
+    if encoding == "audio/x-l16":
+        return samples.astype(_PCM, copy=False).tobytes()
+    table = MULAW_ENCODE if encoding == "audio/x-mulaw" else ALAW_ENCODE
+    return table[samples.astype(np.int16, copy=False).view(np.uint16)].tobytes()
+
+def upsample_2x(samples: np.ndarray) -> np.ndarray:
+    """8 kHz -> 16 kHz by linear interpolation between neighbouring samples."""
+    wide = samples.astype(np.int32)
+    out = np.empty(len(samples) * 2, dtype=np.int16)
+    out[0::2] = samples
+    out[1:-1:2] = (wide[:-1] + wide[1:]) >> 1
+    if len(samples):
+        out[-1] = samples[-1]
+    return out
+
+def downsample_2x(samples: np.ndarray) -> np.ndarray:
+    """16 kHz -> 8 kHz, averaging each pair of samples as a simple anti-alias filter."""
+    even = samples[0:len(samples) & ~1:2].astype(np.int32)
+    odd = samples[1::2].astype(np.int32)
+    return ((even + odd) >> 1).astype(np.int16)
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    if from_rate == to_rate:
+        return samples
+    if to_rate == from_rate * 2:
+        return upsample_2x(samples)
+    if from_rate == to_rate * 2:
+        return downsample_2x(samples)
+    raise ValueError(f"Unsupported resampling: {from_rate} Hz -> {to_rate} Hz")
+
+class Transcoder:
+    """
+    Converts payloads from one stream content type to another.
+
+    Build once per stream direction and call per frame; matching content
+    types return the payload untouched.
+    """
+
+    def __init__(self, source: str, target: str):
+        self.source = normalize_content_type(source)
+        self.target = normalize_content_type(target)
+        self._source = parse_content_type(self.source)
+        self._target = parse_content_type(self.target)
+        self.passthrough = self.source == self.target
+
+    def __call__(self, payload: bytes) -> bytes:
+        if self.passthrough:
+            return payload
+        source_encoding, source_rate = self._source
+        target_encoding, target_rate = self._target
+        samples = resample(decode(payload, source_encoding), source_rate, target_rate)
+        return encode(samples, target_encoding)
+
+_transcoders: Dict[Tuple[str, str], Transcoder] = {}
+
+def get_transcoder(source: str, target: str) -> Callable[[bytes], bytes]:
+    """Return a shared Transcoder for a pair of content types."""
+    key = (normalize_content_type(source), normalize_content_type(target))
+    transcoder = _transcoders.get(key)
+    if transcoder is None:
+        transcoder = _transcoders[key] = Transcoder(*key)
+    return transcoder
+
+def transcode(payload: bytes, source: str, target: str) -> bytes:
+    return get_transcoder(source, target)(payload)
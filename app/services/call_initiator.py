@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.services.call_registry import CallRegistry
+from app.services.join_url_pool import JoinUrlPool
+from app.services.plivo_service import PlivoService
+from app.services.ultravox_service import UltravoxService
+from app.utils.background_loop import background_loop, BackgroundLoop
+from app.utils.logger import get_logger
+from app.utils.metrics import observe_stage, span
+
+logger = get_logger(__name__)
+
+class InitiationQueueFull(Exception):
+    """Raised when too many async initiations are already pending."""
+
+class CallInitiator:
+    """
+    Runs call initiations as a non-blocking Ultravox -> Plivo pipeline.
+
+    Requests are accepted immediately and tracked by id; the two upstream
+    legs run on a background event loop with at most
+    INITIATION_MAX_IN_FLIGHT initiations talking to upstreams at once.
+    """
+
+    def __init__(self, ultravox_service: UltravoxService, plivo_service: PlivoService,
+                 join_url_pool: Optional[JoinUrlPool] = None, call_registry: Optional[CallRegistry] = None,
+                 loop: BackgroundLoop = background_loop):
+        self.ultravox_service = ultravox_service
+        self.plivo_service = plivo_service
+        self.join_url_pool = join_url_pool
+        self.call_registry = call_registry
+        self.loop = loop
+        self.max_in_flight = settings.INITIATION_MAX_IN_FLIGHT
+        self.max_pending = settings.INITIATION_MAX_PENDING
+        self.result_ttl = settings.INITIATION_RESULT_TTL
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._pending = 0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, to_number: str, overrides: Optional[Dict[str, Any]] = None,
+               content_type: Optional[str] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Accept an initiation and schedule it without waiting for upstreams.
+
+        Args:
+            to_number: The destination phone number
+            overrides: Optional per-call Ultravox payload overrides
+            content_type: Optional audio format of the call's Plivo stream
+            profile: Optional agent profile name
+
+        Returns:
+            The tracking record for the new initiation
+        """
+        with self._lock:
+            self._prune()
+            if self._pending >= self.max_pending:
+                raise InitiationQueueFull(f"{self._pending} initiations already pending")
+
+            tracking_id = uuid.uuid4().hex
+            record = {
+                "tracking_id": tracking_id,
+                "status": "queued",
+                "to_number": to_number,
+                "profile": profile,
+                "submitted_at": time.time(),
+                "completed_at": None,
+                "ultravox_call_id": None,
+                "plivo_call_uuid": None,
+                "error": None
+            }
+            self._records[tracking_id] = record
+            self._pending += 1
+            snapshot = dict(record)
+
+        self.loop.submit(self._run(tracking_id, overrides, content_type, profile))
+        logger.info("Accepted async call initiation %s to %s", tracking_id, to_number)
+        return snapshot
+
+    def get_status(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the tracking record, or None if unknown or expired."""
+        with self._lock:
+            record = self._records.get(tracking_id)
+            if record is None:
+                return None
+            status = dict(record)
+
+        end = status["completed_at"] or time.time()
+        status["elapsed_time"] = f"{end - status['submitted_at']:.2f}s"
+        return status
+
+    async def initiate(self, to_number: str, overrides: Optional[Dict[str, Any]] = None,
+                       content_type: Optional[str] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create the Ultravox call and dial it out through Plivo.
+
+        Args:
+            to_number: The destination phone number
+            overrides: Optional per-call Ultravox payload overrides
+            content_type: Optional audio format of the call's Plivo stream
+            profile: Optional agent profile name, defaults to DEFAULT_AGENT_PROFILE
+
+        Returns:
+            Dict with the Ultravox call id, join URL and Plivo request_uuid
+        """
+        # Pooled calls were created with the default profile's payload
+        ultravox_data = None
+        if self.join_url_pool and not overrides and self.ultravox_service.profiles.is_default(profile):
+            ultravox_data = self.join_url_pool.acquire()
+        if ultravox_data is None:
+            ultravox_data = await self.ultravox_service.create_call_async(overrides, profile)
+        if not isinstance(ultravox_data, dict):
+            raise ValueError(f"Unexpected response format: {ultravox_data}")
+
+        join_url = ultravox_data.get("joinUrl")
+        if not join_url:
+            raise ValueError("No joinUrl in response")
+
+        plivo_response = await self.plivo_service.create_call_async(
+            join_url, to_number=to_number, content_type=content_type
+        )
+        if self.call_registry is not None:
+            # May write to SQLite, which must not stall the shared loop
+            await asyncio.to_thread(
+                self.call_registry.register,
+                request_uuid=plivo_response["request_uuid"],
+                ultravox_call_id=ultravox_data.get("callId"),
+                join_url=join_url,
+                to_number=to_number
+            )
+        return {
+            "ultravox_call_id": ultravox_data.get("callId"),
+            "join_url": join_url,
+            "plivo_call_uuid": plivo_response["request_uuid"]
+        }
+
+    async def _run(self, tracking_id: str, overrides: Optional[Dict[str, Any]] = None,
+                   content_type: Optional[str] = None, profile: Optional[str] = None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._semaphore:
+            self._update(tracking_id, status="in_progress")
+            record = self._records[tracking_id]
+            to_number = record["to_number"]
+            observe_stage("initiation_queue_wait", time.time() - record["submitted_at"])
+            try:
+                with span("call_initiation"):
+                    result = await self.initiate(to_number, overrides, content_type, profile)
+                self._update(
+                    tracking_id,
+                    status="completed",
+                    ultravox_call_id=result["ultravox_call_id"],
+                    plivo_call_uuid=result["plivo_call_uuid"],
+                    completed_at=time.time()
+                )
+                logger.info("Async call initiation %s completed, request_uuid=%s", tracking_id, result['plivo_call_uuid'])
+            except Exception as e:
+                self._update(tracking_id, status="failed", error=str(e), completed_at=time.time())
+                logger.error("Async call initiation %s failed: %s", tracking_id, str(e))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def _update(self, tracking_id: str, **fields):
+        with self._lock:
+            record = self._records.get(tracking_id)
+            if record is not None:
+                record.update(fields)
+
+    def _prune(self):
+        """Drop finished records older than INITIATION_RESULT_TTL. Caller holds the lock."""
+        now = time.time()
+        if now - self._last_prune < 1.0:
+            return
+        self._last_prune = now
+        cutoff = now - self.result_ttl
+        expired = [
+            tracking_id for tracking_id, record in self._records.items()
+            if record["completed_at"] is not None and record["completed_at"] < cutoff
+        ]
+        for tracking_id in expired:
+            del self._records[tracking_id]
@@ -0,0 +1,291 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, Deque, Optional, Tuple
+from app.core.config import settings, parse_duration
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Statuses after which a call record only waits for eviction
+FINAL_STATUSES = {"completed", "busy", "failed", "timeout", "no-answer", "cancel", "canceled", "rejected", "ended"}
+
+# Columns, in CallRecord slot order
+_FIELDS = (
+    "request_uuid", "call_uuid", "ultravox_call_id", "join_url", "to_number",
+    "status", "end_reason", "created_at", "updated_at", "ended_at"
+)
+
+# Indexed ids; a record can be found by any of them
+ID_FIELDS = ("request_uuid", "call_uuid", "ultravox_call_id", "join_url")
+
+class CallRecord:
+    """The ids and state of one call. Slotted to keep thousands of live records small."""
+
+    __slots__ = _FIELDS
+
+    def __init__(self, **fields):
+        now = time.time()
+        for name in _FIELDS:
+            setattr(self, name, fields.get(name))
+        self.created_at = self.created_at or now
+        self.updated_at = self.updated_at or self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.ended_at is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in _FIELDS}
+
+def _insort(queue: Deque, item, key: Callable[[Any], float]):
+    """Insert into a deque sorted by key, scanning from the newest end where most inserts land."""
+    i = len(queue)
+    while i and key(queue[i - 1]) > key(item):
+        i -= 1
+    queue.insert(i, item)
+
+class CallRegistry:
+    """
+    Links Plivo request_uuid/CallUUID, the Ultravox call id and the joinUrl of each call.
+
+    Every id is indexed, so initiation, answer_url, status callbacks and
+    Ultravox events update the same record in O(1). Finished calls are kept
+    for CALL_REGISTRY_TTL seconds; calls that never report an end are
+    dropped after CALL_REGISTRY_MAX_AGE. With CALL_REGISTRY_DB set, every
+    change is also written to SQLite, and lookups and updates that miss
+    memory fall back to the database, so history survives restarts and
+    eviction and callbacks handled by another worker reach the stored row.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_age: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else settings.CALL_REGISTRY_TTL
+        self.max_age = max_age if max_age is not None else (
+            settings.CALL_REGISTRY_MAX_AGE or
+            parse_duration(settings.JOIN_TIMEOUT) + parse_duration(settings.MAX_CALL_DURATION) + 300
+        )
+        self.db_path = db_path if db_path is not None else settings.CALL_REGISTRY_DB
+
+        self._indexes: Dict[str, Dict[str, CallRecord]] = {name: {} for name in ID_FIELDS}
+        self._created: Deque[CallRecord] = deque()
+        self._ended: Deque[Tuple[float, CallRecord]] = deque()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._db: Optional[sqlite3.Connection] = None
+        self._active = 0
+        self.evicted = 0
+
+        if self.db_path:
+            self._open_db()
+
+    def register(self, **fields) -> CallRecord:
+        """
+        Record a call, or merge ids into the existing record for any id given.
+
+        Args:
+            **fields: CallRecord fields, e.g. request_uuid, ultravox_call_id, join_url
+
+        Returns:
+            The registered record
+        """
+        with self._lock:
+            self._prune()
+            record = self._find(fields)
+            if record is None:
+                record = CallRecord(status="initiated", **fields)
+                self._created.append(record)
+                self._active += 1
+                self._index(record)
+            else:
+                self._apply(record, fields)
+            self._persist(record)
+            return record
+
+    def update(self, status: Optional[str] = None, end_reason: Optional[str] = None, **ids) -> Optional[CallRecord]:
+        """
+        Update the status of the call matching any of the given ids, binding the other ids to it.
+
+        Args:
+            status: New call status; final statuses mark the call as ended
+            end_reason: Why the call ended, if known
+            **ids: Any of request_uuid, call_uuid, ultravox_call_id, join_url
+
+        Returns:
+            The updated record, or None if no call matches
+        """
+        ids = {name: value for name, value in ids.items() if value}
+        with self._lock:
+            self._prune()
+            record = self._find(ids)
+            if record is None:
+                return None
+
+            fields: Dict[str, Any] = dict(ids)
+            if status:
+                fields["status"] = status
+            if end_reason:
+                fields["end_reason"] = end_reason
+            self._apply(record, fields)
+
+            if status in FINAL_STATUSES and record.ended_at is None:
+                record.ended_at = record.updated_at
+                self._ended.append((record.ended_at, record))
+                self._active -= 1
+            self._persist(record)
+            return record
+
+    def get(self, call_id: str) -> Optional[CallRecord]:
+        """Find a call by any of its ids, falling back to the database when persistent."""
+        with self._lock:
+            for index in self._indexes.values():
+                record = index.get(call_id)
+                if record is not None:
+                    return record
+            return self._load(call_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "finished": len(self._ended),
+                "evicted": self.evicted,
+                "ttl": self.ttl,
+                "persistent": self._db is not None
+            }
+
+    def _find(self, ids: Dict[str, Any]) -> Optional[CallRecord]:
+        """
+        Find the record for any of the ids. Caller holds the lock.
+
+        When persistent, a call that is not in memory (registered by another
+        worker, evicted, or from before a restart) is loaded from the
+        database and indexed again, so updates reach its stored row.
+        """
+        for name in ID_FIELDS:
+            value = ids.get(name)
+            if value:
+                record = self._indexes[name].get(value)
+                if record is not None:
+                    return record
+        if self._db is None:
+            return None
+        for name in ID_FIELDS:
+            value = ids.get(name)
+            if value:
+                record = self._load_by(name, value)
+                if record is not None:
+                    self._adopt(record)
+                    return record
+        return None
+
+    def _adopt(self, record: CallRecord):
+        """
+        Track a record loaded from the database like a registered one. Caller holds the lock.
+
+        The record may be older than calls already in memory, so it is
+        inserted in time order; eviction then drops it once its own TTL or
+        max age has passed instead of holding it behind newer calls.
+        """
+        self._index(record)
+        _insort(self._created, record, lambda r: r.created_at)
+        if record.ended_at is None:
+            self._active += 1
+        else:
+            _insort(self._ended, (record.ended_at, record), lambda entry: entry[0])
+
+    def _apply(self, record: CallRecord, fields: Dict[str, Any]):
+        for name, value in fields.items():
+            if value is not None and name in _FIELDS:
+                setattr(record, name, value)
+        record.updated_at = time.time()
+        self._index(record)
+
+    def _index(self, record: CallRecord):
+        for name in ID_FIELDS:
+            value = getattr(record, name)
+            if value:
+                self._indexes[name][value] = record
+
+    def _unindex(self, record: CallRecord):
+        for name in ID_FIELDS:
+            value = getattr(record, name)
+            if value and self._indexes[name].get(value) is record:
+                del self._indexes[name][value]
+
+    def _prune(self):
+        """Evict finished calls past the TTL and stale unfinished ones. Caller holds the lock."""
+        now = time.time()
+        if now - self._last_prune < 1.0:
+            return
+        self._last_prune = now
+
+        while self._ended and self._ended[0][0] < now - self.ttl:
+            _, record = self._ended.popleft()
+            self._unindex(record)
+            self.evicted += 1
+
+        # Records leave _created in creation order; finished ones were already unindexed
+        while self._created and self._created[0].created_at < now - self.max_age:
+            record = self._created.popleft()
+            if record.ended_at is None:
+                self._unindex(record)
+                self._active -= 1
+                self.evicted += 1
+        while self._created and self._created[0].ended_at is not None and not self._indexed(self._created[0]):
+            self._created.popleft()
+
+    def _indexed(self, record: CallRecord) -> bool:
+        for name in ID_FIELDS:
+            value = getattr(record, name)
+            if value:
+                return self._indexes[name].get(value) is record
+        return False
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "request_uuid TEXT PRIMARY KEY, call_uuid TEXT, ultravox_call_id TEXT, join_url TEXT, "
+            "to_number TEXT, status TEXT, end_reason TEXT, created_at REAL, updated_at REAL, ended_at REAL)"
+        )
+        for name in ("call_uuid", "ultravox_call_id", "join_url"):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS calls_{name} ON calls ({name})")
+        logger.info("Call registry persisting to %s", self.db_path)
+
+    def _persist(self, record: CallRecord):
+        """Upsert a record keyed on request_uuid. Caller holds the lock."""
+        if self._db is None or not record.request_uuid:
+            return
+        try:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO calls ({', '.join(_FIELDS)}) VALUES ({', '.join('?' * len(_FIELDS))})",
+                tuple(getattr(record, name) for name in _FIELDS)
+            )
+        except sqlite3.Error as e:
+            logger.error("Failed to persist call %s: %s", record.request_uuid, str(e))
+
+    def _load(self, call_id: str) -> Optional[CallRecord]:
+        """Look a call up in the database by any id. Caller holds the lock."""
+        if self._db is None:
+            return None
+        for name in ID_FIELDS:
+            record = self._load_by(name, call_id)
+            if record is not None:
+                return record
+        return None
+
+    def _load_by(self, name: str, value: str) -> Optional[CallRecord]:
+        """Look a call up in the database by one id column. Caller holds the lock."""
+        try:
+            row = self._db.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM calls WHERE {name} = ? "
+                f"ORDER BY updated_at DESC LIMIT 1", (value,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error("Failed to load call %s=%s: %s", name, value, str(e))
+            return None
+        return CallRecord(**dict(zip(_FIELDS, row))) if row is not None else None
@@ -0,0 +1,385 @@
+import asyncio
+import csv
+import io
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Iterable
+from app.core.config import settings, parse_duration
+from app.services.call_registry import CallRegistry
+from app.services.plivo_service import PlivoService
+from app.services.ultravox_service import UltravoxService
+from app.utils.background_loop import background_loop, BackgroundLoop
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Plivo hangup callbacks only ever carry terminal statuses, but be explicit
+TERMINAL_CALL_STATUSES = {"completed", "busy", "failed", "timeout", "no-answer", "cancel", "canceled", "rejected"}
+
+def parse_csv_numbers(text: str) -> List[str]:
+    """
+    Extract phone numbers from CSV text.
+
+    Uses the to_number/number/phone column when there is a header row,
+    otherwise the first column of every row.
+    """
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return []
+
+    header = [cell.strip().lower() for cell in rows[0]]
+    for column in ("to_number", "number", "phone", "phone_number"):
+        if column in header:
+            index = header.index(column)
+            return [row[index] for row in rows[1:] if len(row) > index]
+
+    return [row[0] for row in rows if row]
+
+def normalize_numbers(numbers: Iterable[Any]) -> List[str]:
+    """Strip, de-duplicate and bound a list of target numbers, keeping order."""
+    seen = set()
+    result = []
+    for number in numbers:
+        number = str(number).strip().replace(" ", "").replace("-", "")
+        if not number or number in seen:
+            continue
+        seen.add(number)
+        result.append(number)
+
+    if len(result) > settings.CAMPAIGN_MAX_TARGETS:
+        raise ValueError(f"Campaign has {len(result)} targets, limit is {settings.CAMPAIGN_MAX_TARGETS}")
+    return result
+
+class CampaignUnavailable(Exception):
+    """Raised when campaigns cannot run correctly in this deployment."""
+
+class RateLimiter:
+    """Spaces acquisitions evenly at `rate` per second across all callers on one loop."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class CallSlots:
+    """
+    Caps concurrent Ultravox calls.
+
+    A slot is leased before the Ultravox call is created and held until Plivo
+    reports the hangup for its request_uuid. Leases also expire after
+    max_hold seconds so a lost hangup callback cannot leak capacity.
+    """
+
+    def __init__(self, capacity: int, max_hold: float):
+        self.capacity = capacity
+        self.max_hold = max_hold
+        self._semaphore = asyncio.Semaphore(capacity)
+        self._leases: Dict[str, float] = {}
+        self._keys: Dict[str, str] = {}
+
+    @property
+    def active(self) -> int:
+        return len(self._leases)
+
+    async def acquire(self) -> str:
+        await self._semaphore.acquire()
+        lease = uuid.uuid4().hex
+        self._leases[lease] = asyncio.get_running_loop().time() + self.max_hold
+        return lease
+
+    def bind(self, lease: str, key: str):
+        """Associate a lease with the Plivo request_uuid that will release it."""
+        if lease in self._leases:
+            self._keys[key] = lease
+
+    def release(self, lease: str):
+        if self._leases.pop(lease, None) is not None:
+            self._semaphore.release()
+
+    def release_key(self, key: str) -> bool:
+        lease = self._keys.pop(key, None)
+        if lease is None:
+            return False
+        self.release(lease)
+        return True
+
+    def sweep(self):
+        """Release leases held longer than max_hold."""
+        now = asyncio.get_running_loop().time()
+        for lease in [lease for lease, expiry in self._leases.items() if expiry <= now]:
+            self.release(lease)
+        for key in [key for key, lease in self._keys.items() if lease not in self._leases]:
+            del self._keys[key]
+
+class Campaign:
+    """Targets and progress counters for one dialing campaign."""
+
+    MAX_ERRORS = 100
+
+    def __init__(self, numbers: List[str], name: Optional[str] = None):
+        self.campaign_id = uuid.uuid4().hex
+        self.name = name or self.campaign_id
+        self.numbers = numbers
+        self.status = "pending"
+        self.cancelled = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.in_progress = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.errors: List[Dict[str, str]] = []
+        self.results: Dict[str, str] = {}
+
+    def record_success(self, number: str, request_uuid: str):
+        self.in_progress -= 1
+        self.succeeded += 1
+        self.results[number] = request_uuid
+
+    def record_failure(self, number: str, error: Exception):
+        self.in_progress -= 1
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({"to_number": number, "error": str(error)})
+
+    def record_skipped(self):
+        self.in_progress -= 1
+        self.skipped += 1
+
+    def to_dict(self, include_results: bool = False) -> Dict[str, Any]:
+        total = len(self.numbers)
+        done = self.succeeded + self.failed + self.skipped
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        data = {
+            "campaign_id": self.campaign_id,
+            "name": self.name,
+            "status": self.status,
+            "total": total,
+            "queued": total - done - self.in_progress,
+            "in_progress": self.in_progress,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "progress": round(done / total, 4) if total else 1.0,
+            "elapsed_time": f"{elapsed:.2f}s",
+            "calls_per_second": round(self.succeeded / elapsed, 3) if elapsed > 0 else 0.0,
+            "errors": self.errors
+        }
+        if include_results:
+            data["results"] = self.results
+        return data
+
+class CampaignDialer:
+    """
+    Drives campaigns through the Ultravox -> Plivo sequence on the background loop.
+
+    All campaigns share one Plivo calls-per-second limiter and one Ultravox
+    concurrent-call cap. Both, and the slots that Plivo hangups release,
+    live in this process, so campaigns only run with a single worker
+    (WEB_CONCURRENCY=1): with more, hangups land on workers that do not
+    hold the slot and every worker applies the limits on its own. Each campaign keeps up to CAMPAIGN_LOOKAHEAD
+    Ultravox calls created ahead of the dialer, so a Plivo slot is never
+    left waiting on an Ultravox round trip, while joinUrls are not created
+    so early that they hit joinTimeout.
+    """
+
+    MAX_HISTORY = 100
+
+    def __init__(self, ultravox_service: UltravoxService, plivo_service: PlivoService,
+                 call_registry: Optional[CallRegistry] = None, loop: BackgroundLoop = background_loop):
+        self.ultravox_service = ultravox_service
+        self.plivo_service = plivo_service
+        self.call_registry = call_registry
+        self.loop = loop
+        self.lookahead = max(1, settings.CAMPAIGN_LOOKAHEAD)
+        self.campaigns: Dict[str, Campaign] = {}
+        self._lock = threading.Lock()
+        self._rate: Optional[RateLimiter] = None
+        self._slots: Optional[CallSlots] = None
+
+    def create_campaign(self, numbers: List[str], name: Optional[str] = None) -> Campaign:
+        """
+        Register a campaign and start dialing it in the background.
+
+        Raises:
+            CampaignUnavailable: If more than one worker process is configured
+        """
+        if settings.WEB_CONCURRENCY > 1:
+            raise CampaignUnavailable(
+                f"Campaigns need a single worker process, WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}"
+            )
+        campaign = Campaign(numbers, name)
+        with self._lock:
+            self._prune()
+            self.campaigns[campaign.campaign_id] = campaign
+
+        self.loop.submit(self._run_campaign(campaign))
+        logger.info("Created campaign %s with %s targets", campaign.campaign_id, len(numbers))
+        return campaign
+
+    def get_campaign(self, campaign_id: str) -> Optional[Campaign]:
+        return self.campaigns.get(campaign_id)
+
+    def list_campaigns(self) -> List[Campaign]:
+        with self._lock:
+            return list(self.campaigns.values())
+
+    def cancel_campaign(self, campaign_id: str) -> Optional[Campaign]:
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is not None and campaign.status in ("pending", "running"):
+            campaign.cancelled = True
+            logger.info("Cancelling campaign %s", campaign_id)
+        return campaign
+
+    def call_finished(self, request_uuid: str):
+        """Free the concurrent-call slot held by a dialed call. Safe to call from any thread."""
+        if self._slots is not None and request_uuid:
+            self.loop.loop.call_soon_threadsafe(self._slots.release_key, request_uuid)
+
+    def limits(self) -> Dict[str, Any]:
+        return {
+            "calls_per_second": settings.PLIVO_CALLS_PER_SECOND,
+            "max_concurrent_calls": settings.ULTRAVOX_MAX_CONCURRENT_CALLS,
+            "active_calls": self._slots.active if self._slots else 0,
+            "lookahead": self.lookahead
+        }
+
+    def _ensure_limiters(self):
+        """Create the shared limiters on the loop that will use them."""
+        if self._slots is None:
+            max_hold = parse_duration(settings.JOIN_TIMEOUT) + parse_duration(settings.MAX_CALL_DURATION) + 60
+            self._rate = RateLimiter(settings.PLIVO_CALLS_PER_SECOND)
+            self._slots = CallSlots(settings.ULTRAVOX_MAX_CONCURRENT_CALLS, max_hold)
+            asyncio.get_running_loop().create_task(self._sweep_slots())
+
+    async def _sweep_slots(self):
+        while True:
+            await asyncio.sleep(5)
+            self._slots.sweep()
+
+    async def _run_campaign(self, campaign: Campaign):
+        self._ensure_limiters()
+        campaign.status = "running"
+        campaign.started_at = time.time()
+
+        prefetch = asyncio.Semaphore(self.lookahead)
+        ready: asyncio.Queue = asyncio.Queue()
+
+        try:
+            await asyncio.gather(
+                self._produce(campaign, prefetch, ready),
+                self._dial(campaign, prefetch, ready)
+            )
+            campaign.status = "cancelled" if campaign.cancelled else "completed"
+        except Exception as e:
+            logger.exception("Campaign %s aborted", campaign.campaign_id)
+            campaign.status = "failed"
+            campaign.errors.append({"to_number": "", "error": str(e)})
+        finally:
+            campaign.finished_at = time.time()
+            logger.info(
+                "Campaign %s %s: %s succeeded, %s failed, %s skipped",
+                campaign.campaign_id, campaign.status, campaign.succeeded, campaign.failed, campaign.skipped
+            )
+
+    async def _produce(self, campaign: Campaign, prefetch: asyncio.Semaphore, ready: asyncio.Queue):
+        """Create Ultravox calls ahead of the dialer, bounded by lookahead and the call cap."""
+        tasks = []
+        for number in campaign.numbers:
+            if campaign.cancelled:
+                break
+            await prefetch.acquire()
+            lease = await self._slots.acquire()
+            campaign.in_progress += 1
+            tasks.append(asyncio.ensure_future(self._prepare(campaign, number, lease, prefetch, ready)))
+
+        await asyncio.gather(*tasks)
+        await ready.put(None)
+
+    async def _prepare(self, campaign: Campaign, number: str, lease: str,
+                       prefetch: asyncio.Semaphore, ready: asyncio.Queue):
+        ultravox_data = None
+        try:
+            ultravox_data = await self.ultravox_service.create_call_async()
+            join_url = ultravox_data.get("joinUrl")
+            if not join_url:
+                raise ValueError("No joinUrl in response")
+            await ready.put((number, lease, ultravox_data))
+        except Exception as e:
+            prefetch.release()
+            self._slots.release(lease)
+            campaign.record_failure(number, e)
+            await self._discard(ultravox_data)
+
+    async def _dial(self, campaign: Campaign, prefetch: asyncio.Semaphore, ready: asyncio.Queue):
+        """Dial prepared calls through Plivo at the shared calls-per-second rate."""
+        tasks = []
+        while True:
+            item = await ready.get()
+            if item is None:
+                break
+
+            number, lease, ultravox_data = item
+            if campaign.cancelled:
+                prefetch.release()
+                self._slots.release(lease)
+                campaign.record_skipped()
+                tasks.append(asyncio.ensure_future(self._discard(ultravox_data)))
+                continue
+
+            await self._rate.acquire()
+            prefetch.release()
+            tasks.append(asyncio.ensure_future(self._place(campaign, number, lease, ultravox_data)))
+
+        await asyncio.gather(*tasks)
+
+    async def _place(self, campaign: Campaign, number: str, lease: str, ultravox_data: Dict[str, Any]):
+        placed = False
+        try:
+            join_url = ultravox_data["joinUrl"]
+            plivo_response = await self.plivo_service.create_call_async(join_url, to_number=number)
+            placed = True
+            request_uuid = plivo_response["request_uuid"]
+            self._slots.bind(lease, request_uuid)
+            if self.call_registry is not None:
+                await asyncio.to_thread(
+                    self.call_registry.register,
+                    request_uuid=request_uuid,
+                    ultravox_call_id=ultravox_data.get("callId"),
+                    join_url=join_url,
+                    to_number=number
+                )
+            campaign.record_success(number, request_uuid)
+        except Exception as e:
+            self._slots.release(lease)
+            campaign.record_failure(number, e)
+            if not placed:
+                await self._discard(ultravox_data)
+
+    async def _discard(self, ultravox_data: Optional[Dict[str, Any]]):
+        """Delete a prepared Ultravox call that will not be dialed, rather than leave it open until joinTimeout."""
+        call_id = ultravox_data.get("callId") if isinstance(ultravox_data, dict) else None
+        if not call_id:
+            return
+        try:
+            await self.ultravox_service.delete_call_async(call_id)
+        except Exception:
+            # Already logged by the service; the call still times out on Ultravox's side
+            pass
+
+    def _prune(self):
+        """Forget the oldest finished campaigns beyond MAX_HISTORY. Caller holds the lock."""
+        finished = [c for c in self.campaigns.values() if c.finished_at is not None]
+        excess = len(self.campaigns) - self.MAX_HISTORY
+        for campaign in sorted(finished, key=lambda c: c.finished_at)[:max(0, excess)]:
+            del self.campaigns[campaign.campaign_id]
@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (role, content, estimated tokens)
+Turn = Tuple[str, str, int]
+
+# summarizer(previous summary, turns to fold in, token limit) -> new summary
+Summarizer = Callable[[str, List[Turn], int], Awaitable[str]]
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+class Conversation:
+    """History of one call: a running summary plus the most recent turns."""
+
+    def __init__(self):
+        self.summary = ""
+        self.turns: Deque[Turn] = deque()
+        self.tokens = 0
+        # Turns cut from the buffer that the summarizer has not folded in yet
+        self.pending: List[Turn] = []
+        self.summarizing: Optional["asyncio.Task[None]"] = None
+        self.last_active = time.monotonic()
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the conversation so far: {self.summary}"})
+        messages.extend({"role": role, "content": content} for role, content, _ in self.turns)
+        return messages
+
+class ConversationStore:
+    """
+    Per-call conversation memory for the OpenAI voice path, keyed by CallUUID.
+
+    Each call keeps its recent turns in a buffer of at most
+    CONVERSATION_MAX_TOKENS estimated tokens. When a turn pushes the buffer
+    over the budget, the oldest turns are cut until it is back to half the
+    budget, and a background task folds them into a running summary of at
+    most CONVERSATION_SUMMARY_TOKENS. The prompt sent for a turn therefore
+    stays bounded however long the call runs, and no turn waits for a
+    summary to be written.
+
+    Conversations are dropped when Plivo reports the call finished, after
+    CONVERSATION_TTL idle seconds, or, least recently used first, beyond
+    CONVERSATION_MAX_CALLS. Thread-safe, since hangups may be processed by
+    the webhook ingestion workers.
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None, max_tokens: Optional[int] = None,
+                 summary_tokens: Optional[int] = None, ttl: Optional[float] = None,
+                 max_calls: Optional[int] = None, enabled: Optional[bool] = None):
+        self.summarizer = summarizer
+        self.max_tokens = settings.CONVERSATION_MAX_TOKENS if max_tokens is None else max_tokens
+        self.summary_tokens = settings.CONVERSATION_SUMMARY_TOKENS if summary_tokens is None else summary_tokens
+        self.ttl = settings.CONVERSATION_TTL if ttl is None else ttl
+        self.max_calls = settings.CONVERSATION_MAX_CALLS if max_calls is None else max_calls
+        self.enabled = settings.CONVERSATION_MEMORY_ENABLED if enabled is None else enabled
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.turns_added = 0
+        self.turns_folded = 0
+        self.turns_dropped = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.ended = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def messages(self, call_uuid: str) -> List[Dict[str, str]]:
+        """
+        Chat messages to send between the system prompt and the new user turn.
+
+        Returns:
+            The call's summary (as a system message) and recent turns, oldest first
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            conversation = self._conversations.get(call_uuid)
+            return conversation.messages() if conversation is not None else []
+
+    def add(self, call_uuid: str, role: str, content: str):
+        """
+        Append a turn to a call's history, summarizing older turns if it is over budget.
+
+        Args:
+            call_uuid: Plivo CallUUID of the call
+            role: "user" or "assistant"
+            content: What was said
+        """
+        if not self.enabled or not content:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if call_uuid in self._conversations:
+                # Most recently used before pruning, so capacity eviction never picks this call
+                self._conversations.move_to_end(call_uuid)
+            self._prune(now, adding=call_uuid not in self._conversations)
+            conversation = self._conversations.get(call_uuid)
+            if conversation is None:
+                conversation = self._conversations[call_uuid] = Conversation()
+            conversation.last_active = now
+
+            tokens = estimate_tokens(content)
+            conversation.turns.append((role, content, tokens))
+            conversation.tokens += tokens
+            self.turns_added += 1
+            if conversation.tokens <= self.max_tokens:
+                return
+
+            # Always keep the newest turn, even if it alone is over budget
+            while conversation.tokens > self.max_tokens // 2 and len(conversation.turns) > 1:
+                turn = conversation.turns.popleft()
+                conversation.tokens -= turn[2]
+                conversation.pending.append(turn)
+            if conversation.summarizing is None:
+                self._start_summary(call_uuid, conversation)
+
+    def end(self, call_uuid: str):
+        """Forget a call's history once it is over."""
+        with self._lock:
+            conversation = self._conversations.pop(call_uuid, None)
+            if conversation is None:
+                return
+            self.ended += 1
+        self._cancel(conversation)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conversations = list(self._conversations.values())
+            stats = {
+                "enabled": self.enabled,
+                "max_tokens": self.max_tokens,
+                "summary_tokens": self.summary_tokens,
+                "ttl": self.ttl,
+                "calls": len(conversations),
+                "summarizing": sum(1 for c in conversations if c.summarizing is not None),
+                "turns_added": self.turns_added,
+                "turns_folded": self.turns_folded,
+                "turns_dropped": self.turns_dropped,
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures,
+                "ended": self.ended,
+                "expired": self.expired,
+                "evicted": self.evicted
+            }
+            history_tokens = [c.tokens + (estimate_tokens(c.summary) if c.summary else 0) for c in conversations]
+        stats["history_tokens_avg"] = round(sum(history_tokens) / len(history_tokens), 1) if history_tokens else 0.0
+        stats["history_tokens_max"] = max(history_tokens, default=0)
+        return stats
+
+    def _start_summary(self, call_uuid: str, conversation: Conversation):
+        """Fold the pending turns into the summary in the background. Caller holds the lock."""
+        if self.summarizer is None:
+            self.turns_dropped += len(conversation.pending)
+            conversation.pending = []
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop to summarize on (a blocking caller): behave as a plain ring buffer
+            self.turns_dropped += len(conversation.pending)
+            conversation.pending = []
+            return
+        conversation.summarizing = loop.create_task(self._summarize(call_uuid, conversation))
+
+    async def _summarize(self, call_uuid: str, conversation: Conversation):
+        while True:
+            with self._lock:
+                turns, conversation.pending = conversation.pending, []
+                summary = conversation.summary
+                if not turns:
+                    conversation.summarizing = None
+                    return
+            try:
+                summary = await self.summarizer(summary, turns, self.summary_tokens)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error summarizing conversation for call %s: %s", call_uuid, str(e))
+                with self._lock:
+                    self.summary_failures += 1
+                    self.turns_dropped += len(turns)
+                continue
+
+            with self._lock:
+                # Guard against a summarizer that ignores the limit
+                conversation.summary = summary.strip()[:self.summary_tokens * 4]
+                self.summaries += 1
+                self.turns_folded += len(turns)
+
+    def _cancel(self, conversation: Conversation):
+        task = conversation.summarizing
+        if task is None or task.done():
+            return
+        # Hangups can arrive on an ingestion worker thread, not the task's loop
+        loop = task.get_loop()
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+    def _prune(self, now: float, adding: bool):
+        """
+        Drop idle conversations, then the least recently active beyond max_calls,
+        leaving room for one more when a new call is being added. Caller holds the lock.
+        """
+        dropped = []
+        if now - self._last_prune >= 1.0:
+            self._last_prune = now
+            expired = [key for key, c in self._conversations.items() if now - c.last_active >= self.ttl]
+            for key in expired:
+                dropped.append(self._conversations.pop(key))
+            self.expired += len(expired)
+        limit = self.max_calls - 1 if adding else self.max_calls
+        while self._conversations and len(self._conversations) > max(0, limit):
+            dropped.append(self._conversations.popitem(last=False)[1])
+            self.evicted += 1
+        for conversation in dropped:
+            self._cancel(conversation)
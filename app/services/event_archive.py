@@ -0,0 +1,209 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Archived event kinds
+TRANSCRIPTION = "transcription"
+CALL_ENDED = "call.ended"
+CALL_STATUS = "call_status"
+
+# Columns of the events table, in row order
+COLUMNS = (
+    "ts", "kind", "call_uuid", "request_uuid", "ultravox_call_id", "status", "reason", "role", "text"
+)
+
+Row = Tuple[Any, ...]
+
+def day_of(ts: float) -> str:
+    """UTC day partition of a Unix timestamp, e.g. 2026-10-17."""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+class EventArchive:
+    """
+    Batched archive of transcripts, call endings and Plivo call statuses.
+
+    record() only appends a row to an in-memory buffer, so webhook handling
+    never waits on disk. A background thread writes the buffer every
+    EVENT_ARCHIVE_FLUSH_INTERVAL seconds, or as soon as
+    EVENT_ARCHIVE_BATCH_SIZE rows are waiting, one transaction per day. Each
+    UTC day is its own SQLite file, events-YYYY-MM-DD.sqlite in
+    EVENT_ARCHIVE_DIR, with a single unindexed events table (see COLUMNS),
+    so a month of calls is about thirty files to scan and old days can be
+    deleted or moved file by file. Workers of the same host share the
+    day's file. Beyond EVENT_ARCHIVE_MAX_BUFFER unwritten rows, new rows
+    are dropped and counted rather than growing memory.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_buffer: Optional[int] = None):
+        self.archive_dir = settings.EVENT_ARCHIVE_DIR if archive_dir is None else archive_dir
+        self.batch_size = max(1, settings.EVENT_ARCHIVE_BATCH_SIZE if batch_size is None else batch_size)
+        self.flush_interval = settings.EVENT_ARCHIVE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_buffer = settings.EVENT_ARCHIVE_MAX_BUFFER if max_buffer is None else max_buffer
+        self.enabled = bool(self.archive_dir)
+
+        self._buffer: Deque[Row] = deque()
+        self._lock = threading.Lock()
+        # Serializes flushes between the background thread and close()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started = False
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_day: Optional[str] = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, kind: str, ts: Optional[float] = None, **fields: Any):
+        """
+        Buffer one event for the archive.
+
+        Args:
+            kind: TRANSCRIPTION, CALL_ENDED or CALL_STATUS
+            ts: Unix time of the event, now by default
+            **fields: Any other COLUMNS, e.g. call_uuid, status, text
+        """
+        if not self.enabled:
+            return
+        if not self._started:
+            self.start()
+        row = (time.time() if ts is None else ts, kind) + tuple(fields.get(name) for name in COLUMNS[2:])
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(row)
+            self.recorded += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.archive_dir, exist_ok=True)
+        threading.Thread(target=self._writer, name="event-archive", daemon=True).start()
+        # Write what is still buffered when the worker exits
+        atexit.register(self.close)
+        logger.info("Archiving call events to %s (batch=%s, interval=%ss)",
+                    self.archive_dir, self.batch_size, self.flush_interval)
+
+    def flush(self) -> int:
+        """
+        Write every buffered row.
+
+        Returns:
+            Number of rows written
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = list(self._buffer), deque()
+            if not rows:
+                return 0
+
+            start = time.perf_counter()
+            by_day: Dict[str, List[Row]] = {}
+            for row in rows:
+                by_day.setdefault(day_of(row[0]), []).append(row)
+            written = 0
+            for day, day_rows in sorted(by_day.items()):
+                try:
+                    self._write(day, day_rows)
+                    written += len(day_rows)
+                except (OSError, sqlite3.Error) as e:
+                    logger.error("Failed to archive %s events for %s: %s", len(day_rows), day, str(e))
+                    self._close_db()
+                    with self._lock:
+                        self.failed += len(day_rows)
+
+            with self._lock:
+                self.written += written
+                self.batches += 1
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return written
+
+    def close(self):
+        """Flush the buffer and close the current day's file."""
+        if not self.enabled:
+            return
+        self.flush()
+        with self._flush_lock:
+            self._close_db()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "archive_dir": self.archive_dir,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+                "buffered": len(self._buffer),
+                "max_buffer": self.max_buffer,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "current_file": self._path(self._db_day) if self._db_day else None
+            }
+
+    def _writer(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Event archive flush failed")
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.archive_dir, f"events-{day}.sqlite")
+
+    def _write(self, day: str, rows: List[Row]):
+        """Append rows to a day's file in one transaction. Caller holds the flush lock."""
+        db = self._open(day)
+        with db:
+            db.executemany(
+                f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+
+    def _open(self, day: str) -> sqlite3.Connection:
+        """Connection to a day's file; only the latest day is kept open. Caller holds the flush lock."""
+        if self._db is not None and self._db_day == day:
+            return self._db
+        # Late rows for an earlier day reopen its file once, then today's is reopened
+        self._close_db()
+        db = sqlite3.connect(self._path(day), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "ts REAL, kind TEXT, call_uuid TEXT, request_uuid TEXT, ultravox_call_id TEXT, "
+            "status TEXT, reason TEXT, role TEXT, text TEXT)"
+        )
+        self._db, self._db_day = db, day
+        return db
+
+    def _close_db(self):
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+        self._db, self._db_day = None, None
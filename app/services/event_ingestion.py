@@ -0,0 +1,238 @@
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.campaign_service import TERMINAL_CALL_STATUSES
+from app.services.event_archive import CALL_ENDED, CALL_STATUS, TRANSCRIPTION
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Event kinds accepted by the webhook endpoints
+ULTRAVOX_EVENT = "ultravox"
+STREAM_EVENT = "stream"
+CALL_STATUS_EVENT = "call_status"
+
+# (kind, payload, monotonic time it was enqueued)
+Event = Tuple[str, Dict[str, Any], float]
+
+def _ultravox_call_id(data: Dict[str, Any]) -> Optional[str]:
+    """Ultravox events carry the call id at the top level or inside a call object."""
+    call = data.get("call")
+    if isinstance(call, dict):
+        return call.get("callId")
+    return data.get("callId")
+
+class WebhookEventProcessor:
+    """
+    Handles Ultravox events, Plivo stream events and Plivo call status updates.
+
+    Shared by the inline path, where the endpoint calls it before answering,
+    and the queued path, where ingestion workers call it in batches.
+    """
+
+    def __init__(self, intent_router, campaign_dialer, call_registry=None, conversations=None, archive=None):
+        self.intent_router = intent_router
+        self.campaign_dialer = campaign_dialer
+        self.call_registry = call_registry
+        self.conversations = conversations
+        self.archive = archive
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {
+            ULTRAVOX_EVENT: self.ultravox_event,
+            STREAM_EVENT: self.stream_event,
+            CALL_STATUS_EVENT: self.call_status,
+        }
+
+    def process(self, kind: str, data: Dict[str, Any]):
+        self._handlers[kind](data)
+
+    def process_batch(self, events: List[Event]) -> int:
+        """
+        Process a batch of queued events, isolating failures per event.
+
+        Returns:
+            Number of events that raised
+        """
+        failed = 0
+        for kind, data, _ in events:
+            try:
+                self.process(kind, data)
+            except Exception:
+                failed += 1
+                logger.exception("Failed to process %s event", kind)
+        return failed
+
+    def ultravox_event(self, data: Dict[str, Any]):
+        event_type = data.get("type")
+        if not event_type:
+            return
+        logger.info("Ultravox event type: %s", event_type)
+
+        if event_type == "transcription":
+            text = data.get("text", "")
+            logger.info("User said: %s", text)
+
+            # Create a response based on user's text
+            intent, response_text = self.intent_router.route(text)
+            logger.info("AI response (%s): %s", intent, response_text)
+            if self.archive is not None:
+                self.archive.record(
+                    TRANSCRIPTION, ultravox_call_id=_ultravox_call_id(data), role=data.get("role"), text=text
+                )
+
+        elif event_type == "call.ended":
+            reason = data.get("reason", "unknown")
+            logger.info("Call ended. Reason: %s", reason)
+            if self.call_registry is not None:
+                self.call_registry.update(status="ended", end_reason=reason, ultravox_call_id=_ultravox_call_id(data))
+            if self.archive is not None:
+                self.archive.record(CALL_ENDED, ultravox_call_id=_ultravox_call_id(data), status="ended", reason=reason)
+
+    def stream_event(self, data: Dict[str, Any]):
+        event = data.get("event")
+        if not event:
+            return
+        logger.info("Plivo stream event: %s", event)
+
+        if event == "stream.start":
+            logger.info("Audio streaming has started!")
+        elif event == "stream.end":
+            logger.info("Audio streaming has ended!")
+
+    def call_status(self, data: Dict[str, Any]):
+        call_uuid = data.get("CallUUID", "unknown")
+        call_status = data.get("CallStatus", "unknown")
+        logger.info("Call %s status: %s", call_uuid, call_status)
+
+        if self.archive is not None:
+            self.archive.record(
+                CALL_STATUS,
+                call_uuid=data.get("CallUUID"),
+                request_uuid=data.get("RequestUUID"),
+                status=call_status,
+                reason=data.get("HangupCause")
+            )
+
+        if self.call_registry is not None:
+            self.call_registry.update(
+                status=call_status,
+                end_reason=data.get("HangupCause"),
+                request_uuid=data.get("RequestUUID"),
+                call_uuid=data.get("CallUUID")
+            )
+
+        # Once the call is over, free its campaign dialer slot and forget its conversation
+        if call_status in TERMINAL_CALL_STATUSES:
+            self.campaign_dialer.call_finished(data.get("RequestUUID", ""))
+            if self.conversations is not None and data.get("CallUUID"):
+                self.conversations.end(data["CallUUID"])
+
+class EventIngestor:
+    """
+    Bounded in-process queue in front of a batch handler.
+
+    submit() never blocks: it either enqueues the event or counts it as
+    dropped, so webhook endpoints can ack immediately. Worker threads drain
+    up to batch_size events at a time and hand them to the handler. Workers
+    are started lazily, so each gunicorn worker starts its own after the fork.
+    """
+
+    LAG_SMOOTHING = 0.1
+
+    def __init__(self, handler: Callable[[List[Event]], int],
+                 max_size: Optional[int] = None,
+                 workers: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.handler = handler
+        self.max_size = max_size if max_size is not None else settings.WEBHOOK_QUEUE_SIZE
+        self.workers = max(1, workers if workers is not None else settings.WEBHOOK_WORKERS)
+        self.batch_size = max(1, batch_size if batch_size is not None else settings.WEBHOOK_BATCH_SIZE)
+
+        self._queue: "queue.Queue[Event]" = queue.Queue(maxsize=self.max_size)
+        self._lock = threading.Lock()
+        self._started = False
+
+        self.accepted = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.lag_last = 0.0
+        self.lag_avg = 0.0
+        self.lag_max = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"webhook-ingest-{index}", daemon=True)
+            thread.start()
+        logger.info("Started %s webhook ingestion workers (queue=%s, batch=%s)",
+                    self.workers, self.max_size, self.batch_size)
+
+    def submit(self, kind: str, data: Dict[str, Any]) -> bool:
+        """
+        Enqueue an event without blocking.
+
+        Returns:
+            False if the queue is full and the event was dropped
+        """
+        if not self._started:
+            self.start()
+        try:
+            self._queue.put_nowait((kind, data, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        # Unlocked increment: a lost update only skews a counter
+        self.accepted += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self._started,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "depth": self._queue.qsize(),
+            "capacity": self.max_size,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "lag_last": round(self.lag_last, 6),
+            "lag_avg": round(self.lag_avg, 6),
+            "lag_max": round(self.lag_max, 6)
+        }
+
+    def _next_batch(self) -> List[Event]:
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            # Lag of the oldest event in the batch: time from enqueue to pickup
+            lag = time.monotonic() - batch[0][2]
+            try:
+                failed = self.handler(batch)
+            except Exception:
+                logger.exception("Webhook ingestion handler failed on a batch of %s", len(batch))
+                failed = len(batch)
+
+            with self._lock:
+                self.batches += 1
+                self.processed += len(batch)
+                self.failed += failed
+                self.lag_last = lag
+                self.lag_avg += self.LAG_SMOOTHING * (lag - self.lag_avg)
+                self.lag_max = max(self.lag_max, lag)
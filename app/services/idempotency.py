@@ -0,0 +1,146 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request."""
+
+def request_fingerprint(**params: Any) -> str:
+    """Stable hash of the parameters that decide what a request does."""
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    """
+    Coalesces duplicate requests and replays their responses.
+
+    The first request for a key claims it and runs; requests with the same
+    key that arrive while it runs wait on its Future instead of starting
+    their own, and requests that arrive after it succeeded get its response
+    until the entry expires. Failed responses are shared with the waiters
+    but not kept, so a later retry runs again.
+
+    Keys come from the client (Idempotency-Key, kept IDEMPOTENCY_KEY_TTL
+    seconds) or, without one, are derived from the request fingerprint and
+    kept IDEMPOTENCY_WINDOW seconds, which catches double clicks and
+    client retries. Thread-safe; futures can be awaited from async code
+    with asyncio.wrap_future.
+    """
+
+    def __init__(self, key_ttl: Optional[float] = None, window: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.key_ttl = settings.IDEMPOTENCY_KEY_TTL if key_ttl is None else key_ttl
+        self.window = settings.IDEMPOTENCY_WINDOW if window is None else window
+        self.max_entries = settings.IDEMPOTENCY_MAX_ENTRIES if max_entries is None else max_entries
+        # key -> [fingerprint, future, ttl, expires_at (None while in flight)]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.started = 0
+        self.coalesced = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def key_for(self, client_key: Optional[str], fingerprint: str) -> Tuple[Optional[str], float]:
+        """
+        Pick the key and retention for a request.
+
+        Returns:
+            Tuple of (key, seconds to keep a successful response); the key
+            is None when the client sent none and IDEMPOTENCY_WINDOW is 0
+        """
+        if client_key:
+            return f"key:{client_key}", self.key_ttl
+        if self.window > 0:
+            return f"auto:{fingerprint}", self.window
+        return None, 0.0
+
+    def claim(self, key: str, fingerprint: str, ttl: float) -> Tuple[bool, "Future[Tuple]"]:
+        """
+        Claim a key, or join the request that already holds it.
+
+        Returns:
+            Tuple of (owner, future). The owner must run the request and
+            call resolve(); everyone else waits on the future, which is
+            already done when a cached response is replayed.
+
+        Raises:
+            IdempotencyConflict: If the key was used with different parameters
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict("Idempotency key was already used with different parameters")
+                if entry[1].done():
+                    self.replayed += 1
+                else:
+                    self.coalesced += 1
+                return False, entry[1]
+
+            future: "Future[Tuple]" = Future()
+            self._entries[key] = [fingerprint, future, ttl, None]
+            self.started += 1
+            return True, future
+
+    def resolve(self, key: str, future: "Future[Tuple]", response: Tuple, keep: bool):
+        """
+        Hand the owner's response to every waiter.
+
+        Args:
+            key: The claimed key
+            future: The future returned by claim()
+            response: Flask-style (body, status[, headers]) tuple
+            keep: Replay the response to later requests until the key expires
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is future:
+                if keep:
+                    entry[3] = time.monotonic() + entry[2]
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+        future.set_result(response)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = sum(1 for entry in self._entries.values() if entry[3] is None)
+            return {
+                "entries": len(self._entries),
+                "in_flight": in_flight,
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "replayed": self.replayed,
+                "conflicts": self.conflicts,
+                "key_ttl": self.key_ttl,
+                "window": self.window
+            }
+
+    def _prune(self, now: float):
+        """Drop expired responses, then the oldest ones beyond max_entries. Caller holds the lock."""
+        if now - self._last_prune >= 1.0:
+            self._last_prune = now
+            expired = [key for key, entry in self._entries.items() if entry[3] is not None and entry[3] <= now]
+            for key in expired:
+                del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            # In-flight entries are never dropped, waiters still hold them
+            for key in [key for key, entry in self._entries.items() if entry[3] is not None]:
+                del self._entries[key]
+                if len(self._entries) < self.max_entries:
+                    break
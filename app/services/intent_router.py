@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Pattern, Tuple
+from app.core.config import settings, DEFAULT_INTENT_KEYWORDS, DEFAULT_RESPONSE_TEMPLATES
+from app.utils.logger import get_logger
+from app.utils.metrics import span
+
+logger = get_logger(__name__)
+
+def compile_intents(intents: Dict[str, List[str]]) -> Pattern:
+    """
+    Compile all intent keywords into one regex.
+
+    Each intent becomes a capture group, in priority order, inside a
+    lookahead so every position of the text is tried once and overlapping
+    keywords are still seen. At any position the first group that matches
+    is the highest-priority intent starting there. Keywords only match
+    whole words, so "hi" is not found in "this".
+    """
+    groups = []
+    for keywords in intents.values():
+        # Longest first so a keyword is never shadowed by its own prefix
+        alternatives = sorted((re.escape(k.lower()) for k in keywords if k), key=len, reverse=True)
+        # An intent without keywords still needs its group, or later intents would shift
+        groups.append(r"(?<!\w)(" + "|".join(alternatives) + r")(?!\w)" if alternatives else "((?!))")
+    return re.compile("(?=" + "|".join(groups) + ")")
+
+def check_templates(templates: object, source: str) -> Dict[str, str]:
+    """
+    Validate response templates: strings whose only placeholder is {text}.
+
+    Raises:
+        ValueError: If templates is not an object, or a template is not a
+            string or fails to format with only text=
+    """
+    if not isinstance(templates, dict):
+        raise ValueError(f"{source}: templates must be a JSON object")
+    for intent, template in templates.items():
+        if not isinstance(template, str):
+            raise ValueError(f"{source}: template {intent!r} must be a string")
+        try:
+            template.format(text="")
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(
+                f"{source}: template {intent!r} may only use the {{text}} placeholder "
+                f"(write literal braces as {{{{ and }}}}): {str(e)}"
+            )
+    return templates
+
+def check_intents(intents: object, source: str) -> Dict[str, List[str]]:
+    """
+    Validate intent keywords: an object mapping each intent to a list of strings.
+
+    Raises:
+        ValueError: If intents has any other shape
+    """
+    if not isinstance(intents, dict):
+        raise ValueError(f"{source}: intents must be a JSON object")
+    for intent, keywords in intents.items():
+        if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+            raise ValueError(f"{source}: keywords of intent {intent!r} must be a list of strings")
+    return intents
+
+class IntentRouter:
+    """
+    Maps transcribed caller text to a response template.
+
+    Templates and keywords are parsed and compiled once and kept in memory.
+    Sources are RESPONSE_TEMPLATES (JSON in the environment) and, on top of
+    it, RESPONSE_TEMPLATES_FILE. The file holds either a flat
+    {intent: template} object or {"templates": {...}, "intents": {intent: [keywords]}}.
+    The sources are re-checked at most every RESPONSE_TEMPLATES_RELOAD_INTERVAL
+    seconds and recompiled when they change, without restarting workers.
+    """
+
+    def __init__(self, templates_file: Optional[str] = None, reload_interval: Optional[float] = None):
+        self.templates_file = settings.RESPONSE_TEMPLATES_FILE if templates_file is None else templates_file
+        self.reload_interval = (
+            settings.RESPONSE_TEMPLATES_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        )
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._source_version: Tuple = ()
+        self.reloads = 0
+        # Swapped as one tuple so readers never see templates from one version
+        # and the pattern from another
+        self._compiled: Tuple[Dict[str, str], List[str], Pattern] = self._build({}, DEFAULT_INTENT_KEYWORDS)
+        self.reload(force=True)
+
+    def route(self, text: str) -> Tuple[str, str]:
+        """
+        Pick the intent and response for a transcription.
+
+        Args:
+            text: What the caller said
+
+        Returns:
+            Tuple of (intent name, response text)
+        """
+        if time.monotonic() >= self._next_check:
+            self.reload()
+
+        with span("template_match") as timing:
+            templates, intent_names, pattern = self._compiled
+            best = None
+            for match in pattern.finditer(text.lower()):
+                index = match.lastindex - 1
+                if best is None or index < best:
+                    best = index
+                    if best == 0:
+                        break
+
+            if best is None:
+                timing.outcome = "default"
+                return "default", templates["default"].format(text=text)
+            intent = intent_names[best]
+            if intent not in templates:
+                timing.outcome = "default"
+                return intent, templates["default"].format(text=text)
+            return intent, templates[intent]
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Recompile if the template sources changed since the last check.
+
+        Returns:
+            True if new templates were loaded
+        """
+        # Another thread is already checking; keep serving the current version
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            version = self._version()
+            if not force and version == self._source_version:
+                return False
+            self._source_version = version
+
+            try:
+                templates, intents = self._load()
+                self._compiled = self._build(templates, intents)
+            except (OSError, ValueError) as e:
+                logger.error("Keeping previous response templates, reload failed: %s", str(e))
+                return False
+        finally:
+            self._lock.release()
+
+        self.reloads += 1
+        logger.info("Loaded %s response templates and %s intents", len(self._compiled[0]), len(self._compiled[1]))
+        return True
+
+    def _version(self) -> Tuple:
+        env_templates = os.getenv("RESPONSE_TEMPLATES", "")
+        mtime = None
+        if self.templates_file:
+            try:
+                mtime = os.stat(self.templates_file).st_mtime_ns
+            except OSError:
+                mtime = -1
+        return (env_templates, mtime)
+
+    def _load(self) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """
+        Read the template sources.
+
+        Raises:
+            OSError: If the templates file cannot be read
+            ValueError: If a source is malformed, see check_templates and check_intents
+        """
+        templates = dict(check_templates(settings.get_response_templates(), "RESPONSE_TEMPLATES"))
+        intents = dict(DEFAULT_INTENT_KEYWORDS)
+
+        if self.templates_file and os.path.exists(self.templates_file):
+            with open(self.templates_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError(f"{self.templates_file} must contain a JSON object")
+            if isinstance(data.get("templates"), dict):
+                templates.update(check_templates(data["templates"], self.templates_file))
+                intents = check_intents(data.get("intents", intents), self.templates_file)
+            else:
+                templates.update(check_templates(data, self.templates_file))
+        return templates, intents
+
+    @staticmethod
+    def _build(templates: Dict[str, str], intents: Dict[str, List[str]]) -> Tuple[Dict[str, str], List[str], Pattern]:
+        merged = dict(DEFAULT_RESPONSE_TEMPLATES)
+        merged.update(templates)
+        return merged, list(intents), compile_intents(intents)
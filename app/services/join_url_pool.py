@@ -0,0 +1,229 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Deque, List, Optional, Tuple
+from app.core.config import settings, parse_duration
+from app.services.ultravox_service import UltravoxService
+from app.utils.background_loop import background_loop, BackgroundLoop
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class JoinUrlPool:
+    """
+    Keeps a few Ultravox calls pre-created so initiation only pays the Plivo leg.
+
+    Entries are handed out oldest-first and dropped once they are too old to
+    be joined: each must still have JOIN_URL_POOL_RING_MARGIN seconds of its
+    joinTimeout left for Plivo to dial, ring and answer. The target size
+    follows the recent request rate times the Ultravox creation latency,
+    clamped to [JOIN_URL_POOL_MIN_SIZE, JOIN_URL_POOL_MAX_SIZE], so an idle
+    pool with the default minimum of 0 creates nothing. Entries are built
+    with the default agent profile, so they are drained when a reload
+    replaces it. Expired and drained calls are deleted on Ultravox rather
+    than left to time out there.
+    """
+
+    TICK_INTERVAL = 0.5
+    RATE_TIME_CONSTANT = 30.0
+    HEADROOM = 1.5
+
+    def __init__(self, ultravox_service: UltravoxService, loop: BackgroundLoop = background_loop):
+        self.ultravox_service = ultravox_service
+        self.loop = loop
+        self.enabled = settings.JOIN_URL_POOL_ENABLED
+        self.min_size = settings.JOIN_URL_POOL_MIN_SIZE
+        self.max_size = max(settings.JOIN_URL_POOL_MAX_SIZE, self.min_size)
+        self.max_age = max(0.0, parse_duration(settings.JOIN_TIMEOUT) - settings.JOIN_URL_POOL_RING_MARGIN)
+
+        # (created_at, Ultravox call JSON, default AgentProfile it was built with)
+        self._entries: Deque[Tuple[float, Dict[str, Any], Any]] = deque()
+        self._lock = threading.Lock()
+        self._started = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._creating = 0
+        self._requests_since_tick = 0
+
+        self.target_size = self.min_size
+        self.request_rate = 0.0
+        self.create_latency = 1.0
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.expired = 0
+        self.drained = 0
+        self.deleted = 0
+        self.create_failures = 0
+        self.delete_failures = 0
+
+    def start(self):
+        """Start the background refill task. Called lazily on first acquire."""
+        if not self.enabled or self.max_age <= 0:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.loop.submit(self._refill_loop())
+        logger.info("Started joinUrl pool (min=%s, max=%s, max_age=%.1fs)", self.min_size, self.max_size, self.max_age)
+
+    def acquire(self) -> Optional[Dict[str, Any]]:
+        """
+        Take a pre-created Ultravox call if one is still fresh enough.
+
+        Returns:
+            The Ultravox call JSON containing joinUrl, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        if not self._started:
+            self.start()
+
+        now = time.monotonic()
+        profile = self.ultravox_service.profiles.get()
+        result = None
+        discarded: List[Dict[str, Any]] = []
+        with self._lock:
+            self._requests_since_tick += 1
+            while self._entries:
+                created_at, data, built_with = self._entries.popleft()
+                if now - created_at >= self.max_age:
+                    self.expired += 1
+                    discarded.append(data)
+                elif built_with is not profile:
+                    self.drained += 1
+                    discarded.append(data)
+                else:
+                    result = data
+                    break
+
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        self._discard(discarded)
+        self._signal()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "creating": self._creating,
+                "target_size": self.target_size,
+                "max_age": self.max_age,
+                "request_rate": round(self.request_rate, 3),
+                "create_latency": round(self.create_latency, 3),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "created": self.created,
+                "expired": self.expired,
+                "drained": self.drained,
+                "deleted": self.deleted,
+                "create_failures": self.create_failures,
+                "delete_failures": self.delete_failures
+            }
+
+    def _signal(self):
+        if self._wakeup is not None:
+            self.loop.loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _refill_loop(self):
+        self._wakeup = asyncio.Event()
+        last_tick = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.TICK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            now = time.monotonic()
+            self._update_target(now - last_tick)
+            last_tick = now
+            self._evict_expired(now)
+
+            with self._lock:
+                deficit = self.target_size - len(self._entries) - self._creating
+                self._creating += max(0, deficit)
+            for _ in range(deficit):
+                asyncio.ensure_future(self._create_one())
+
+    def _update_target(self, elapsed: float):
+        """Fold the requests seen since the last tick into the rate EWMA and resize."""
+        if elapsed <= 0:
+            return
+        with self._lock:
+            requests, self._requests_since_tick = self._requests_since_tick, 0
+
+        alpha = 1 - math.exp(-elapsed / self.RATE_TIME_CONSTANT)
+        self.request_rate += alpha * (requests / elapsed - self.request_rate)
+
+        # Enough entries to cover demand while replacements are being created,
+        # but never more than can be used before they age out
+        wanted = math.ceil(self.request_rate * self.create_latency * self.HEADROOM)
+        usable = math.ceil(self.request_rate * self.max_age) + 1
+        self.target_size = max(self.min_size, min(self.max_size, wanted, usable))
+
+    def _evict_expired(self, now: float):
+        """Drop entries too old to join, and those built with a default profile that has since been reloaded."""
+        profile = self.ultravox_service.profiles.get()
+        discarded: List[Dict[str, Any]] = []
+        with self._lock:
+            kept: Deque[Tuple[float, Dict[str, Any], Any]] = deque()
+            for entry in self._entries:
+                if now - entry[0] >= self.max_age:
+                    self.expired += 1
+                    discarded.append(entry[1])
+                elif entry[2] is not profile:
+                    self.drained += 1
+                    discarded.append(entry[1])
+                else:
+                    kept.append(entry)
+            self._entries = kept
+        self._discard(discarded)
+
+    def _discard(self, entries: List[Dict[str, Any]]):
+        """Delete the Ultravox calls of entries that will never be handed out."""
+        for data in entries:
+            call_id = data.get("callId")
+            if call_id:
+                self.loop.submit(self._delete_one(call_id))
+
+    async def _delete_one(self, call_id: str):
+        try:
+            await self.ultravox_service.delete_call_async(call_id)
+            with self._lock:
+                self.deleted += 1
+        except Exception:
+            # Already logged by the service; the call still times out on Ultravox's side
+            with self._lock:
+                self.delete_failures += 1
+
+    async def _create_one(self):
+        start = time.monotonic()
+        try:
+            profile = self.ultravox_service.profiles.get()
+            data = await self.ultravox_service.create_call_async(profile=profile.name)
+            if not data.get("joinUrl"):
+                raise ValueError("No joinUrl in response")
+            latency = time.monotonic() - start
+            with self._lock:
+                # Timestamp from the request start: joinTimeout runs from creation on Ultravox's side
+                self._entries.append((start, data, profile))
+                self.created += 1
+                self.create_latency += 0.2 * (latency - self.create_latency)
+        except Exception as e:
+            with self._lock:
+                self.create_failures += 1
+            logger.error("Failed to pre-create Ultravox call for pool: %s", str(e))
+            await asyncio.sleep(1)
+        finally:
+            with self._lock:
+                self._creating -= 1
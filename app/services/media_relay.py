@@ -0,0 +1,349 @@
+import asyncio
+import base64
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services import plivo_xml
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A buffered inbound frame: the original message text and when it arrived
+Frame = Tuple[str, float]
+
+class JitterBuffer:
+    """
+    Puts inbound media frames back in sequence order.
+
+    Frames that arrive in order are released immediately, so the buffer adds
+    no delay in the common case. Out-of-order frames are held until the gap
+    fills or `depth` frames are waiting, at which point the missing
+    sequence numbers are given up on and counted as lost.
+    """
+
+    def __init__(self, depth: int):
+        self.depth = max(0, depth)
+        self._next: Optional[int] = None
+        self._pending: Dict[int, Frame] = {}
+        self.lost = 0
+        self.late = 0
+        self.duplicates = 0
+        self.reordered = 0
+
+    def push(self, seq: int, frame: Frame) -> List[Frame]:
+        """Add a frame and return the frames now ready, in order."""
+        if self._next is None:
+            self._next = seq
+        if seq < self._next:
+            self.late += 1
+            return []
+        if seq in self._pending:
+            self.duplicates += 1
+            return []
+        if seq == self._next and self._pending:
+            # Arrived after frames that were sent later
+            self.reordered += 1
+
+        self._pending[seq] = frame
+        ready = self._drain()
+        if len(self._pending) > self.depth:
+            # Give up on the gap in front of the oldest waiting frame
+            oldest = min(self._pending)
+            self.lost += oldest - self._next
+            self._next = oldest
+            ready.extend(self._drain())
+        return ready
+
+    def flush(self) -> List[Frame]:
+        """Release everything still waiting, counting remaining gaps as lost."""
+        ready = []
+        for seq in sorted(self._pending):
+            self.lost += seq - self._next
+            ready.append(self._pending[seq])
+            self._next = seq + 1
+        self._pending.clear()
+        return ready
+
+    def _drain(self) -> List[Frame]:
+        ready = []
+        while self._next in self._pending:
+            ready.append(self._pending.pop(self._next))
+            self._next += 1
+        return ready
+
+class StreamStats:
+    """Frame counters, interarrival jitter and relay latency for one bridged stream."""
+
+    __slots__ = (
+        "call_id", "stream_id", "started_at", "ended_at",
+        "frames_in", "frames_out", "bytes_in", "bytes_out", "frames_to_caller", "bytes_to_caller",
+        "jitter_ms", "_last_transit", "latencies", "latency_max", "buffer"
+    )
+
+    LATENCY_SAMPLES = 512
+
+    def __init__(self, jitter_depth: int):
+        self.call_id: Optional[str] = None
+        self.stream_id: Optional[str] = None
+        self.started_at = time.time()
+        self.ended_at: Optional[float] = None
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_to_caller = 0
+        self.bytes_to_caller = 0
+        self.jitter_ms = 0.0
+        self._last_transit: Optional[float] = None
+        self.latencies: Deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+        self.latency_max = 0.0
+        self.buffer = JitterBuffer(jitter_depth)
+
+    def on_inbound(self, timestamp_ms: Optional[float], arrival: float, size: int):
+        """Count a caller frame and fold its transit time into the RFC 3550 jitter estimate."""
+        self.frames_in += 1
+        self.bytes_in += size
+        if timestamp_ms is None:
+            return
+        transit = arrival * 1000.0 - timestamp_ms
+        if self._last_transit is not None:
+            self.jitter_ms += (abs(transit - self._last_transit) - self.jitter_ms) / 16.0
+        self._last_transit = transit
+
+    def on_forwarded(self, arrival: float, size: int):
+        """Record a caller frame handed to Ultravox, including any time spent buffered."""
+        latency = time.perf_counter() - arrival
+        self.frames_out += 1
+        self.bytes_out += size
+        self.latencies.append(latency)
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def to_dict(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+        expected = self.frames_out + self.buffer.lost
+        return {
+            "call_id": self.call_id,
+            "stream_id": self.stream_id,
+            "active": self.ended_at is None,
+            "duration": round((self.ended_at or time.time()) - self.started_at, 3),
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "frames_to_caller": self.frames_to_caller,
+            "bytes_to_caller": self.bytes_to_caller,
+            "lost": self.buffer.lost,
+            "loss_rate": round(self.buffer.lost / expected, 5) if expected else 0.0,
+            "late": self.buffer.late,
+            "duplicates": self.buffer.duplicates,
+            "reordered": self.buffer.reordered,
+            "jitter_ms": round(self.jitter_ms, 3),
+            "relay_latency_p50_ms": round(samples[len(samples) // 2] * 1000, 3) if samples else 0.0,
+            "relay_latency_p99_ms": round(samples[int(len(samples) * 0.99)] * 1000, 3) if samples else 0.0,
+            "relay_latency_max_ms": round(self.latency_max * 1000, 3)
+        }
+
+# Ultravox's Plivo medium always carries wideband L16
+AGENT_CONTENT_TYPE = plivo_xml.DEFAULT_STREAM_CONTENT_TYPE
+
+class StreamTranscoder:
+    """
+    Converts media between the Plivo leg's audio format and Ultravox's L16 16 kHz.
+
+    Only used for streams whose content type differs from the agent's.
+    Every frame is re-encoded, so those frames are parsed and
+    re-serialized instead of being forwarded untouched.
+    """
+
+    def __init__(self, caller_content_type: str):
+        # NumPy is only loaded once a stream actually needs transcoding
+        from app.services import audio_codec
+
+        self.caller_content_type = audio_codec.normalize_content_type(caller_content_type)
+        self.encoding, self.rate = audio_codec.parse_content_type(self.caller_content_type)
+        self._to_agent = audio_codec.get_transcoder(self.caller_content_type, AGENT_CONTENT_TYPE)
+        self._get_transcoder = audio_codec.get_transcoder
+
+    def caller_event(self, event: Dict[str, Any]) -> str:
+        """
+        Re-encode a caller media frame, or relabel the start event, for Ultravox.
+
+        Like agent messages, a frame that cannot be transcoded (no media, or a
+        payload that is not base64) is logged and forwarded unchanged rather
+        than ending the bridge.
+        """
+        if event.get("event") == "media":
+            media = event.get("media")
+            try:
+                media["payload"] = base64.b64encode(self._to_agent(base64.b64decode(media["payload"]))).decode("ascii")
+            except (ValueError, TypeError, AttributeError, KeyError) as e:
+                logger.warning("Forwarding caller frame untranscoded: %s", str(e))
+        elif event.get("event") == "start":
+            start = event.get("start") or {}
+            encoding, rate = AGENT_CONTENT_TYPE.split(";rate=")
+            start["mediaFormat"] = {"encoding": encoding, "sampleRate": int(rate)}
+        return json.dumps(event)
+
+    def agent_message(self, message: str) -> str:
+        """
+        Re-encode the audio of a playAudio message for the Plivo leg.
+
+        A message that cannot be transcoded (malformed, or in a format with no
+        transcoder) is logged and forwarded unchanged, so it cannot end the
+        call's audio bridge.
+        """
+        try:
+            event = json.loads(message)
+            media = event.get("media")
+            if event.get("event") != "playAudio" or not isinstance(media, dict) or "payload" not in media:
+                return message
+            source = f"{media.get('contentType', 'audio/x-l16')};rate={media.get('sampleRate', 16000)}"
+            to_caller = self._get_transcoder(source, self.caller_content_type)
+            media["payload"] = base64.b64encode(to_caller(base64.b64decode(media["payload"]))).decode("ascii")
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Forwarding agent message untranscoded: %s", str(e))
+            return message
+        media["contentType"] = self.encoding
+        media["sampleRate"] = self.rate
+        return json.dumps(event)
+
+async def _connect_websocket(url: str):
+    import websockets # type: ignore
+    # No per-message deflate: audio frames do not compress and it costs a copy
+    return await websockets.connect(url, compression=None, max_size=2 ** 20)
+
+class MediaRelay:
+    """
+    Bridges a Plivo bidirectional audio stream to an Ultravox joinUrl.
+
+    Ultravox calls are created with the Plivo medium, so both legs speak
+    Plivo's stream protocol and messages are forwarded as received, with
+    no re-encoding. Caller media frames are only parsed for their sequence
+    number and timestamp, go through a small jitter buffer, and feed the
+    per-stream loss, jitter and latency statistics. Streams in a narrowband
+    format (e.g. 8 kHz mu-law) are transcoded to and from L16 16 kHz.
+    """
+
+    def __init__(self, jitter_depth: Optional[int] = None,
+                 connect: Callable[[str], Awaitable[Any]] = _connect_websocket):
+        self.jitter_depth = jitter_depth if jitter_depth is not None else settings.MEDIA_JITTER_BUFFER_FRAMES
+        self.connect = connect
+        self._active: Dict[int, StreamStats] = {}
+        self._finished: Deque[StreamStats] = deque(maxlen=settings.MEDIA_STATS_HISTORY)
+
+    async def bridge(self, plivo, join_url: str, content_type: Optional[str] = None) -> StreamStats:
+        """
+        Relay an accepted Plivo WebSocket to Ultravox until either side closes.
+
+        Args:
+            plivo: The accepted Starlette WebSocket from Plivo
+            join_url: The Ultravox joinUrl for this call
+            content_type: Audio format of the Plivo leg, defaults to the agent's L16 16 kHz
+
+        Returns:
+            The statistics for the stream
+        """
+        stats = StreamStats(self.jitter_depth)
+        key = id(stats)
+        self._active[key] = stats
+        upstream = None
+        try:
+            transcoder = None
+            if content_type and plivo_xml.stream_content_type(content_type) != AGENT_CONTENT_TYPE:
+                transcoder = StreamTranscoder(content_type)
+            upstream = await self.connect(join_url)
+            tasks = [
+                asyncio.ensure_future(self._caller_to_agent(plivo, upstream, stats, transcoder)),
+                asyncio.ensure_future(self._agent_to_caller(upstream, plivo, stats, transcoder)),
+            ]
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if task.exception() is not None:
+                    logger.warning("Media relay for call %s stopped: %s", stats.call_id, task.exception())
+        except Exception as e:
+            logger.error("Media relay for call %s failed: %s", stats.call_id, str(e))
+        finally:
+            stats.ended_at = time.time()
+            self._active.pop(key, None)
+            self._finished.append(stats)
+            if upstream is not None:
+                await upstream.close()
+            try:
+                await plivo.close()
+            except Exception:
+                pass  # Already closed by Plivo
+            logger.info(
+                "Media relay for call %s closed: %s frames in, %s lost, jitter %.1fms",
+                stats.call_id, stats.frames_in, stats.buffer.lost, stats.jitter_ms
+            )
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jitter_buffer_frames": self.jitter_depth,
+            "active": [stats.to_dict() for stats in list(self._active.values())],
+            "recent": [stats.to_dict() for stats in list(self._finished)]
+        }
+
+    def get(self, call_id: str) -> Optional[Dict[str, Any]]:
+        for stats in list(self._active.values()) + list(reversed(self._finished)):
+            if call_id in (stats.call_id, stats.stream_id):
+                return stats.to_dict()
+        return None
+
+    async def _caller_to_agent(self, plivo, upstream, stats: StreamStats,
+                               transcoder: Optional[StreamTranscoder] = None):
+        async for message in plivo.iter_text():
+            arrival = time.perf_counter()
+            try:
+                event = json.loads(message)
+            except ValueError:
+                await upstream.send(message)
+                continue
+
+            kind = event.get("event")
+            if kind == "media":
+                media = event.get("media") or {}
+                timestamp = media.get("timestamp")
+                stats.on_inbound(float(timestamp) if timestamp is not None else None, time.time(), len(message))
+                seq = event.get("sequenceNumber", media.get("chunk"))
+                if transcoder is not None:
+                    message = transcoder.caller_event(event)
+                if seq is None:
+                    await upstream.send(message)
+                    stats.on_forwarded(arrival, len(message))
+                    continue
+                for frame, frame_arrival in stats.buffer.push(int(seq), (message, arrival)):
+                    await upstream.send(frame)
+                    stats.on_forwarded(frame_arrival, len(frame))
+                continue
+
+            if kind == "start":
+                start = event.get("start") or {}
+                stats.call_id = start.get("callId")
+                stats.stream_id = start.get("streamId") or event.get("streamId")
+                logger.info("Media relay started for call %s", stats.call_id)
+                if transcoder is not None:
+                    message = transcoder.caller_event(event)
+            elif kind == "stop":
+                for frame, frame_arrival in stats.buffer.flush():
+                    await upstream.send(frame)
+                    stats.on_forwarded(frame_arrival, len(frame))
+            await upstream.send(message)
+
+    async def _agent_to_caller(self, upstream, plivo, stats: StreamStats,
+                               transcoder: Optional[StreamTranscoder] = None):
+        async for message in upstream:
+            if transcoder is not None and isinstance(message, str):
+                message = transcoder.agent_message(message)
+            stats.frames_to_caller += 1
+            stats.bytes_to_caller += len(message)
+            if isinstance(message, bytes):
+                await plivo.send_bytes(message)
+            else:
+                await plivo.send_text(message)
@@ -1,39 +1,302 @@
-import openai # type: ignore
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Any, Dict, List, Optional, Tuple
 from app.core.config import settings
 from app.utils.logger import get_logger
+from app.utils.metrics import observe_stage, span
+from app.utils.transport import http_clients
 
 logger = get_logger(__name__)
 
-# Configure OpenAI
-openai.api_key = settings.OPENAI_API_KEY
+FALLBACK_RESPONSE = "I'm sorry, I'm having trouble processing your request right now."
 
-async def generate_ai_response(prompt: str, system_prompt: str = "You are a helpful voice assistant.") -> str:
+# AsyncOpenAI clients by event loop, as their pooled connections belong to one loop
+_clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+
+def get_client():
+    """
+    Return the AsyncOpenAI client for the running loop.
+
+    It sends through the worker's pooled "openai" transport. The SDK is
+    imported on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI # type: ignore
+        for closed in [other for other in _clients if other.is_closed()]:
+            del _clients[closed]
+        client = _clients[loop] = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            http_client=http_clients.async_client("openai")
+        )
+    return client
+
+class ResponseCache:
+    """
+    TTL and size-bounded LRU cache of generated responses.
+
+    Keys are (model, system_prompt, prompt). An entry may hold several
+    variants of the same answer, which are handed out round-robin so
+    repeated greetings do not all sound identical.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[str], int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, variants, index = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries[key] = (expires_at, variants, index + 1)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return variants[index % len(variants)]
+
+    def put(self, key: Tuple[str, str, str], variants: List[str]):
+        self._entries[key] = (time.monotonic() + self.ttl, list(variants), 0)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+response_cache = ResponseCache(settings.OPENAI_CACHE_MAX_ENTRIES, settings.OPENAI_CACHE_TTL)
+
+def _cache_key(prompt: str, system_prompt: str) -> Tuple[str, str, str]:
+    return (settings.OPENAI_MODEL, system_prompt, prompt)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Return hit-rate and size metrics for the response cache."""
+    return dict(response_cache.stats(), enabled=settings.OPENAI_CACHE_ENABLED)
+
+class SentenceSplitter:
+    """
+    Cuts a stream of text deltas into speakable sentences.
+
+    A sentence ends at ., ! or ? (plus any closing quotes or brackets) followed
+    by whitespace. Fragments shorter than min_length are merged with the next
+    sentence so abbreviations like "Dr." do not become their own utterance.
+    """
+
+    _BOUNDARY = re.compile(r"[.!?]+[\"')\]]*(?=\s)|\n+")
+
+    def __init__(self, min_length: int = 12):
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a delta and return any sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in self._BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_length:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left once the stream has ended."""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return remainder or None
+
+def _messages(prompt: str, system_prompt: str,
+              history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    return [{"role": "system", "content": system_prompt}, *(history or []), {"role": "user", "content": prompt}]
+
+async def _complete(prompt: str, system_prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+    with span("openai_call"):
+        response = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=_messages(prompt, system_prompt, history)
+        )
+    return response.choices[0].message.content
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a phone call between a caller and a voice assistant. "
+    "Merge the new turns into the summary. Keep names, numbers, requests and anything promised; "
+    "drop small talk. Reply with the summary only."
+)
+
+async def summarize_conversation(summary: str, turns: List[Tuple[str, str, int]], max_tokens: int) -> str:
+    """
+    Fold older conversation turns into a call's running summary.
+
+    Args:
+        summary: The summary so far, empty for the first one
+        turns: (role, content, tokens) turns to fold in, oldest first
+        max_tokens: Upper bound on the length of the new summary
+
+    Returns:
+        The new summary
+    """
+    transcript = "\n".join(f"{role}: {content}" for role, content, _ in turns)
+    prompt = f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    with span("openai_summary"):
+        response = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=_messages(prompt, SUMMARY_SYSTEM_PROMPT),
+            max_tokens=max_tokens
+        )
+    return response.choices[0].message.content or summary
+
+async def generate_ai_response(prompt: str, system_prompt: str = "You are a helpful voice assistant.",
+                               use_cache: bool = True, history: Optional[List[Dict[str, str]]] = None) -> str:
     """
     Generate an AI response using OpenAI's GPT model.
-    
+
     Args:
         prompt: The user's input prompt
         system_prompt: The system prompt to guide the AI's behavior
-        
+        use_cache: Serve and store the answer in the response cache
+        history: Earlier messages of the conversation; answers that depend on them are not cached
+
     Returns:
         The AI-generated response text
     """
+    use_cache = use_cache and settings.OPENAI_CACHE_ENABLED and not history
+    key = _cache_key(prompt, system_prompt)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            logger.info("Serving cached AI response for prompt: %s...", prompt[:50])
+            return cached
+
     try:
-        logger.info(f"Generating AI response for prompt: {prompt[:50]}...")
-        
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        ai_text = response.choices[0].message.content
-        logger.info(f"Generated AI response: {ai_text[:50]}...")
-        
+        logger.info("Generating AI response for prompt: %s...", prompt[:50])
+
+        ai_text = await _complete(prompt, system_prompt, history)
+        logger.info("Generated AI response: %s...", ai_text[:50])
+
+        if use_cache and ai_text:
+            response_cache.put(key, [ai_text])
         return ai_text
-    
+
+    except Exception as e:
+        logger.error("Error generating AI response: %s", str(e))
+        return FALLBACK_RESPONSE
+
+async def warm_response_cache(prompt: str, system_prompt: str, variants: Optional[int] = None):
+    """
+    Pre-generate a few variants of a fixed prompt's answer, e.g. the greeting.
+
+    Args:
+        prompt: The prompt to pre-generate answers for
+        system_prompt: The system prompt used with it
+        variants: How many distinct answers to keep, OPENAI_GREETING_VARIANTS by default
+    """
+    variants = settings.OPENAI_GREETING_VARIANTS if variants is None else variants
+    if not settings.OPENAI_CACHE_ENABLED or variants <= 0:
+        return
+
+    results = await asyncio.gather(
+        *(_complete(prompt, system_prompt) for _ in range(variants)),
+        return_exceptions=True
+    )
+    answers = [r for r in results if isinstance(r, str) and r]
+    for r in results:
+        if isinstance(r, Exception):
+            logger.error("Error pre-generating AI response: %s", str(r))
+
+    if answers:
+        response_cache.put(_cache_key(prompt, system_prompt), answers)
+        logger.info("Pre-generated %s variants for prompt: %s...", len(answers), prompt[:50])
+
+async def stream_ai_response(prompt: str, system_prompt: str = "You are a helpful voice assistant.",
+                             history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Stream an AI response sentence by sentence.
+
+    Args:
+        prompt: The user's input prompt
+        system_prompt: The system prompt to guide the AI's behavior
+        history: Earlier messages of the conversation; answers that depend on them are not cached
+
+    Yields:
+        Complete sentences as soon as the model has produced them
+    """
+    splitter = SentenceSplitter()
+    key = _cache_key(prompt, system_prompt)
+    use_cache = settings.OPENAI_CACHE_ENABLED and not history
+    cached = response_cache.get(key) if use_cache else None
+    if cached is not None:
+        for sentence in splitter.feed(cached + " "):
+            yield sentence
+        remainder = splitter.flush()
+        if remainder:
+            yield remainder
+        return
+
+    produced = False
+    parts = []
+    start = time.perf_counter()
+    try:
+        logger.info("Streaming AI response for prompt: %s...", prompt[:50])
+
+        stream = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=_messages(prompt, system_prompt, history),
+            stream=True
+        )
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            for sentence in splitter.feed(delta):
+                if not produced:
+                    produced = True
+                    observe_stage("openai_first_sentence", time.perf_counter() - start)
+                yield sentence
+
+        remainder = splitter.flush()
+        if remainder:
+            if not produced:
+                produced = True
+                observe_stage("openai_first_sentence", time.perf_counter() - start)
+            yield remainder
+
+        if use_cache and parts:
+            response_cache.put(key, ["".join(parts)])
+
     except Exception as e:
-        logger.error(f"Error generating AI response: {str(e)}")
-        return "I'm sorry, I'm having trouble processing your request right now." 
\ No newline at end of file
+        logger.error("Error streaming AI response: %s", str(e))
+        if not produced:
+            observe_stage("openai_first_sentence", time.perf_counter() - start, "error")
+            yield FALLBACK_RESPONSE
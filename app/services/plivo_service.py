@@ -1,21 +1,33 @@
 import httpx # type: ignore
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from urllib.parse import quote
 from app.core.config import settings
 from app.utils.logger import get_logger
-from plivo import RestClient
-import xml.dom.minidom
+from app.utils.metrics import span
+from app.utils.resilience import get_upstream
+from app.utils.transport import http_clients
+from app.services import plivo_xml
+import logging
 
 logger = get_logger(__name__)
 
 class PlivoService:
     def __init__(self):
         logger.info("Initializing PlivoService...")
-        self.client = RestClient(
-            auth_id=settings.PLIVO_AUTH_ID,
-            auth_token=settings.PLIVO_AUTH_TOKEN
-        )
+        self.api_url = f"{settings.PLIVO_API_URL.rstrip('/')}/Account/{settings.PLIVO_AUTH_ID}"
+        self.auth = (settings.PLIVO_AUTH_ID, settings.PLIVO_AUTH_TOKEN)
+        self.upstream = get_upstream("plivo", settings.PLIVO_DEADLINE)
         logger.info("PlivoService initialized successfully")
 
+    @property
+    def http_client(self) -> httpx.Client:
+        """The pooled blocking client for Plivo; Flask threads share its connections."""
+        return http_clients.client("plivo")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the pooled AsyncClient for Plivo on the running loop."""
+        return http_clients.async_client("plivo")
+
     async def speak_text(self, call_uuid: str, text: str, voice: str = "WOMAN", language: str = "en-US") -> Dict[str, Any]:
         """
         Use Plivo's Speak API to convert text to speech during a call.
@@ -30,7 +42,7 @@ class PlivoService:
             The API response
         """
         try:
-            url = f"https://api.plivo.com/v1/Account/{settings.PLIVO_AUTH_ID}/Call/{call_uuid}/Speak/"
+            url = f"{self.api_url}/Call/{call_uuid}/Speak/"
             
             payload = {
                 "text": text,
@@ -38,32 +50,35 @@ class PlivoService:
                 "language": language
             }
             
-            logger.info(f"Speaking text on call {call_uuid}")
-            logger.debug(f"Text content: {text}")
-            logger.debug(f"Voice parameters: voice={voice}, language={language}")
+            logger.info("Speaking text on call %s", call_uuid)
+            logger.debug("Text content: %s", text)
+            logger.debug("Voice parameters: voice=%s, language=%s", voice, language)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    auth=(settings.PLIVO_AUTH_ID, settings.PLIVO_AUTH_TOKEN),
-                    json=payload
-                )
+            client = self._get_async_client()
+
+            async def send(timeout: float) -> httpx.Response:
+                response = await client.post(url, auth=self.auth, json=payload, timeout=timeout)
                 response.raise_for_status()
-                
-                result = response.json()
-                logger.info(f"Successfully spoke text on call {call_uuid}")
-                logger.debug(f"Speak API response: {result}")
-                return result
+                return response
+
+            with span("plivo_speak"):
+                response = await self.upstream.call_async(send)
+            
+            result = response.json()
+            logger.info("Successfully spoke text on call %s", call_uuid)
+            logger.debug("Speak API response: %s", result)
+            return result
                 
         except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error speaking text: {e.response.status_code}")
-            logger.error(f"Error response: {e.response.text}")
+            logger.error("HTTP error speaking text: %s", e.response.status_code)
+            logger.error("Error response: %s", e.response.text)
             raise
         except Exception as e:
-            logger.error(f"Error speaking text: {str(e)}")
+            logger.error("Error speaking text: %s", str(e))
             raise
     
-    def generate_speak_xml(self, text: str, voice: str = "WOMAN", language: str = "en-US") -> str:
+    def generate_speak_xml(self, text: str, voice: str = "WOMAN", language: str = "en-US",
+                           redirect_url: Optional[str] = None) -> str:
         """
         Generate Plivo XML for speaking text.
         
@@ -71,32 +86,31 @@ class PlivoService:
             text: The text to speak
             voice: The voice to use
             language: The language code
+            redirect_url: Optional URL Plivo fetches the next XML document from
+                once the text has been spoken
             
         Returns:
             Plivo XML response
         """
-        # Escape XML special characters
-        text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;").replace("'", "&apos;")
-        
-        xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Speak voice="{voice}" language="{language}">{text}</Speak>
-</Response>"""
+        with span("xml_render"):
+            verbs = [plivo_xml.speak(text, voice, language)]
+            if redirect_url:
+                verbs.append(plivo_xml.redirect(redirect_url))
+            xml = plivo_xml.response(*verbs)
         
-        logger.info(f"Generated speak XML with {len(text)} characters of text")
-        logger.debug(f"XML content: {xml}")
-        
-        # Format XML nicely for logging
-        try:
-            pretty_xml = xml.dom.minidom.parseString(xml).toprettyxml(indent="  ")
-            logger.debug(f"Prettified XML: {pretty_xml}")
-        except Exception as e:
-            logger.debug(f"Could not prettify XML: {str(e)}")
+        logger.info("Generated speak XML with %s characters of text", len(text))
+        self._log_pretty_xml(xml)
             
         return xml
 
-    def create_call(self, join_url, to_number=None):
-        """Create a new call using Plivo to the dynamic number."""
+    def create_call(self, join_url, to_number=None, content_type: Optional[str] = None):
+        """
+        Create a new call using Plivo to the dynamic number.
+
+        Goes to the Call API directly rather than through the SDK, which
+        hides the status and Retry-After of rejected requests from the
+        retry policy.
+        """
         try:
             # Use provided to_number or fall back to settings
             target_number = to_number
@@ -105,54 +119,141 @@ class PlivoService:
                 logger.error("No target phone number provided")
                 raise ValueError("No target phone number provided (TO_NUMBER)")
                 
-            logger.info(f"Creating Plivo call to number: {target_number}")
-            
-            # Create explicit parameters dictionary
-            call_params = {
-                "from_": settings.PLIVO_PHONE_NUMBER,
-                "to_": target_number,
-                "answer_url": f"{settings.BASE_URL}/answer_url?join_url={join_url}",
-                "answer_method": "POST"
-            }
+            logger.info("Creating Plivo call to number: %s", target_number)
+            
+            payload = self._call_payload(join_url, target_number, content_type)
             
             # Log the exact parameters being used
-            logger.info(f"Call parameters: {call_params}")
+            logger.info("Call parameters: %s", payload)
             
-            # Create call with explicit parameters
-            response = self.client.calls.create(**call_params)
+            def send(timeout: float) -> httpx.Response:
+                response = self.http_client.post(
+                    f"{self.api_url}/Call/", auth=self.auth, json=payload, timeout=timeout
+                )
+                response.raise_for_status()
+                return response
+
+            with span("plivo_create"):
+                response = self.upstream.call(send)
             
-            logger.info(f"Call created successfully with request_uuid: {response['request_uuid']}")
-            logger.debug(f"Full API response: {response}")
-            return response
+            result = response.json()
+            logger.info("Call created successfully with request_uuid: %s", result.get('request_uuid'))
+            logger.debug("Full API response: %s", result)
+            return result
             
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error creating call: %s", e.response.status_code)
+            logger.error("Error response: %s", e.response.text)
+            raise
         except Exception as e:
-            logger.error(f"Error creating call: {str(e)}")
+            logger.error("Error creating call: %s", str(e))
             raise
 
-    def generate_answer_xml(self, join_url):
-        """Generate XML response for answer URL with improved stream settings."""
-        xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-    <Response>
-        <Stream
-            keepCallAlive="true"
-            bidirectional="true"
-            contentType="audio/x-l16;rate=16000"
-        >
-            {join_url}
-        </Stream>
-    </Response>
-    """
-
-        logger.info(f"Generated answer XML with Stream element for join_url")
-        logger.debug(f"Join URL: {join_url}")
+    async def create_call_async(self, join_url: str, to_number: Optional[str] = None,
+                                content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Non-blocking variant of create_call for the async initiation pipeline.
+
+        Sends the same Call API request as create_call over the pooled
+        AsyncClient.
+        
+        Args:
+            join_url: The Ultravox joinUrl the answered call should stream to
+            to_number: The destination phone number
+            content_type: Audio format of the call's stream, defaults to PLIVO_STREAM_CONTENT_TYPE
+            
+        Returns:
+            The API response containing request_uuid
+        """
+        if not to_number:
+            logger.error("No target phone number provided")
+            raise ValueError("No target phone number provided (TO_NUMBER)")
+            
+        payload = self._call_payload(join_url, to_number, content_type)
         
-        # Format XML nicely for logging
         try:
-            dom = xml.dom.minidom.parseString(xml)
-            pretty_xml = dom.toprettyxml(indent="  ")
-            logger.debug(f"Prettified XML: {pretty_xml}")
+            client = self._get_async_client()
+
+            async def send(timeout: float) -> httpx.Response:
+                response = await client.post(f"{self.api_url}/Call/", auth=self.auth, json=payload, timeout=timeout)
+                response.raise_for_status()
+                return response
+
+            with span("plivo_create"):
+                response = await self.upstream.call_async(send)
+            
+            result = response.json()
+            logger.info("Call created successfully with request_uuid: %s", result.get('request_uuid'))
+            return result
+            
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error creating call: %s", e.response.status_code)
+            logger.error("Error response: %s", e.response.text)
+            raise
         except Exception as e:
-            logger.debug(f"Could not prettify XML: {str(e)}")
-            logger.debug(f"Raw XML: {xml}")
+            logger.error("Error creating call: %s", str(e))
+            raise
+
+    def _build_call_params(self, join_url: str, to_number: str,
+                           content_type: Optional[str] = None) -> Dict[str, Any]:
+        """Build the outbound call parameters pointing Plivo at our answer_url."""
+        answer_url = f"{settings.BASE_URL}/answer_url?join_url={quote(join_url, safe='')}"
+        if content_type:
+            answer_url += f"&content_type={quote(content_type, safe='')}"
+        return {
+            "from_": settings.PLIVO_PHONE_NUMBER,
+            "to_": to_number,
+            "answer_url": answer_url,
+            "answer_method": "POST",
+            "hangup_url": f"{settings.BASE_URL}/call_status",
+            "hangup_method": "POST"
+        }
+
+    def _call_payload(self, join_url: str, to_number: str,
+                      content_type: Optional[str] = None) -> Dict[str, Any]:
+        """Call API request body; the REST API uses plain "from"/"to" where the SDK uses "from_"/"to_"."""
+        call_params = self._build_call_params(join_url, to_number, content_type)
+        return {key.rstrip("_"): value for key, value in call_params.items()}
+
+    def generate_answer_xml(self, join_url: str, content_type: Optional[str] = None) -> bytes:
+        """
+        Generate XML response for answer URL with improved stream settings.
+        
+        Documents are cached per join URL and returned as encoded bytes.
+        With MEDIA_RELAY_ENABLED the stream goes through the app's media
+        relay, which connects on to the join URL.
+
+        Args:
+            join_url: The Ultravox joinUrl for the call
+            content_type: Audio format Plivo streams in, defaults to PLIVO_STREAM_CONTENT_TYPE
+        """
+        content_type = content_type or settings.PLIVO_STREAM_CONTENT_TYPE
+        with span("xml_render"):
+            xml = plivo_xml.answer_document(self._stream_url(join_url, content_type), content_type)
+
+        logger.info("Generated answer XML with Stream element for join_url")
+        logger.debug("Join URL: %s", join_url)
+        self._log_pretty_xml(xml)
             
-        return xml
\ No newline at end of file
+        return xml
+
+    def _stream_url(self, join_url: str, content_type: str) -> str:
+        if not settings.MEDIA_RELAY_ENABLED:
+            return join_url
+        base = settings.BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return (
+            f"{base}/media/relay?join_url={quote(join_url, safe='')}"
+            f"&content_type={quote(content_type, safe='')}"
+        )
+
+    def _log_pretty_xml(self, xml):
+        """Format XML nicely for logging, only when it will actually be logged."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        from xml.dom import minidom
+        try:
+            pretty_xml = minidom.parseString(xml).toprettyxml(indent="  ")
+            logger.debug("Prettified XML: %s", pretty_xml)
+        except Exception as e:
+            logger.debug("Could not prettify XML: %s", str(e))
+            logger.debug("Raw XML: %s", xml)
@@ -0,0 +1,93 @@
+from functools import lru_cache
+from typing import Optional
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+DEFAULT_STREAM_CONTENT_TYPE = "audio/x-l16;rate=16000"
+
+# Audio formats Plivo can stream in
+STREAM_CONTENT_TYPES = ("audio/x-l16;rate=16000", "audio/x-l16;rate=8000", "audio/x-mulaw;rate=8000")
+
+# One-pass escaping for both text content and attribute values
+_ESCAPES = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&apos;",
+})
+
+# Precompiled verb templates
+_SPEAK = '<Speak voice="%s" language="%s">%s</Speak>'
+_STREAM = '<Stream keepCallAlive="%s" bidirectional="%s" contentType="%s">%s</Stream>'
+_WAIT = '<Wait length="%d"/>'
+_HANGUP = '<Hangup/>'
+_HANGUP_REASON = '<Hangup reason="%s"/>'
+_REDIRECT = '<Redirect method="%s">%s</Redirect>'
+_RESPONSE = XML_DECLARATION + '<Response>%s</Response>'
+
+def escape(value: str) -> str:
+    """Escape a string for use as XML text or a quoted attribute value."""
+    return value.translate(_ESCAPES)
+
+def _bool(value: bool) -> str:
+    return "true" if value else "false"
+
+def stream_content_type(value: str, transcoding: bool = True) -> str:
+    """
+    Normalize a <Stream> contentType, e.g. 'audio/x-mulaw; rate=8000'.
+
+    Args:
+        value: The content type to check
+        transcoding: Whether the media relay converts the stream for Ultravox;
+            without it, Ultravox only takes DEFAULT_STREAM_CONTENT_TYPE
+
+    Raises:
+        ValueError: If Plivo cannot stream in that format, or Ultravox cannot take it
+    """
+    normalized = value.replace(" ", "").lower()
+    if normalized not in STREAM_CONTENT_TYPES:
+        raise ValueError(f"Unsupported stream content type: {value}")
+    if not transcoding and normalized != DEFAULT_STREAM_CONTENT_TYPE:
+        raise ValueError(
+            f"Stream content type {value} needs MEDIA_RELAY_ENABLED=true, "
+            f"Ultravox only takes {DEFAULT_STREAM_CONTENT_TYPE}"
+        )
+    return normalized
+
+def speak(text: str, voice: str = "WOMAN", language: str = "en-US") -> str:
+    return _SPEAK % (escape(voice), escape(language), escape(text))
+
+def stream(url: str, content_type: str = DEFAULT_STREAM_CONTENT_TYPE,
+           keep_call_alive: bool = True, bidirectional: bool = True) -> str:
+    return _STREAM % (_bool(keep_call_alive), _bool(bidirectional), escape(content_type), escape(url))
+
+def wait(length: int) -> str:
+    return _WAIT % length
+
+def hangup(reason: Optional[str] = None) -> str:
+    return _HANGUP_REASON % escape(reason) if reason else _HANGUP
+
+def redirect(url: str, method: str = "POST") -> str:
+    return _REDIRECT % (escape(method), escape(url))
+
+def response(*verbs: str) -> str:
+    """Wrap rendered verbs in a Plivo <Response> document."""
+    return _RESPONSE % "".join(verbs)
+
+@lru_cache(maxsize=4096)
+def answer_document(join_url: str, content_type: str = DEFAULT_STREAM_CONTENT_TYPE) -> bytes:
+    """
+    Render the answer_url document that streams the call to Ultravox.
+
+    Cached per join URL, so Plivo retries and repeated fetches for the same
+    call are served from memory.
+    """
+    return response(stream(join_url, content_type)).encode("utf-8")
+
+@lru_cache(maxsize=64)
+def speak_document(text: str, voice: str = "WOMAN", language: str = "en-US") -> bytes:
+    """Render and cache a fixed <Speak> document, e.g. fallback error speech."""
+    return response(speak(text, voice, language)).encode("utf-8")
+
+ERROR_SPEECH = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
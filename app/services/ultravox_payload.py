@@ -0,0 +1,87 @@
+import json
+from typing import Dict, Any, List, Optional, Sequence
+
+from app.core.config import settings
+from app.models.schemas import MessageRole
+
+_SEPARATORS = (",", ":")
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=_SEPARATORS, ensure_ascii=False)
+
+def _text(message: Any) -> str:
+    """Accept InactivityMessage/Message models, dicts with a "text" key, or plain strings."""
+    if isinstance(message, str):
+        return message
+    if isinstance(message, dict):
+        return message["text"]
+    return message.text
+
+class UltravoxPayloadBuilder:
+    """
+    Serializes the Ultravox call creation payload once and merges per-call overrides.
+
+    The static part of the payload (everything except the overridable fields)
+    is encoded a single time. Each overridable field keeps its default
+    pre-encoded as a JSON fragment, so a call without overrides returns
+    cached bytes and a call with overrides only encodes what it changes.
+    """
+
+    OVERRIDABLE = ("systemPrompt", "initialMessages", "inactivityMessages")
+
+    def __init__(self, base_payload: Dict[str, Any], inactivity_duration: Optional[str] = None):
+        self.inactivity_duration = inactivity_duration or settings.INACTIVITY_DURATION
+        static = {key: value for key, value in base_payload.items() if key not in self.OVERRIDABLE}
+        # Body of the static object without its surrounding braces, ready to splice
+        self._static_body = _dumps(static)[1:-1]
+        self._defaults = {key: _dumps(base_payload[key]) for key in self.OVERRIDABLE if key in base_payload}
+        self._default_payload = self._assemble(self._defaults)
+
+    def build(self, system_prompt: Optional[str] = None,
+              inactivity_messages: Optional[Sequence[Any]] = None,
+              initial_messages: Optional[Sequence[Any]] = None) -> bytes:
+        """
+        Build the request body for one call.
+
+        Args:
+            system_prompt: Replaces the configured systemPrompt
+            inactivity_messages: Texts for inactivityMessages, spaced inactivity_duration
+                (INACTIVITY_DURATION by default) apart; the last one hangs up
+            initial_messages: Texts the agent starts the conversation with
+
+        Returns:
+            The UTF-8 encoded JSON payload
+        """
+        if system_prompt is None and inactivity_messages is None and initial_messages is None:
+            return self._default_payload
+
+        fragments = dict(self._defaults)
+        if system_prompt is not None:
+            fragments["systemPrompt"] = _dumps(system_prompt)
+        if inactivity_messages is not None:
+            fragments["inactivityMessages"] = _dumps(self.inactivity_messages(inactivity_messages, self.inactivity_duration))
+        if initial_messages is not None:
+            fragments["initialMessages"] = _dumps(self.initial_messages(initial_messages))
+        return self._assemble(fragments)
+
+    def _assemble(self, fragments: Dict[str, str]) -> bytes:
+        parts = [self._static_body] if self._static_body else []
+        parts.extend(f'"{key}":{fragment}' for key, fragment in fragments.items())
+        return ("{" + ",".join(parts) + "}").encode("utf-8")
+
+    @staticmethod
+    def inactivity_messages(messages: Sequence[Any], duration: Optional[str] = None) -> List[Dict[str, Any]]:
+        result = []
+        for index, message in enumerate(messages):
+            entry = {"duration": duration or settings.INACTIVITY_DURATION, "message": _text(message)}
+            if index == len(messages) - 1:
+                entry["endBehavior"] = "END_BEHAVIOR_HANG_UP_SOFT"
+            result.append(entry)
+        return result
+
+    @staticmethod
+    def initial_messages(messages: Sequence[Any]) -> List[Dict[str, Any]]:
+        return [
+            {"role": MessageRole.AGENT.value, "text": _text(message), "medium": "MESSAGE_MEDIUM_VOICE"}
+            for message in messages
+        ]
@@ -1,26 +1,52 @@
-from asyncio import streams
+import asyncio
 import httpx # type: ignore
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional, Tuple
 from app.core.config import settings
 from app.utils.logger import get_logger
+from app.utils.metrics import span
+from app.utils.resilience import get_upstream
+from app.utils.transport import http_clients
 from app.models.schemas import InactivityMessage, Message
-import requests # type: ignore
+from app.services.agent_profiles import AgentProfileRegistry
+from app.services.ultravox_payload import UltravoxPayloadBuilder
 import json
+import logging
 
 logger = get_logger(__name__)
 
 class UltravoxService:
-    def __init__(self):
+    def __init__(self, profiles: Optional[AgentProfileRegistry] = None):
         self.api_key = settings.ULTRAVOX_API_KEY
-        self.api_url = "https://api.ultravox.ai/api/calls"
+        self.api_url = f"{settings.ULTRAVOX_API_URL.rstrip('/')}/calls"
         self.headers = {
             "Content-Type": "application/json",
             "X-API-Key": self.api_key,
         }
-        logger.info(f"Initialized UltravoxService with API URL: {self.api_url}")
+        # Incremental list_calls cache, keyed by call id
+        self._calls: Dict[str, Dict[str, Any]] = {}
+        self._sync_watermark: Optional[str] = None
+        # Finished calls never change; LRU-bounded cache for get_call
+        self._finished_calls: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.profiles = profiles if profiles is not None else AgentProfileRegistry()
+        self.upstream = get_upstream("ultravox", settings.ULTRAVOX_DEADLINE)
+        logger.info("Initialized UltravoxService with API URL: %s", self.api_url)
 
-    def create_call(self, to_number=None):
-        """Creates a call in Ultravox and returns the JSON containing joinUrl."""
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the pooled AsyncClient for Ultravox on the running loop."""
+        return http_clients.async_client("ultravox")
+
+    def create_call(self, to_number=None, overrides: Optional[Dict[str, Any]] = None,
+                    profile: Optional[str] = None):
+        """
+        Creates a call in Ultravox and returns the JSON containing joinUrl.
+        
+        Args:
+            to_number: Unused, the Ultravox leg does not dial
+            overrides: Optional system_prompt, inactivity_messages and initial_messages
+                for this call, see UltravoxPayloadBuilder.build
+            profile: Agent profile name, defaults to DEFAULT_AGENT_PROFILE
+        """
         # Use provided to_number or fall back to settings
         target_number = settings.TO_NUMBER
         
@@ -28,132 +54,296 @@ class UltravoxService:
             logger.error("No target phone number provided")
             raise ValueError("No target phone number provided (TO_NUMBER)")
             
-        logger.info(f"Creating Ultravox call to number: {target_number}")
-        
-        # Prepare webhook URL for Ultravox to call back
-        webhook_url = f"{settings.BASE_URL}/webhook"
+        logger.info("Creating Ultravox call to number: %s", target_number)
         
-      
-        payload = {
-        "systemPrompt": settings.SYSTEM_PROMPT,
-        "temperature": 0.7,
-        "model": settings.AI_MODEL,
-        "voice": settings.VOICE_NAME,
-        "languageHint": settings.LANGUAGE_HINT,
-        "initialMessages": [
-            {
-                "role": "MESSAGE_ROLE_USER",
-                "text": "",
-                "invocationId": "",
-                "toolName": "",
-                "errorDetails": "",
-                "medium": "MESSAGE_MEDIUM_VOICE",
-                "callStageMessageIndex": 1,
-                "callStageId": "1",
-            }
-        ],
-        "joinTimeout": "30s",
-        "maxDuration": "300s",
-        "timeExceededMessage": "Sorry, The Call Time Limit Exceeded. Goodbye!",
-        "inactivityMessages": [
-            {
-                "duration": "20s",
-                "message": "Inactivity Detected. Goodbye!",
-                "endBehavior": "END_BEHAVIOR_HANG_UP_SOFT",
-            },
-        ],
-        "selectedTools": [
-            {
-                "toolName": "hangUp",
-            }
-        ],
-        "medium": {"plivo": {}},
-        "recordingEnabled": False,
-        "firstSpeaker": "FIRST_SPEAKER_USER",
-        "transcriptOptional": True,
-        "initialOutputMedium": "MESSAGE_MEDIUM_VOICE",
-        "vadSettings": {
-            "turnEndpointDelay": "1s",
-            "minimumTurnDuration": "0.15s",
-            "minimumInterruptionDuration": "0.5s",
-            "frameActivationThreshold": 0.1,
-        },
-        "firstSpeakerSettings": {
-            "user": {},
-            # "agent": {
-            #     "uninterruptible": True,
-            #     "text": "Hello"
-            # }
-        },
-        "experimentalSettings": {},
-        "metadata": {},
-        "initialState": {},
-    }
+        agent = self.profiles.get(profile)
+        payload = agent.builder.build(**(overrides or {}))
         headers = {
             "X-API-Key": settings.ULTRAVOX_API_KEY,
             "Content-Type": "application/json"
             }
         
-        logger.info(f"Creating Ultravox call with payload: {json.dumps(payload, indent=2)}")
+        logger.info(
+            "Creating Ultravox call with %s byte payload, profile: %s, overrides: %s",
+            len(payload), agent.name, sorted(overrides or {})
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Ultravox call payload: %s", json.dumps(json.loads(payload), indent=2))
         
-        try:
-            response = httpx.post(
-                
-                "https://api.ultravox.ai/api/calls", 
-                headers=headers, 
-                json=payload,
-                
+        def send(timeout: float) -> httpx.Response:
+            response = http_clients.client("ultravox").post(
+                self.api_url, headers=headers, content=payload, timeout=timeout
             )
             response.raise_for_status()
+            return response
+
+        try:
+            with span("ultravox_create"):
+                response = self.upstream.call(send)
             result = response.json()
-            logger.info(f"Ultravox call created successfully with ID: {result.get('id', 'unknown')}")
-            logger.debug(f"Full Ultravox response: {json.dumps(result, indent=2)}")
+            logger.info("Ultravox call created successfully with ID: %s", result.get('id', 'unknown'))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Full Ultravox response: %s", json.dumps(result, indent=2))
             return result
             
         except httpx.HTTPError as e:
-            logger.error(f"HTTP error creating Ultravox call: {str(e)}")
+            logger.error("HTTP error creating Ultravox call: %s", str(e))
             if hasattr(e, 'response') and e.response:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response body: {e.response.text}")
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response body: %s", e.response.text)
+            raise
+            
+        except Exception as e:
+            logger.error("Error creating Ultravox call: %s", str(e))
+            raise
+
+    async def create_call_async(self, overrides: Optional[Dict[str, Any]] = None,
+                                profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Non-blocking variant of create_call for the async initiation pipeline.
+
+        Uses the pooled AsyncClient so hundreds of creations can be in flight
+        on one event loop without a connection (and TLS handshake) each.
+
+        Args:
+            overrides: Optional per-call payload overrides, as for create_call
+            profile: Agent profile name, defaults to DEFAULT_AGENT_PROFILE
+
+        Returns:
+            The Ultravox call JSON containing joinUrl
+        """
+        try:
+            client = self._get_async_client()
+            payload = self.profiles.get(profile).builder.build(**(overrides or {}))
+
+            async def send(timeout: float) -> httpx.Response:
+                response = await client.post(self.api_url, headers=self.headers, content=payload, timeout=timeout)
+                response.raise_for_status()
+                return response
+
+            with span("ultravox_create"):
+                response = await self.upstream.call_async(send)
+            result = response.json()
+            logger.info("Ultravox call created successfully with ID: %s", result.get('callId', result.get('id', 'unknown')))
+            return result
+            
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error creating Ultravox call: %s", e.response.status_code)
+            logger.error("Response body: %s", e.response.text)
             raise
             
         except Exception as e:
-            logger.error(f"Error creating Ultravox call: {str(e)}")
+            logger.error("Error creating Ultravox call: %s", str(e))
             raise
 
+    async def delete_call_async(self, call_id: str):
+        """
+        Delete a call that will never be joined, such as an unused pool entry.
+
+        A call that is already gone counts as deleted.
+        """
+        client = self._get_async_client()
+
+        async def send(timeout: float) -> httpx.Response:
+            response = await client.delete(f"{self.api_url}/{call_id}", headers=self.headers, timeout=timeout)
+            if response.status_code != 404:
+                response.raise_for_status()
+            return response
+
+        try:
+            await self.upstream.call_async(send, idempotent=True)
+            logger.debug("Deleted Ultravox call %s", call_id)
+        except Exception as e:
+            logger.error("Error deleting Ultravox call %s: %s", call_id, str(e))
+            raise
+
+    @property
+    def payload_builder(self) -> UltravoxPayloadBuilder:
+        """Precompiled payload of the default agent profile."""
+        return self.profiles.get().builder
+
+    def _build_payload(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """Build the base Ultravox call creation payload of an agent profile."""
+        return self.profiles.get(profile).base_payload()
+
     async def get_call(self, call_id: str) -> Dict[str, Any]:
-        """Get details of a specific call."""
+        """
+        Get details of a specific call.
+
+        Finished calls no longer change, so they are served from a local
+        cache after the first fetch.
+        """
+        cached = self._finished_calls.get(call_id)
+        if cached is not None:
+            self._finished_calls.move_to_end(call_id)
+            return cached
+
         try:
             url = f"{self.api_url}/{call_id}"
-            logger.info(f"Fetching call details for ID: {call_id}")
+            logger.debug("Fetching call details for ID: %s", call_id)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Successfully retrieved details for call: {call_id}")
-                logger.debug(f"Call details: {json.dumps(result, indent=2)}")
-                return result
+            client = self._get_async_client()
+            response = await client.get(url, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.debug("Successfully retrieved details for call: %s", call_id)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Call details: %s", json.dumps(result, indent=2))
+            
+            if result.get("ended"):
+                self._finished_calls[call_id] = result
+                if len(self._finished_calls) > settings.ULTRAVOX_CALL_CACHE_SIZE:
+                    self._finished_calls.popitem(last=False)
+            return result
                 
         except Exception as e:
-            logger.error(f"Error getting call {call_id}: {str(e)}")
+            logger.error("Error getting call %s: %s", call_id, str(e))
             raise
 
-    async def list_calls(self) -> List[Dict[str, Any]]:
-        """List all calls."""
+    async def get_calls(self, call_ids: Iterable[str],
+                        concurrency: Optional[int] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Fetch many calls over the shared connection pool, yielding each as it completes.
+
+        A fixed number of workers pull ids lazily from the input, and at most
+        one finished result per worker waits to be consumed, so a slow
+        consumer holds back the fetching instead of buffering results.
+        Duplicate ids are fetched once, which keeps a set of the ids seen so
+        far; that set, not the results, grows with the input.
+
+        Args:
+            call_ids: Ultravox call ids
+            concurrency: Requests in flight at once, defaults to ULTRAVOX_BULK_CONCURRENCY
+
+        Yields:
+            (call_id, result) pairs in completion order, where result is the
+            call JSON or the exception raised while fetching it
+        """
+        seen = set()
+
+        def unique_ids():
+            for call_id in call_ids:
+                if call_id not in seen:
+                    seen.add(call_id)
+                    yield call_id
+
+        ids = unique_ids()
+        workers = max(1, concurrency or settings.ULTRAVOX_BULK_CONCURRENCY)
+        results: asyncio.Queue = asyncio.Queue(maxsize=workers)
+
+        async def worker():
+            for call_id in ids:
+                try:
+                    result = await self.get_call(call_id)
+                except Exception as e:
+                    result = e
+                await results.put((call_id, result))
+            await results.put(None)
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(workers)]
+        fetched = failed = 0
+        try:
+            running = len(tasks)
+            while running:
+                item = await results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                if isinstance(item[1], Exception):
+                    failed += 1
+                else:
+                    fetched += 1
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            logger.info("Bulk call fetch finished: %s retrieved, %s failed", fetched, failed)
+
+    async def iter_calls(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every call, newest first, following the list cursor page by page.
+
+        The next page is requested as soon as the current one arrives, so it
+        downloads while the caller works through the current page.
+
+        Args:
+            page_size: Calls per page, defaults to ULTRAVOX_LIST_PAGE_SIZE
+        """
+        client = self._get_async_client()
+        params = {"pageSize": page_size or settings.ULTRAVOX_LIST_PAGE_SIZE}
+        pending: Optional[asyncio.Future] = asyncio.ensure_future(self._fetch_page(client, self.api_url, params))
+        try:
+            while pending is not None:
+                page = await pending
+                next_url = page.get("next")
+                pending = asyncio.ensure_future(self._fetch_page(client, next_url)) if next_url else None
+                for call in page.get("results", []):
+                    yield call
+        finally:
+            # The caller stopped early: drop the prefetched page
+            if pending is not None:
+                pending.cancel()
+
+    async def _fetch_page(self, client: httpx.AsyncClient, url: str,
+                          params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = await client.get(url, headers=self.headers, params=params)
+        response.raise_for_status()
+        result = response.json()
+        # Unpaginated responses are a bare list
+        if isinstance(result, list):
+            return {"results": result, "next": None}
+        return result
+
+    async def sync_calls(self) -> int:
+        """
+        Fetch calls created since the last sync into the local call cache.
+
+        Listing stops at the sync watermark: the creation time of the oldest
+        call that was still in progress at the last sync, or of the newest
+        call if all had ended. Older calls are finished and cannot change.
+
+        Returns:
+            Number of calls fetched
+        """
+        watermark = self._sync_watermark
+        fetched = 0
+        calls = self.iter_calls()
+        try:
+            async for call in calls:
+                created = call.get("created") or ""
+                if watermark and created < watermark:
+                    break
+                self._calls[call.get("callId") or call.get("id")] = call
+                fetched += 1
+        finally:
+            await calls.aclose()
+
+        open_calls = [c["created"] for c in self._calls.values() if not c.get("ended") and c.get("created")]
+        if open_calls:
+            self._sync_watermark = min(open_calls)
+        elif self._calls:
+            self._sync_watermark = max(c.get("created") or "" for c in self._calls.values())
+        logger.info("Synced %s calls from Ultravox, %s cached", fetched, len(self._calls))
+        return fetched
+
+    async def list_calls(self, refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        List all calls, newest first.
+
+        Args:
+            refresh: Fetch calls newer than the last sync first; False serves the cache as is
+
+        Returns:
+            All known calls
+        """
         try:
-            url = f"{self.api_url}"
             logger.info("Fetching list of all calls")
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                call_count = len(result)
-                logger.info(f"Successfully retrieved {call_count} calls")
-                return result
+            if refresh:
+                await self.sync_calls()
+            result = sorted(self._calls.values(), key=lambda c: c.get("created") or "", reverse=True)
+            logger.info("Successfully retrieved %s calls", len(result))
+            return result
                 
         except Exception as e:
-            logger.error(f"Error listing calls: {str(e)}")
-            raise 
-            raise 
\ No newline at end of file
+            logger.error("Error listing calls: %s", str(e))
+            raise
@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+class LazyService(Generic[T]):
+    """
+    Stands in for a process-wide service that is built on first use.
+
+    Attribute access is forwarded to the instance, which the factory builds
+    once, under a lock, the first time any attribute is read. A module can
+    export `plivo_service = LazyService(PlivoService)` at import time and
+    workers only pay for the services their requests actually touch.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.__dict__["_LazyService__factory"] = factory
+        self.__dict__["_LazyService__instance"] = None
+        self.__dict__["_LazyService__lock"] = threading.Lock()
+
+    def _resolve(self) -> T:
+        instance = self.__instance
+        if instance is None:
+            with self.__lock:
+                instance = self.__instance
+                if instance is None:
+                    instance = self.__dict__["_LazyService__instance"] = self.__factory()
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self) -> str:
+        instance = self.__instance
+        if instance is None:
+            return f"<LazyService of {getattr(self.__factory, '__qualname__', self.__factory)!r}, not built>"
+        return repr(instance)
+
+def is_built(service: Any) -> bool:
+    """Whether a LazyService has built its instance; plain objects always have."""
+    if isinstance(service, LazyService):
+        return service.__dict__["_LazyService__instance"] is not None
+    return True
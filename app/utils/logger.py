@@ -1,37 +1,123 @@
+import atexit
 import logging
-import sys
+import logging.handlers
 import os
+import queue
+import sys
+import threading
 from datetime import datetime
+from typing import List, Optional
 from app.core.config import settings
 
-# Ensure logs directory exists
-os.makedirs("logs", exist_ok=True)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+
+class DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Writes to logs/<prefix>-YYYY-MM-DD.log, rotating by size and by day.
+
+    A new dated file is started on the first record after midnight; within a
+    day the file is rotated to .1, .2, ... once it exceeds maxBytes.
+    """
+
+    def __init__(self, directory: str, prefix: str, maxBytes: int = 0, backupCount: int = 0):
+        self.directory = directory
+        self.prefix = prefix
+        self.current_date = self._today()
+        super().__init__(self._path(self.current_date), maxBytes=maxBytes, backupCount=backupCount,
+                         encoding="utf-8", delay=True)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def _path(self, date: str) -> str:
+        return os.path.abspath(os.path.join(self.directory, f"{self.prefix}-{date}.log"))
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        today = self._today()
+        if today != self.current_date:
+            # Switch files rather than renaming: yesterday's file keeps its date
+            self.current_date = today
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = self._path(today)
+            return False
+        return bool(super().shouldRollover(record))
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the background writer without formatting them.
+
+    The stock QueueHandler formats the message on the calling thread so the
+    record can be pickled; our queue is in-process, so the record is passed
+    as-is and %-style arguments are only merged in the writer thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _build_handlers() -> List[logging.Handler]:
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+
+    # File handler - a new log file daily, rotated by size within the day
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    file_handler = DailyRotatingFileHandler(
+        settings.LOG_DIR, "ultravox-agent",
+        maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(formatter)
+
+    return [console_handler, file_handler]
+
+def setup_logging():
+    """
+    Configure the root logger once per process.
+
+    With LOG_ASYNC (the default) request threads only enqueue records; a
+    QueueListener thread formats them and writes to stdout and the log file,
+    so handler latency never lands on a request.
+    """
+    global _listener, _configured
+    with _setup_lock:
+        if _configured:
+            return
+
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, settings.LOG_LEVEL))
+        handlers = _build_handlers()
+
+        if settings.LOG_ASYNC:
+            log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+            root.addHandler(LazyQueueHandler(log_queue))
+            _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+        else:
+            for handler in handlers:
+                root.addHandler(handler)
+
+        _configured = True
 
-# Configure logging with both file and console output
 def get_logger(name: str) -> logging.Logger:
-    """Get a logger with the given name and enhanced logging capabilities."""
+    """
+    Get a logger with the given name.
+
+    Handlers, the log directory and the writer thread are set up by
+    setup_logging() in the app factories, not when a module is imported.
+    """
     logger = logging.getLogger(name)
-    
+
     # Set log level from settings
     logger.setLevel(getattr(logging, settings.LOG_LEVEL))
-    
-    # Prevent adding handlers multiple times
-    if not logger.handlers:
-        # Create formatters
-        detailed_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        # Console handler
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(detailed_formatter)
-        logger.addHandler(console_handler)
-        
-        # File handler - create a new log file daily
-        today = datetime.now().strftime('%Y-%m-%d')
-        file_handler = logging.FileHandler(f"logs/ultravox-agent-{today}.log")
-        file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
-    
-    return logger 
\ No newline at end of file
+
+    return logger
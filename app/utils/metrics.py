@@ -0,0 +1,215 @@
+"""
+Prometheus-style instrumentation without a client library.
+
+Histograms are kept per process and rendered in the Prometheus text
+exposition format at /metrics. Stage timings are recorded with span(),
+request timings by the Flask hooks and the ASGI MetricsMiddleware.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from app.core.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def parse_buckets(value: str) -> Tuple[float, ...]:
+    """Parse a comma-separated list of bucket upper bounds in seconds."""
+    return tuple(sorted(float(bound) for bound in value.split(",") if bound.strip()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """
+    A labelled histogram with fixed bucket bounds.
+
+    Each label combination keeps per-bucket counts, a sum and a count;
+    buckets are made cumulative only when rendered.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Iterable[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        """Record a value; labelvalues are given in labelnames order."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in sorted(self.collect()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_format(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them for a scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, CallbackMetric]] = {}
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str],
+                  buckets: Optional[Iterable[float]] = None) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets or parse_buckets(settings.METRICS_BUCKETS))
+        self._metrics[name] = metric
+        return metric
+
+    def callback(self, name: str, documentation: str, metric_type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]) -> CallbackMetric:
+        """Register a gauge or counter read from collect(), which yields (labelvalues, value) pairs."""
+        metric = CallbackMetric(name, documentation, metric_type, labelnames, collect)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by method, route template and outcome.",
+    ("method", "endpoint", "outcome")
+)
+STAGE_DURATION = registry.histogram(
+    "stage_duration_seconds",
+    "Time spent in a stage of request handling or call initiation, by stage and outcome.",
+    ("stage", "outcome")
+)
+
+def request_outcome(status: int) -> str:
+    """Bucket an HTTP status into success, client_error or server_error."""
+    if status >= 500:
+        return "server_error"
+    if status >= 400:
+        return "client_error"
+    return "success"
+
+def observe_request(method: str, endpoint: str, status: int, seconds: float):
+    if settings.METRICS_ENABLED:
+        REQUEST_DURATION.observe(seconds, method, endpoint, request_outcome(status))
+
+class Span:
+    """
+    Times a stage into stage_duration_seconds.
+
+    Works as a context manager in sync and async code. The outcome is
+    "success", or "error" if the block raises; code inside the block may
+    set a more specific one, e.g. timing.outcome = "fallback".
+    """
+
+    __slots__ = ("stage", "outcome", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "success"
+        self._start = 0.0
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "error"
+        if settings.METRICS_ENABLED:
+            STAGE_DURATION.observe(time.perf_counter() - self._start, self.stage, self.outcome)
+        return False
+
+def span(stage: str) -> Span:
+    """
+    Time a stage of request handling.
+
+    Usage:
+        with span("plivo_create"):
+            response = await client.post(...)
+    """
+    return Span(stage)
+
+def observe_stage(stage: str, seconds: float, outcome: str = "success"):
+    """Record a stage that was timed elsewhere, e.g. time spent queued."""
+    if settings.METRICS_ENABLED:
+        STAGE_DURATION.observe(seconds, stage, outcome)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration_seconds.
+
+    The endpoint label is the matched route's path template (e.g.
+    /calls/{call_id:path}), so ids in URLs do not create new series.
+    WebSocket connections are passed through untimed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            observe_request(scope["method"], endpoint, status, time.perf_counter() - start)
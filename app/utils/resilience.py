@@ -0,0 +1,320 @@
+"""
+Deadlines, retries and circuit breakers for upstream API calls.
+
+Each upstream (Ultravox, Plivo) has one shared Upstream: every call gets
+a total deadline, attempts are retried with jittered backoff when the
+upstream rejected the request before acting on it (429, 503 or a failed
+connect), honouring Retry-After, and a circuit breaker fails calls fast
+while the upstream keeps failing. Idempotent requests are also retried on
+502 and 504.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import httpx # type: ignore
+from app.core.config import settings
+from app.utils.logger import get_logger
+from app.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Statuses that mean the request was not acted on, so even a call creation can be retried
+RETRY_STATUSES = frozenset({429, 503})
+
+# A gateway may send these after the upstream already acted on the request,
+# so only requests that are safe to repeat are retried on them
+IDEMPOTENT_RETRY_STATUSES = RETRY_STATUSES | {502, 504}
+
+# Transport errors raised before the request reached the upstream
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+class CircuitOpenError(Exception):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable, circuit breaker open for another {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify(exc: BaseException, idempotent: bool = False) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide how an exception from an upstream call is handled.
+
+    Args:
+        exc: The exception raised by the attempt
+        idempotent: The request is safe to repeat even if the upstream acted on it
+
+    Returns:
+        Tuple of (counts as an upstream failure, safe to retry, Retry-After seconds)
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status in (IDEMPOTENT_RETRY_STATUSES if idempotent else RETRY_STATUSES):
+            return True, True, parse_retry_after(exc.response.headers.get("Retry-After"))
+        # Other 5xx may have been acted on, so a creation is not repeated
+        return status >= 500, False, None
+    if isinstance(exc, _NOT_SENT_ERRORS):
+        return True, True, None
+    if isinstance(exc, httpx.TransportError):
+        return True, False, None
+    return False, False, None
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures.
+
+    While open, calls are rejected for reset_timeout seconds; then one
+    probe call is let through (half-open) and its outcome closes or
+    re-opens the circuit. Thread-safe, as Flask threads and the background
+    loop share it.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Let a call through or raise CircuitOpenError.
+
+        Returns:
+            True if the call is the half-open probe
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            now = time.monotonic()
+            if self.state == self.OPEN and now >= self._opened_at + self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info("Circuit breaker for %s half-open, probing", self.name)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(0.0, self._opened_at + self.reset_timeout - now))
+
+    def record_success(self):
+        with self._lock:
+            self._probing = False
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker for %s closed", self.name)
+                self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._probing = False
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(
+                    "Circuit breaker for %s opened after %s consecutive failures",
+                    self.name, self.consecutive_failures
+                )
+
+    def abandon(self):
+        """Release the half-open probe slot when the probe ended without an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_in": round(retry_in, 3),
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+class Upstream:
+    """
+    Runs calls to one upstream under a deadline, a retry policy and a breaker.
+
+    An operation is a callable taking the per-attempt timeout in seconds;
+    it should raise httpx errors (e.g. via raise_for_status) on failure.
+    Operations are treated as not idempotent (creations, Speak) unless the
+    caller passes idempotent=True.
+    """
+
+    def __init__(self, name: str, deadline: float, timeout: float, attempts: int,
+                 base_delay: float, max_delay: float, breaker: CircuitBreaker):
+        self.name = name
+        self.deadline = deadline
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self._random = random.Random()
+
+    def call(self, operation: Callable[[float], T], idempotent: bool = False) -> T:
+        """Run a blocking operation, sleeping on the calling thread between attempts."""
+        self.calls += 1
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                result = operation(self._attempt_timeout(deadline_at))
+            except Exception as e:
+                delay = self._after_failure(e, attempt, deadline_at, idempotent)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, operation: Callable[[float], Awaitable[T]], idempotent: bool = False) -> T:
+        """Run a coroutine operation, awaiting between attempts."""
+        self.calls += 1
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                result = await operation(self._attempt_timeout(deadline_at))
+            except Exception as e:
+                delay = self._after_failure(e, attempt, deadline_at, idempotent)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled: a half-open probe must not stay claimed
+                if probe:
+                    self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _attempt_timeout(self, deadline_at: float) -> float:
+        return max(0.001, min(self.timeout, deadline_at - time.monotonic()))
+
+    def _after_failure(self, exc: Exception, attempt: int, deadline_at: float,
+                       idempotent: bool = False) -> Optional[float]:
+        """Record a failed attempt and return the delay before the next one, or None to give up."""
+        failure, retryable, retry_after = classify(exc, idempotent)
+        if not failure:
+            # The upstream answered, e.g. with a 4xx for a bad request
+            self.breaker.record_success()
+            return None
+        self.failures += 1
+        self.breaker.record_failure()
+        if not retryable or attempt + 1 >= self.attempts:
+            return None
+
+        # Full jitter, or Retry-After plus jitter so clients do not retry in lockstep
+        backoff = self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        delay = retry_after + self._random.uniform(0, self.base_delay) if retry_after is not None else backoff
+        if time.monotonic() + delay >= deadline_at:
+            self.deadline_exceeded += 1
+            logger.warning("Not retrying %s: next attempt in %.2fs would pass the deadline", self.name, delay)
+            return None
+        self.retries += 1
+        logger.warning("%s attempt %s failed (%s), retrying in %.2fs", self.name, attempt + 1, str(exc), delay)
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deadline": self.deadline,
+            "timeout": self.timeout,
+            "attempts": self.attempts,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "breaker": self.breaker.to_dict()
+        }
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+def get_upstream(name: str, deadline: float) -> Upstream:
+    """Return the shared Upstream for a name, creating it with the configured policy."""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = _upstreams[name] = Upstream(
+                name,
+                deadline=deadline,
+                timeout=settings.UPSTREAM_TIMEOUT,
+                attempts=settings.UPSTREAM_RETRY_ATTEMPTS,
+                base_delay=settings.UPSTREAM_RETRY_BASE_DELAY,
+                max_delay=settings.UPSTREAM_RETRY_MAX_DELAY,
+                breaker=CircuitBreaker(name, settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_TIMEOUT)
+            )
+        return upstream
+
+def get_upstream_stats() -> Dict[str, Any]:
+    """Retry counters and circuit breaker state per upstream."""
+    return {name: upstream.stats() for name, upstream in sorted(_upstreams.items())}
+
+_BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+registry.callback(
+    "upstream_circuit_state", "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open.", "gauge",
+    ("upstream",), lambda: [((name,), _BREAKER_STATE_VALUES[u.breaker.state]) for name, u in _upstreams.items()]
+)
+registry.callback(
+    "upstream_retries_total", "Upstream call attempts retried after a retryable failure.", "counter",
+    ("upstream",), lambda: [((name,), u.retries) for name, u in _upstreams.items()]
+)
+registry.callback(
+    "upstream_failures_total", "Upstream call attempts that failed with 5xx, 429 or a transport error.", "counter",
+    ("upstream",), lambda: [((name,), u.failures) for name, u in _upstreams.items()]
+)
+registry.callback(
+    "upstream_rejected_total", "Upstream calls failed fast by an open circuit breaker.", "counter",
+    ("upstream",), lambda: [((name,), u.breaker.rejected) for name, u in _upstreams.items()]
+)
@@ -0,0 +1,269 @@
+"""
+Shared outbound HTTP transport for the upstream APIs.
+
+Each upstream (Ultravox, Plivo, OpenAI) gets one keep-alive connection
+pool per worker: a blocking httpx.Client shared by all threads, and an
+httpx.AsyncClient per event loop, since async connections are bound to the
+loop that opened them. Pool limits, keep-alive expiry and HTTP/2 come from
+the HTTP_* settings, and host names are resolved through a small DNS cache
+so new connections skip the lookup.
+"""
+import asyncio
+import importlib.util
+import ipaddress
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import httpcore # type: ignore
+import httpx # type: ignore
+from app.core.config import settings
+from app.utils.logger import get_logger
+from app.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+class DnsCache:
+    """
+    Caches getaddrinfo results for DNS_CACHE_TTL seconds.
+
+    Only the TCP connect goes to the cached address; TLS still verifies and
+    sends SNI for the host name. An address that refuses connections is
+    forgotten, so the next connect resolves the name again.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, host: str, port: int) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, host: str, port: int, infos: List[Tuple]) -> List[str]:
+        # Keep the resolver's order, without duplicates from other socket types
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        cached = self._cached(host, port)
+        if cached is not None:
+            return cached
+        return self._store(host, port, socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+
+    async def resolve_async(self, host: str, port: int) -> List[str]:
+        cached = self._cached(host, port)
+        if cached is not None:
+            return cached
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return self._store(host, port, infos)
+
+    def forget(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ttl": self.ttl, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class CachingBackend(httpcore.NetworkBackend):
+    """httpcore network backend that connects to addresses from a DnsCache."""
+
+    def __init__(self, backend: httpcore.NetworkBackend, cache: DnsCache):
+        self.backend = backend
+        self.cache = cache
+
+    def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                    local_address: Optional[str] = None, socket_options: Any = None) -> httpcore.NetworkStream:
+        if _is_ip(host):
+            return self.backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        error: Optional[Exception] = None
+        for address in self.cache.resolve(host, port):
+            try:
+                return self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self.cache.forget(host, port)
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    def connect_unix_socket(self, *args, **kwargs) -> httpcore.NetworkStream:
+        return self.backend.connect_unix_socket(*args, **kwargs)
+
+    def sleep(self, seconds: float):
+        self.backend.sleep(seconds)
+
+class AsyncCachingBackend(httpcore.AsyncNetworkBackend):
+    """Async counterpart of CachingBackend."""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, cache: DnsCache):
+        self.backend = backend
+        self.cache = cache
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        if _is_ip(host):
+            return await self.backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        error: Optional[Exception] = None
+        for address in await self.cache.resolve_async(host, port):
+            try:
+                return await self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self.cache.forget(host, port)
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, *args, **kwargs) -> httpcore.AsyncNetworkStream:
+        return await self.backend.connect_unix_socket(*args, **kwargs)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+def _pool_stats(transport: Any) -> Dict[str, int]:
+    """Connection counts of an httpx transport's httpcore pool."""
+    # httpx keeps its httpcore ConnectionPool in the private _pool attribute
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "active": len(connections) - idle, "idle": idle}
+
+class HttpClients:
+    """
+    The worker's pooled HTTP clients, one set per upstream name.
+
+    Clients are created on first use. Requests should pass their own auth
+    and headers, since each client is shared by everything that talks to
+    that upstream.
+    """
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        self.http2 = settings.HTTP2_ENABLED
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP2_ENABLED is set but the h2 package is not installed, using HTTP/1.1")
+            self.http2 = False
+        self.dns_cache = DnsCache(settings.DNS_CACHE_TTL) if settings.DNS_CACHE_TTL > 0 else None
+        self._clients: Dict[str, Tuple[httpx.Client, Any]] = {}
+        self._async_clients: Dict[Tuple[str, asyncio.AbstractEventLoop], Tuple[httpx.AsyncClient, Any]] = {}
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def client(self, name: str) -> httpx.Client:
+        """The blocking client for an upstream; thread-safe, shared by all threads."""
+        entry = self._clients.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._clients.get(name)
+                if entry is None:
+                    transport = self._transport(name, httpx.HTTPTransport, CachingBackend)
+                    entry = self._clients[name] = (self._build(httpx.Client, name, transport), transport)
+        return entry[0]
+
+    def async_client(self, name: str) -> httpx.AsyncClient:
+        """The async client for an upstream on the running event loop."""
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get((name, loop))
+        if entry is None:
+            with self._lock:
+                # Clients of loops that have since closed can no longer be used
+                for key in [key for key in self._async_clients if key[1].is_closed()]:
+                    del self._async_clients[key]
+                transport = self._transport(name, httpx.AsyncHTTPTransport, AsyncCachingBackend)
+                entry = self._async_clients[(name, loop)] = (
+                    self._build(httpx.AsyncClient, name, transport), transport
+                )
+        return entry[0]
+
+    def _transport(self, name: str, transport_class: type, backend_class: type) -> Any:
+        transport = transport_class(limits=self.limits, http2=self.http2)
+        pool = getattr(transport, "_pool", None)
+        if self.dns_cache is not None and pool is not None and hasattr(pool, "_network_backend"):
+            pool._network_backend = backend_class(pool._network_backend, self.dns_cache)
+        return transport
+
+    def _build(self, client_class: type, name: str, transport: Any) -> Any:
+        self._requests.setdefault(name, 0)
+        if client_class is httpx.AsyncClient:
+            async def count(request: httpx.Request):
+                self._requests[name] += 1
+        else:
+            def count(request: httpx.Request):
+                self._requests[name] += 1
+        logger.info("Created pooled %s for %s (http2=%s)", client_class.__name__, name, self.http2)
+        return client_class(transport=transport, timeout=settings.UPSTREAM_TIMEOUT, event_hooks={"request": [count]})
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilization per upstream, summed over the blocking client and every event loop."""
+        upstreams: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            transports = [(name, transport) for name, (_, transport) in self._clients.items()]
+            transports += [(name, transport) for (name, _), (_, transport) in self._async_clients.items()]
+            requests = dict(self._requests)
+        for name, transport in transports:
+            upstream = upstreams.setdefault(name, {"pools": 0, "connections": 0, "active": 0, "idle": 0})
+            upstream["pools"] += 1
+            for field, value in _pool_stats(transport).items():
+                upstream[field] += value
+        for name, upstream in upstreams.items():
+            upstream["requests"] = requests.get(name, 0)
+            capacity = upstream["pools"] * settings.HTTP_MAX_CONNECTIONS
+            upstream["utilization"] = round(upstream["active"] / capacity, 3) if capacity else 0.0
+        return {
+            "http2": self.http2,
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": settings.HTTP_KEEPALIVE_EXPIRY,
+            "dns_cache": self.dns_cache.stats() if self.dns_cache is not None else None,
+            "upstreams": upstreams
+        }
+
+    async def aclose(self):
+        """Close the async clients bound to the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._async_clients if key[1] is loop]
+            clients = [self._async_clients.pop(key)[0] for key in keys]
+        for client in clients:
+            await client.aclose()
+
+    def close(self):
+        """Close the blocking clients."""
+        with self._lock:
+            clients = [client for client, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+http_clients = HttpClients()
+
+registry.callback(
+    "http_pool_connections", "Pooled upstream connections per upstream and state (active or idle).", "gauge",
+    ("upstream", "state"), lambda: [
+        ((name, state), upstream[state])
+        for name, upstream in http_clients.stats()["upstreams"].items() for state in ("active", "idle")
+    ]
+)
+registry.callback(
+    "http_upstream_requests_total", "Requests sent through the pooled clients per upstream.", "counter",
+    ("upstream",), lambda: [((name,), count) for name, count in list(http_clients._requests.items())]
+)
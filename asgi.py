@@ -0,0 +1,7 @@
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
+
+if __name__ == "__main__":
+    import uvicorn # type: ignore
+    uvicorn.run("asgi:app", host="0.0.0.0", port=8000)
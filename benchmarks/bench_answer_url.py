@@ -0,0 +1,87 @@
+"""
+Benchmark for Plivo XML rendering and the /answer_url endpoint.
+
+First compares rendering the answer document the old way (f-string, then
+a minidom reparse) with the precompiled renderer, cold and cached. Then it
+drives /answer_url through the Flask test client from several threads and
+reports throughput and latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_answer_url [concurrency] [requests_per_thread]
+"""
+import statistics
+import sys
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from xml.dom import minidom
+
+from app import create_app
+from app.services import plivo_xml
+
+JOIN_URL = "wss://voice.ultravox.ai/calls/4c9ac4e5-6d0c-4e0c-9f3b-1d1c6b2b8a11/server_web_socket?token=abc&x=1"
+
+def legacy_answer_xml(join_url):
+    xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+    <Response>
+        <Stream
+            keepCallAlive="true"
+            bidirectional="true"
+            contentType="audio/x-l16;rate=16000"
+        >
+            {join_url}
+        </Stream>
+    </Response>
+    """
+    minidom.parseString(xml.replace("&", "&amp;")).toprettyxml(indent="  ")
+    return xml
+
+def render_benchmarks():
+    iterations = 20000
+    counter = iter(range(10 ** 9))
+    cases = (
+        ("legacy f-string + minidom", lambda: legacy_answer_xml(JOIN_URL)),
+        ("renderer, new join_url each call", lambda: plivo_xml.answer_document(f"{JOIN_URL}{next(counter)}")),
+        ("renderer, cached join_url", lambda: plivo_xml.answer_document(JOIN_URL)),
+    )
+    for name, func in cases:
+        seconds = timeit.timeit(func, number=iterations)
+        print(f"{name:36s} {seconds / iterations * 1e6:10.2f} us/document")
+
+def endpoint_benchmark(concurrency, per_thread):
+    app = create_app()
+    local = threading.local()
+
+    def request(index):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        # Every call fetches its answer_url a couple of times (answer plus retries)
+        join_url = quote(f"{JOIN_URL}{index // 2}", safe="")
+        start = time.perf_counter()
+        response = client.post(f"/answer_url?join_url={join_url}")
+        assert response.status_code == 200
+        return time.perf_counter() - start
+
+    total = concurrency * per_thread
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(request, range(total)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"/answer_url concurrency={concurrency}: {total / elapsed:,.0f} req/s, "
+        f"p50={quantiles[49] * 1000:.2f}ms p95={quantiles[94] * 1000:.2f}ms p99={quantiles[98] * 1000:.2f}ms"
+    )
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    render_benchmarks()
+    endpoint_benchmark(concurrency, per_thread)
+
+if __name__ == "__main__":
+    main()
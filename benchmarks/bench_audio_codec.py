@@ -0,0 +1,71 @@
+"""
+Benchmark for stream audio transcoding.
+
+Reports 20 ms frames per second on one core for every conversion the
+media relay performs, next to a per-sample pure-Python μ-law -> L16 16 kHz
+baseline. A frame/s figure divided by 50 is the number of concurrent
+one-way streams a core can keep up with.
+
+Usage:
+    python -m benchmarks.bench_audio_codec [seconds_per_case]
+"""
+import sys
+import time
+
+import numpy as np # type: ignore
+
+from app.services import audio_codec
+from app.services.audio_codec import ALAW_8K, L16_8K, L16_16K, MULAW_8K
+
+FRAME_MS = 20
+
+def frame_for(content_type, rng):
+    encoding, rate = audio_codec.parse_content_type(content_type)
+    samples = (rng.standard_normal(rate * FRAME_MS // 1000) * 3000).astype(np.int16)
+    return audio_codec.encode(samples, encoding)
+
+def python_mulaw_to_l16_16k(payload, table=audio_codec.MULAW_DECODE.tolist()):
+    out = []
+    previous = None
+    for code in payload:
+        sample = table[code]
+        if previous is not None:
+            out.append((previous + sample) >> 1)
+        out.append(sample)
+        previous = sample
+    out.append(previous)
+    return np.array(out, dtype="<i2").tobytes()
+
+def measure(func, payload, seconds):
+    frames = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func(payload)
+        frames += 100
+    return frames / (time.perf_counter() - start)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    rng = np.random.default_rng(0)
+    cases = [
+        (MULAW_8K, L16_16K),
+        (L16_16K, MULAW_8K),
+        (ALAW_8K, L16_16K),
+        (L16_16K, ALAW_8K),
+        (L16_8K, L16_16K),
+        (L16_16K, L16_8K),
+        (MULAW_8K, ALAW_8K),
+    ]
+    for source, target in cases:
+        payload = frame_for(source, rng)
+        rate = measure(audio_codec.get_transcoder(source, target), payload, seconds)
+        print(f"{source:24s} -> {target:24s} {rate:12,.0f} frames/s  ({rate / 50:,.0f} streams)")
+
+    payload = frame_for(MULAW_8K, rng)
+    rate = measure(python_mulaw_to_l16_16k, payload, seconds)
+    print(f"{'per-sample Python baseline':24s} {MULAW_8K} -> {L16_16K} {rate:12,.0f} frames/s  ({rate / 50:,.0f} streams)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Prompt size over a long call, with and without conversation memory.
+
+Simulates a call of many caller/assistant turns against ConversationStore,
+with a fake summarizer that takes --summary-latency milliseconds, and
+compares the history sent with each turn to naively resending the full
+transcript. Reports the estimated prompt tokens at a few points of the call
+and the time spent in the store per turn.
+
+Usage:
+    python -m benchmarks.bench_conversation_memory [--turns 200] [--max-tokens 1200] [--summary-latency 400]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.conversation_memory import ConversationStore, estimate_tokens
+
+CALLER = [
+    "I'd like to book a trial session for next Tuesday evening",
+    "Can you tell me how much the monthly membership costs",
+    "Is there parking near the HSR layout branch",
+    "My name is Priya and my number is nine eight four five",
+    "Actually make that Wednesday, Tuesday does not work for me",
+    "Do you offer anything for people with lower back pain",
+]
+
+ASSISTANT = [
+    "Sure, I can help with that. Which time works best for you?",
+    "The monthly membership is four thousand rupees, and the first session is free.",
+    "Yes, there is free parking right behind the building.",
+    "Thanks, I have noted your name and number for the booking.",
+    "No problem, I have moved your trial to Wednesday at the same time.",
+    "Yes, our trainers adapt every session to back problems, just let them know when you arrive.",
+]
+
+def history_tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+async def simulate(args):
+    async def summarizer(summary, turns, max_tokens):
+        await asyncio.sleep(args.summary_latency / 1000)
+        return (summary + " " + " ".join(content for _, content, _ in turns))[-max_tokens * 4:]
+
+    store = ConversationStore(summarizer, max_tokens=args.max_tokens, summary_tokens=args.summary_tokens,
+                              ttl=3600, max_calls=100, enabled=True)
+    rng = random.Random(42)
+    transcript = []
+    checkpoints = sorted({1, 10, args.turns // 4, args.turns // 2, args.turns})
+    store_seconds = 0.0
+    print(f"{'turn':>6s} {'memory tokens':>14s} {'full history tokens':>20s}")
+    for turn in range(1, args.turns + 1):
+        caller, answer = rng.choice(CALLER), rng.choice(ASSISTANT)
+        start = time.perf_counter()
+        history = store.messages("bench")
+        store.add("bench", "user", caller)
+        store.add("bench", "assistant", answer)
+        store_seconds += time.perf_counter() - start
+
+        if turn in checkpoints:
+            print(f"{turn:6d} {history_tokens(history):14d} {history_tokens(transcript):20d}")
+        transcript += [{"role": "user", "content": caller}, {"role": "assistant", "content": answer}]
+        # The caller speaks while the summarizer runs
+        await asyncio.sleep(args.turn_gap / 1000)
+
+    stats = store.stats()
+    print(f"\nstore time {store_seconds / args.turns * 1e6:.1f} us/turn, "
+          f"{stats['summaries']} summaries, {stats['turns_folded']} turns folded, "
+          f"{stats['turns_dropped']} dropped")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200, help="Caller/assistant exchanges in the call")
+    parser.add_argument("--max-tokens", type=int, default=1200, help="CONVERSATION_MAX_TOKENS")
+    parser.add_argument("--summary-tokens", type=int, default=200, help="CONVERSATION_SUMMARY_TOKENS")
+    parser.add_argument("--summary-latency", type=float, default=400, help="Fake summarizer latency (ms)")
+    parser.add_argument("--turn-gap", type=float, default=50, help="Time between exchanges (ms)")
+    asyncio.run(simulate(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
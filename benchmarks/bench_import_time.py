@@ -0,0 +1,109 @@
+"""
+Worker startup cost: importing the app modules and building each app.
+
+Every sample runs in a fresh interpreter, as a new gunicorn worker would:
+it times importing wsgi / asgi (which creates the app) and, with
+--first-request, the first /answer_url request through the app's test
+client, which is where lazily built services are paid for. Reports the
+median and spread per target, then the modules with the highest
+cumulative import time from `python -X importtime`.
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs 10] [--top 15] [--first-request]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "wsgi": "wsgi",
+    "asgi": "asgi",
+}
+
+JOIN_URL = "wss://voice.ultravox.ai/calls/bench/server_web_socket"
+
+# Runs in the child interpreter; prints timings in milliseconds as JSON
+SAMPLE = """
+import json, time
+start = time.perf_counter()
+module = __import__({module!r})
+imported = time.perf_counter()
+first_request = None
+if {first_request!r}:
+    app = module.app
+    if {module!r} == "wsgi":
+        client = app.test_client()
+    else:
+        from fastapi.testclient import TestClient
+        client = TestClient(app)
+    client.get("/answer_url", params={{"join_url": {join_url!r}}})
+    first_request = (time.perf_counter() - imported) * 1000
+print(json.dumps({{"import_ms": (imported - start) * 1000, "first_request_ms": first_request}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def child_environment():
+    # Quiet and offline: nothing in startup should need the real upstreams
+    return dict(os.environ, LOG_LEVEL="WARNING", JOIN_URL_POOL_ENABLED="false")
+
+def sample(module, first_request):
+    code = SAMPLE.format(module=module, first_request=first_request, join_url=JOIN_URL)
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=child_environment()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def top_imports(module, count):
+    """Top-level modules by cumulative import time, in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=child_environment()
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        # Only the outermost import of each package, so nested modules are not counted twice
+        if len(indent) == 1:
+            totals[name] = totals.get(name, 0) + int(cumulative) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+def report(name, values):
+    values = sorted(values)
+    print(
+        f"{name:24s} median {statistics.median(values):8.1f}ms  "
+        f"min {values[0]:8.1f}ms  max {values[-1]:8.1f}ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list per target")
+    parser.add_argument("--first-request", action="store_true", help="Also time the first /answer_url request")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma-separated subset of: " + ", ".join(TARGETS))
+    args = parser.parse_args()
+
+    targets = [name.strip() for name in args.targets.split(",") if name.strip()]
+    print(f"python {sys.version.split()[0]}, {args.runs} runs per target\n")
+    for name in targets:
+        samples = [sample(TARGETS[name], args.first_request) for _ in range(args.runs)]
+        report(f"{name} import + create_app", [s["import_ms"] for s in samples])
+        if args.first_request:
+            report(f"{name} first request", [s["first_request_ms"] for s in samples])
+
+    for name in targets:
+        print(f"\nSlowest imports for {name} (cumulative):")
+        for module, milliseconds in top_imports(TARGETS[name], args.top):
+            print(f"  {milliseconds:8.1f}ms  {module}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throughput benchmark for transcription intent routing.
+
+Compares the old per-event path (re-read and re-parse RESPONSE_TEMPLATES,
+then chains of substring scans) with IntentRouter on a mix of synthetic
+transcripts, and reports transcription events per second.
+
+Usage:
+    python -m benchmarks.bench_intent_router [events]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+from app.core.config import settings, DEFAULT_RESPONSE_TEMPLATES
+from app.services.intent_router import IntentRouter
+
+PHRASES = [
+    "Hello, is this EMS Xperience?",
+    "What's the weather like in Bangalore today",
+    "Can you tell me your name please",
+    "Okay thanks, goodbye",
+    "How much does the one to one training cost",
+    "I want to book a free trial session next week",
+    "Do you have a branch in Chennai or only in HSR layout",
+    "Is it safe if I have back pain",
+]
+
+def legacy_route(text):
+    templates = settings.get_response_templates()
+    lower_text = text.lower()
+    if any(greeting in lower_text for greeting in ["hello", "hi", "hey"]):
+        return templates["greeting"]
+    elif "weather" in lower_text:
+        return templates["weather"]
+    elif "name" in lower_text:
+        return templates["name"]
+    elif any(bye in lower_text for bye in ["bye", "goodbye", "see you"]):
+        return templates["goodbye"]
+    return templates["default"].format(text=text)
+
+def run(name, func, events):
+    start = time.perf_counter()
+    for text in events:
+        func(text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:30s} {len(events) / elapsed:12,.0f} events/s  {elapsed / len(events) * 1e6:8.2f} us/event")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(42)
+    events = [rng.choice(PHRASES) for _ in range(count)]
+
+    # Custom templates in the environment, as in production
+    os.environ["RESPONSE_TEMPLATES"] = json.dumps(DEFAULT_RESPONSE_TEMPLATES)
+    router = IntentRouter()
+
+    run("legacy (parse env + scans)", legacy_route, events)
+    run("IntentRouter", router.route, events)
+
+if __name__ == "__main__":
+    main()
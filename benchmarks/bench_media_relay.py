@@ -0,0 +1,87 @@
+"""
+End-to-end benchmark for the WebSocket media relay.
+
+Runs the ASGI app under uvicorn in-process, a FakeUltravoxPeer as the
+joinUrl and a number of concurrent FakePlivoPeer streams through
+/media/relay. Reports round-trip latency percentiles for the frames, then
+checks the relay's own loss accounting against the frames the fake Plivo
+peers dropped on purpose.
+
+Usage:
+    python -m benchmarks.bench_media_relay [streams] [frames_per_stream] [drop_rate] [reorder_rate]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from urllib.parse import quote
+
+import httpx # type: ignore
+import uvicorn # type: ignore
+
+from app.asgi import create_asgi_app
+from benchmarks.fake_media_peers import FakePlivoPeer, FakeUltravoxPeer
+
+HOST = "127.0.0.1"
+APP_PORT = 8767
+ULTRAVOX_PORT = 8766
+
+async def run(streams, frames, drop_rate, reorder_rate):
+    ultravox = FakeUltravoxPeer()
+    await ultravox.start(HOST, ULTRAVOX_PORT)
+
+    server = uvicorn.Server(uvicorn.Config(create_asgi_app(), host=HOST, port=APP_PORT, log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        peers = [
+            FakePlivoPeer(f"call-{i}", frames, drop_rate=drop_rate, reorder_rate=reorder_rate, seed=i)
+            for i in range(streams)
+        ]
+        urls = [
+            f"ws://{HOST}:{APP_PORT}/media/relay?join_url="
+            + quote(f"ws://{HOST}:{ULTRAVOX_PORT}/calls/{peer.call_id}", safe="")
+            for peer in peers
+        ]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(peer.run(url) for peer, url in zip(peers, urls)))
+        elapsed = time.perf_counter() - start
+
+        round_trips = sorted(rtt for result in results for rtt in result["round_trips"])
+        sent = sum(result["sent"] for result in results)
+        echoed = sum(result["echoed"] for result in results)
+        dropped = sum(result["dropped"] for result in results)
+        quantiles = statistics.quantiles(round_trips, n=100)
+        print(f"streams={streams} frames/stream={frames} drop_rate={drop_rate} reorder_rate={reorder_rate}")
+        print(
+            f"frames sent={sent} echoed={echoed} ({echoed / elapsed:,.0f} frames/s), round trip "
+            f"p50={quantiles[49] * 1000:.2f}ms p95={quantiles[94] * 1000:.2f}ms p99={quantiles[98] * 1000:.2f}ms"
+        )
+
+        async with httpx.AsyncClient(base_url=f"http://{HOST}:{APP_PORT}") as client:
+            stats = (await client.get("/media/stats")).json()
+        recent = stats["recent"]
+        lost = sum(stream["lost"] for stream in recent)
+        reordered = sum(stream["reordered"] for stream in recent)
+        jitter = statistics.mean(stream["jitter_ms"] for stream in recent) if recent else 0.0
+        latency = max((stream["relay_latency_p99_ms"] for stream in recent), default=0.0)
+        print(
+            f"relay: streams={len(recent)} lost={lost} (peers dropped {dropped}, trailing drops are not "
+            f"detectable) reordered={reordered} mean jitter={jitter:.2f}ms worst relay p99={latency:.3f}ms"
+        )
+    finally:
+        server.should_exit = True
+        await serving
+        await ultravox.stop()
+
+def main():
+    streams = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    drop_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    reorder_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.01
+    asyncio.run(run(streams, frames, drop_rate, reorder_rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Microbenchmark for Ultravox call payload serialization.
+
+Compares the per-call cost of the old path (rebuild the dict, pretty-print it
+for the INFO log line, then let httpx encode it) with UltravoxPayloadBuilder,
+with and without per-call overrides.
+
+Usage:
+    python -m benchmarks.bench_ultravox_payload [iterations]
+"""
+import json
+import sys
+import timeit
+
+from app.models.schemas import InactivityMessage, Message
+from app.services.ultravox_service import UltravoxService
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    service = UltravoxService()
+    builder = service.payload_builder
+
+    def legacy():
+        payload = service._build_payload()
+        json.dumps(payload, indent=2)
+        json.dumps(payload).encode("utf-8")
+
+    def precompiled():
+        builder.build()
+
+    inactivity = [InactivityMessage(text="Are you still there?"), InactivityMessage(text="Goodbye!")]
+    initial = [Message(text="Hello! How can I help you today?")]
+
+    def precompiled_overrides():
+        builder.build(
+            system_prompt="You are a helpful assistant",
+            inactivity_messages=inactivity,
+            initial_messages=initial
+        )
+
+    print(f"Payload size: {len(builder.build())} bytes, {iterations} iterations")
+    for name, func in (("legacy dict + indent=2 log + encode", legacy),
+                       ("precompiled, no overrides", precompiled),
+                       ("precompiled, all overrides", precompiled_overrides)):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"{name:40s} {seconds / iterations * 1e6:10.2f} us/call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Throughput comparison of the WSGI (Flask) and ASGI (FastAPI) entry points.
+
+Starts each server profile under gunicorn with the same number of worker
+processes, waits for it to come up, then drives the callback endpoints
+Plivo and Ultravox hit hardest with concurrent keep-alive clients and
+reports requests/second and latency percentiles per endpoint.
+
+Profiles:
+    wsgi-sync     gunicorn sync workers serving wsgi:app
+    wsgi-gthread  gunicorn threaded workers serving wsgi:app
+    asgi          gunicorn_asgi.conf.py (uvicorn workers) serving asgi:app
+
+Usage:
+    python -m benchmarks.bench_wsgi_vs_asgi [workers] [concurrency] [requests_per_endpoint]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx # type: ignore
+
+HOST = "127.0.0.1"
+PORT = 8765
+BASE = f"http://{HOST}:{PORT}"
+JOIN_URL = "wss%3A%2F%2Fvoice.ultravox.ai%2Fcalls%2Fbench%2Fserver_web_socket"
+
+def profiles(workers):
+    bind = f"{HOST}:{PORT}"
+    return [
+        ("wsgi-sync", ["gunicorn", "-w", str(workers), "-b", bind, "wsgi:app"]),
+        ("wsgi-gthread", ["gunicorn", "-w", str(workers), "-k", "gthread", "--threads", "8", "-b", bind, "wsgi:app"]),
+        ("asgi", ["gunicorn", "-c", "gunicorn_asgi.conf.py", "-w", str(workers), "-b", bind, "asgi:app"]),
+    ]
+
+ENDPOINTS = [
+    ("GET /answer_url", lambda client, i: client.get(f"/answer_url?join_url={JOIN_URL}{i % 50}")),
+    ("POST /webhook", lambda client, i: client.post(
+        "/webhook", json={"type": "transcription", "text": "what are your business hours?"})),
+    ("POST /call_status", lambda client, i: client.post(
+        "/call_status", data={"CallUUID": f"bench-{i}", "CallStatus": "completed"})),
+]
+
+def wait_until_ready(process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(f"{BASE}/pool/stats", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+async def drive(send, concurrency, total):
+    latencies = []
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=BASE, limits=limits, timeout=30.0) as client:
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                response = await send(client, i)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return total / elapsed, quantiles[49], quantiles[94], quantiles[98]
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    total = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    env = dict(os.environ, LOG_LEVEL="WARNING", WEB_CONCURRENCY=str(workers))
+    print(f"workers={workers} concurrency={concurrency} requests/endpoint={total}")
+    for name, command in profiles(workers):
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(process)
+            for endpoint, send in ENDPOINTS:
+                rate, p50, p95, p99 = asyncio.run(drive(send, concurrency, total))
+                print(
+                    f"{name:13s} {endpoint:18s} {rate:10,.0f} req/s  "
+                    f"p50={p50 * 1000:.2f}ms p95={p95 * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+                )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+if __name__ == "__main__":
+    main()
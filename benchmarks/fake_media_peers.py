@@ -0,0 +1,145 @@
+"""
+Local stand-ins for the two ends of a media stream.
+
+FakeUltravoxPeer is a WebSocket server playing the Ultravox joinUrl: it
+answers every caller media frame with a playAudio frame carrying the same
+payload, tagged with the frame's sequence number. FakePlivoPeer plays
+Plivo: it connects to a stream URL, sends start, paced L16 16 kHz media
+frames (optionally dropping or swapping some) and stop, and measures the
+round trip of every frame that comes back.
+"""
+import asyncio
+import base64
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets # type: ignore
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2  # 16-bit mono
+
+class FakeUltravoxPeer:
+    """Echoes caller audio back as playAudio frames."""
+
+    def __init__(self):
+        self.streams = 0
+        self.frames = 0
+        self.sequence_numbers: List[int] = []
+        self._server = None
+
+    async def start(self, host: str, port: int):
+        self._server = await websockets.serve(self._handle, host, port, compression=None)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, websocket, path=None):
+        self.streams += 1
+        async for message in websocket:
+            event = json.loads(message)
+            if event.get("event") != "media":
+                continue
+            self.frames += 1
+            seq = event.get("sequenceNumber")
+            self.sequence_numbers.append(seq)
+            await websocket.send(json.dumps({
+                "event": "playAudio",
+                "echo": seq,
+                "media": {
+                    "contentType": "audio/x-l16",
+                    "sampleRate": SAMPLE_RATE,
+                    "payload": event["media"]["payload"]
+                }
+            }))
+
+class FakePlivoPeer:
+    """Streams caller audio into a URL the way Plivo's bidirectional <Stream> does."""
+
+    def __init__(self, call_id: str, frames: int, interval: float = FRAME_MS / 1000,
+                 drop_rate: float = 0.0, reorder_rate: float = 0.0, seed: Optional[int] = None):
+        self.call_id = call_id
+        self.frames = frames
+        self.interval = interval
+        self.drop_rate = drop_rate
+        self.reorder_rate = reorder_rate
+        self.random = random.Random(seed)
+        self.payload = base64.b64encode(bytes(FRAME_BYTES)).decode("ascii")
+        self.sent_at: Dict[int, float] = {}
+        self.round_trips: List[float] = []
+        self.dropped = 0
+        self.reordered = 0
+
+    def _media(self, seq: int) -> str:
+        return json.dumps({
+            "event": "media",
+            "sequenceNumber": seq,
+            "streamId": f"stream-{self.call_id}",
+            "media": {
+                "track": "inbound",
+                "timestamp": str(int(seq * FRAME_MS)),
+                "chunk": seq,
+                "payload": self.payload
+            }
+        })
+
+    async def run(self, url: str, drain_timeout: float = 2.0) -> Dict[str, Any]:
+        async with websockets.connect(url, compression=None) as websocket:
+            receiver = asyncio.ensure_future(self._receive(websocket))
+            await websocket.send(json.dumps({
+                "event": "start",
+                "sequenceNumber": 0,
+                "start": {"callId": self.call_id, "streamId": f"stream-{self.call_id}",
+                          "mediaFormat": {"encoding": "audio/x-l16", "sampleRate": SAMPLE_RATE}}
+            }))
+
+            held = None
+            next_send = time.perf_counter()
+            for seq in range(1, self.frames + 1):
+                if self.random.random() < self.drop_rate:
+                    self.dropped += 1
+                    continue
+                if held is None and self.random.random() < self.reorder_rate:
+                    # Send this frame after the next one
+                    held = seq
+                    continue
+                await self._send(websocket, seq)
+                if held is not None:
+                    self.reordered += 1
+                    await self._send(websocket, held)
+                    held = None
+                next_send += self.interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if held is not None:
+                await self._send(websocket, held)
+
+            await websocket.send(json.dumps({"event": "stop", "stop": {"callId": self.call_id}}))
+            expected = len(self.sent_at)
+            deadline = time.perf_counter() + drain_timeout
+            while len(self.round_trips) < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+            receiver.cancel()
+
+        return {
+            "sent": len(self.sent_at),
+            "dropped": self.dropped,
+            "reordered": self.reordered,
+            "echoed": len(self.round_trips),
+            "round_trips": self.round_trips
+        }
+
+    async def _send(self, websocket, seq: int):
+        self.sent_at[seq] = time.perf_counter()
+        await websocket.send(self._media(seq))
+
+    async def _receive(self, websocket):
+        async for message in websocket:
+            seq = json.loads(message).get("echo")
+            sent_at = self.sent_at.get(seq)
+            if sent_at is not None:
+                self.round_trips.append(time.perf_counter() - sent_at)
@@ -0,0 +1,255 @@
+"""
+Local stand-ins for the HTTP APIs the service calls.
+
+One ASGI app mimics the endpoints we use on Ultravox (create, list and get
+calls), Plivo (Call and Speak) and OpenAI (chat completions, plain and
+streamed). Each upstream has its own latency, jitter and error rate, so a
+load test can run the whole call flow without spending real minutes.
+Point the service at it with:
+
+    ULTRAVOX_API_URL=http://HOST:PORT/ultravox/api
+    PLIVO_API_URL=http://HOST:PORT/plivo/v1
+    OPENAI_BASE_URL=http://HOST:PORT/openai/v1
+
+GET /stats reports request and injected error counts per upstream.
+
+Usage:
+    python -m benchmarks.fake_upstreams [--port 8790] [--ultravox-latency 150] [--error-rate 0.01] ...
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import uvicorn # type: ignore
+from fastapi import FastAPI, Request # type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse # type: ignore
+
+UPSTREAMS = ("ultravox", "plivo", "openai")
+
+FAKE_REPLY = "Our studio is open from 7 in the morning to 9 at night, Monday to Saturday."
+
+class UpstreamProfile:
+    """
+    Latency and failure behaviour of one fake upstream.
+
+    Every request waits latency_ms plus a uniform 0..jitter_ms, then fails
+    with error_status (and a Retry-After header) with probability error_rate.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status
+        }
+
+def create_fake_upstreams_app(profiles: Optional[Dict[str, UpstreamProfile]] = None,
+                              seed: Optional[int] = None) -> FastAPI:
+    """
+    Build the fake upstream app.
+
+    Args:
+        profiles: UpstreamProfile per name in UPSTREAMS; missing ones answer immediately
+        seed: Seed for latency jitter and error injection
+
+    Returns:
+        The FastAPI app
+    """
+    profiles = {name: (profiles or {}).get(name) or UpstreamProfile() for name in UPSTREAMS}
+    rng = random.Random(seed)
+    requests: Counter = Counter()
+    errors: Counter = Counter()
+    calls: Dict[str, Dict[str, Any]] = {}
+    app = FastAPI()
+
+    async def upstream(name: str) -> Optional[JSONResponse]:
+        """Apply the upstream's latency; return an error response if one is injected."""
+        profile = profiles[name]
+        requests[name] += 1
+        delay = profile.latency_ms + rng.uniform(0, profile.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if profile.error_rate and rng.random() < profile.error_rate:
+            errors[name] += 1
+            return JSONResponse(
+                {"error": f"injected {name} failure"},
+                status_code=profile.error_status,
+                headers={"Retry-After": "1"}
+            )
+        return None
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            name: {"requests": requests[name], "errors": errors[name], **profiles[name].to_dict()}
+            for name in UPSTREAMS
+        }
+
+    @app.post("/ultravox/api/calls")
+    async def ultravox_create_call(request: Request):
+        failure = await upstream("ultravox")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        call_id = str(uuid.uuid4())
+        call = {
+            "callId": call_id,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime()),
+            "ended": None,
+            "joinUrl": f"wss://voice.ultravox.ai/calls/{call_id}/server_web_socket",
+            "model": body.get("model"),
+            "voice": body.get("voice"),
+            "medium": body.get("medium")
+        }
+        calls[call_id] = call
+        return JSONResponse(call, status_code=201)
+
+    @app.get("/ultravox/api/calls")
+    async def ultravox_list_calls(request: Request):
+        failure = await upstream("ultravox")
+        if failure is not None:
+            return failure
+        page_size = int(request.query_params.get("pageSize", "100"))
+        offset = int(request.query_params.get("cursor", "0"))
+        ordered = list(calls.values())[::-1]
+        page = ordered[offset:offset + page_size]
+        following = offset + page_size
+        next_url = None
+        if following < len(ordered):
+            next_url = str(request.url.include_query_params(cursor=following))
+        return {"results": page, "next": next_url}
+
+    @app.get("/ultravox/api/calls/{call_id}")
+    async def ultravox_get_call(call_id: str):
+        failure = await upstream("ultravox")
+        if failure is not None:
+            return failure
+        call = calls.get(call_id)
+        if call is None:
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        return call
+
+    @app.post("/plivo/v1/Account/{auth_id}/Call/")
+    async def plivo_create_call(auth_id: str, request: Request):
+        failure = await upstream("plivo")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        if not body.get("to") or not body.get("answer_url"):
+            return JSONResponse({"error": "to and answer_url are required"}, status_code=400)
+        return JSONResponse({
+            "api_id": str(uuid.uuid4()),
+            "message": "call fired",
+            "request_uuid": str(uuid.uuid4())
+        }, status_code=201)
+
+    @app.post("/plivo/v1/Account/{auth_id}/Call/{call_uuid}/Speak/")
+    async def plivo_speak(auth_id: str, call_uuid: str):
+        failure = await upstream("plivo")
+        if failure is not None:
+            return failure
+        return JSONResponse({"api_id": str(uuid.uuid4()), "message": "speak started"}, status_code=202)
+
+    @app.post("/openai/v1/chat/completions")
+    async def openai_chat_completions(request: Request):
+        failure = await upstream("openai")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-3.5-turbo")
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": FAKE_REPLY},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70}
+            }
+
+        async def chunks():
+            words = FAKE_REPLY.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                }) + "\n\n"
+                await asyncio.sleep(0.01)
+            yield "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add --<upstream>-latency/-jitter/-error-rate options and shared defaults."""
+    parser.add_argument("--latency", type=float, default=100.0, help="Default upstream latency in ms")
+    parser.add_argument("--jitter", type=float, default=50.0, help="Default upstream jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Default upstream error rate (0..1)")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    for name in UPSTREAMS:
+        parser.add_argument(f"--{name}-latency", type=float, default=None)
+        parser.add_argument(f"--{name}-jitter", type=float, default=None)
+        parser.add_argument(f"--{name}-error-rate", type=float, default=None)
+
+def profiles_from_arguments(args: argparse.Namespace) -> Dict[str, UpstreamProfile]:
+    def pick(name, field, default):
+        value = getattr(args, f"{name}_{field}")
+        return default if value is None else value
+
+    return {
+        name: UpstreamProfile(
+            latency_ms=pick(name, "latency", args.latency),
+            jitter_ms=pick(name, "jitter", args.jitter),
+            error_rate=pick(name, "error_rate", args.error_rate),
+            error_status=args.error_status
+        )
+        for name in UPSTREAMS
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--seed", type=int, default=None)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_fake_upstreams_app(profiles_from_arguments(args), seed=args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Capacity test of the call flow against local fake upstreams.
+
+Starts benchmarks.fake_upstreams in one process and the ASGI app
+(gunicorn_asgi.conf.py) in another, with Ultravox, Plivo and OpenAI pointed
+at the fakes. Then it drives /initiate_call, /answer_url, /webhook and
+/call_status at each concurrency level and reports throughput, error count
+and p50/p95/p99 latency per endpoint and level. Nothing reaches the real
+APIs.
+
+Results, with the upstream profiles, worker count and git revision, are
+written to a JSON file so runs can be compared; --compare prints the
+throughput and p99 change against an earlier file.
+
+Usage:
+    python -m benchmarks.load_test [--concurrency 1,16,64] [--requests 2000] [--workers 2]
+        [--endpoints initiate_call,answer_url,webhook,call_status]
+        [--latency 100 --jitter 50 --error-rate 0.0 --ultravox-latency 300 ...]
+        [--output benchmarks/results/load_test.json] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx # type: ignore
+
+from benchmarks.fake_upstreams import add_profile_arguments
+
+HOST = "127.0.0.1"
+APP_PORT = 8765
+UPSTREAM_PORT = 8790
+APP_BASE = f"http://{HOST}:{APP_PORT}"
+UPSTREAM_BASE = f"http://{HOST}:{UPSTREAM_PORT}"
+JOIN_URL = "wss%3A%2F%2Fvoice.ultravox.ai%2Fcalls%2Fload%2Fserver_web_socket"
+
+ENDPOINTS = {
+    "initiate_call": ("POST /initiate_call", lambda client, i: client.post(
+        "/initiate_call", json={"to_number": f"+1555{i:07d}"})),
+    "answer_url": ("GET /answer_url", lambda client, i: client.get(
+        f"/answer_url?join_url={JOIN_URL}{i % 50}&RequestUUID=load-{i}&CallUUID=load-call-{i}")),
+    "webhook": ("POST /webhook", lambda client, i: client.post(
+        "/webhook", json={"type": "transcription", "text": "what are your business hours?"})),
+    "call_status": ("POST /call_status", lambda client, i: client.post(
+        "/call_status", data={"CallUUID": f"load-call-{i}", "CallStatus": "completed"})),
+}
+
+def app_environment(workers: int) -> Dict[str, str]:
+    """Environment for the app under test, with every upstream pointed at the fakes."""
+    return dict(
+        os.environ,
+        LOG_LEVEL="WARNING",
+        WEB_CONCURRENCY=str(workers),
+        BASE_URL=APP_BASE,
+        ULTRAVOX_API_URL=f"{UPSTREAM_BASE}/ultravox/api",
+        ULTRAVOX_API_KEY="fake-ultravox-key",
+        PLIVO_API_URL=f"{UPSTREAM_BASE}/plivo/v1",
+        PLIVO_AUTH_ID="MAFAKEAUTHID",
+        PLIVO_AUTH_TOKEN="fake-plivo-token",
+        PLIVO_PHONE_NUMBER="+15550000000",
+        OPENAI_BASE_URL=f"{UPSTREAM_BASE}/openai/v1",
+        OPENAI_API_KEY="fake-openai-key",
+        MEDIA_RELAY_ENABLED="false",
+    )
+
+def wait_until_ready(process: subprocess.Popen, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited during startup")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server for {url} did not start in time")
+
+def percentile_ms(quantiles: List[float], index: int) -> float:
+    return round(quantiles[index] * 1000, 3)
+
+async def drive(send, concurrency: int, total: int) -> Dict[str, Any]:
+    """Send total requests over concurrency keep-alive connections; failures are counted, not raised."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=APP_BASE, limits=limits, timeout=30.0) as client:
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    response = await send(client, i)
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": total,
+        "errors": errors,
+        "statuses": dict(statuses),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": percentile_ms(quantiles, 49),
+        "p95_ms": percentile_ms(quantiles, 94),
+        "p99_ms": percentile_ms(quantiles, 98),
+        "max_ms": round(latencies[-1] * 1000, 3)
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result["endpoint"], result["concurrency"]))
+        if previous is None:
+            continue
+        rps_change = (result["rps"] / previous["rps"] - 1) * 100 if previous["rps"] else 0.0
+        print(
+            f"{result['endpoint']:20s} c={result['concurrency']:<4d} "
+            f"rps {previous['rps']:10,.1f} -> {result['rps']:10,.1f} ({rps_change:+.1f}%)  "
+            f"p99 {previous['p99_ms']:9.2f}ms -> {result['p99_ms']:9.2f}ms"
+        )
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per endpoint before the first level")
+    parser.add_argument("--workers", type=int, default=2, help="App worker processes")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=0, help="Seed for upstream jitter and error injection")
+    parser.add_argument("--output", default=None, help="Results file, defaults to benchmarks/results/load_test-<time>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(unknown)}")
+    started = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    # Forward the upstream profile options to the fake upstreams process
+    upstream_command = [
+        sys.executable, "-m", "benchmarks.fake_upstreams", "--host", HOST, "--port", str(UPSTREAM_PORT),
+        "--seed", str(args.seed), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status)
+    ]
+    for name in ("ultravox", "plivo", "openai"):
+        for field in ("latency", "jitter", "error_rate"):
+            value = getattr(args, f"{name}_{field}")
+            if value is not None:
+                upstream_command += [f"--{name}-{field.replace('_', '-')}", str(value)]
+    app_command = [
+        "gunicorn", "-c", "gunicorn_asgi.conf.py", "-w", str(args.workers), "-b", f"{HOST}:{APP_PORT}", "asgi:app"
+    ]
+
+    upstreams = subprocess.Popen(upstream_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    app = None
+    try:
+        wait_until_ready(upstreams, f"{UPSTREAM_BASE}/stats")
+        app = subprocess.Popen(
+            app_command, env=app_environment(args.workers), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        wait_until_ready(app, f"{APP_BASE}/pool/stats")
+
+        print(f"workers={args.workers} requests/endpoint/level={args.requests} levels={levels}")
+        for name in endpoints:
+            if args.warmup:
+                asyncio.run(drive(ENDPOINTS[name][1], min(levels), args.warmup))
+
+        results = []
+        for concurrency in levels:
+            for name in endpoints:
+                endpoint, send = ENDPOINTS[name]
+                result = {"endpoint": endpoint, "concurrency": concurrency}
+                result.update(asyncio.run(drive(send, concurrency, args.requests)))
+                results.append(result)
+                print(
+                    f"{endpoint:20s} c={concurrency:<4d} {result['rps']:10,.1f} req/s  errors={result['errors']:<5d} "
+                    f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms p99={result['p99_ms']:.2f}ms"
+                )
+        upstream_stats = httpx.get(f"{UPSTREAM_BASE}/stats", timeout=5.0).json()
+    finally:
+        for process in (app, upstreams):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    report = {
+        "started": started,
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "workers": args.workers,
+        "requests_per_level": args.requests,
+        "concurrency_levels": levels,
+        "upstreams": upstream_stats,
+        "results": results
+    }
+    output = args.output or os.path.join(
+        "benchmarks", "results", time.strftime("load_test-%Y%m%d-%H%M%S.json", time.gmtime())
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+if __name__ == "__main__":
+    main()
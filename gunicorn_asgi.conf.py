@@ -0,0 +1,34 @@
+"""
+Production profile for the ASGI app: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn_asgi.conf.py asgi:app
+
+Each worker is a separate process with its own event loop, background loop,
+joinUrl pool, call registry and ingestion queue. Services start their
+background threads lazily, after the fork, so the app is not preloaded.
+
+Campaign slots, streaming continuations, conversation memory and
+idempotency keys live in one worker's memory, so the profile runs a single
+worker by default. Raise WEB_CONCURRENCY only behind routing that keeps
+each call's requests on one worker (see the README).
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Plivo and Ultravox callbacks arrive over a few long-lived connections
+keepalive = int(os.getenv("KEEPALIVE", "75"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+# Worker recycling is off: a recycled worker takes its running campaigns,
+# async initiations and queued webhook events with it
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+preload_app = False
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
@@ -1,16 +1,9 @@
-import os
 import logging
-from flask import Flask # type: ignore
-from app.api.endpoints.ultravox import router as ultravox_router
-from app.core.config import settings
+from app import create_app
 
-# Setup Flask with correct template folder
-app = Flask(__name__, 
-    template_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'templates'))
-app.register_blueprint(ultravox_router)
-
-# Logging Configuration
-logging.basicConfig(level=settings.LOG_LEVEL)
+# Built by the app factory, so this entry point gets the same startup checks
+# (stream format, no media relay under Flask), logging and request metrics as wsgi.py
+app = create_app()
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from app.services import audio_codec
+from app.services.audio_codec import (
+    ALAW_8K, ALAW_DECODE, ALAW_ENCODE, L16_8K, L16_16K, MULAW_8K, MULAW_DECODE, MULAW_ENCODE
+)
+from app.services.media_relay import StreamTranscoder
+
+def pcm(*samples):
+    return np.array(samples, dtype=np.int16)
+
+def test_mulaw_decodes_known_vectors():
+    assert MULAW_DECODE[0x00] == -32124
+    assert MULAW_DECODE[0x7F] == 0
+    assert MULAW_DECODE[0x80] == 32124
+    assert MULAW_DECODE[0xFF] == 0
+
+def test_alaw_decodes_known_vectors():
+    assert ALAW_DECODE[0xD5] == 8
+    assert ALAW_DECODE[0x55] == -8
+    assert ALAW_DECODE[0xAA] == 32256
+    assert ALAW_DECODE[0x2A] == -32256
+
+def test_encoders_map_silence_to_the_zero_codes():
+    assert audio_codec.encode(pcm(0), "audio/x-mulaw") == b"\xff"
+    assert audio_codec.encode(pcm(0), "audio/x-alaw") == b"\xd5"
+
+@pytest.mark.parametrize("encoding, positive, negative", [
+    ("audio/x-mulaw", 0x80, 0x00),
+    ("audio/x-alaw", 0xAA, 0x2A),
+])
+def test_encoders_clip_at_full_scale(encoding, positive, negative):
+    assert audio_codec.encode(pcm(32767, 32760, 32124), encoding) == bytes([positive] * 3)
+    assert audio_codec.encode(pcm(-32767, -32768), encoding) == bytes([negative] * 2)
+
+def test_mulaw_round_trips_every_code():
+    codes = np.array([code for code in range(256) if code != 0x7F], dtype=np.uint8)
+    decoded = audio_codec.decode(codes.tobytes(), "audio/x-mulaw")
+    assert audio_codec.encode(decoded, "audio/x-mulaw") == codes.tobytes()
+    # Negative zero is encoded as positive zero
+    assert audio_codec.encode(audio_codec.decode(b"\x7f", "audio/x-mulaw"), "audio/x-mulaw") == b"\xff"
+
+def test_alaw_round_trips_every_code():
+    codes = np.arange(256, dtype=np.uint8).tobytes()
+    assert audio_codec.encode(audio_codec.decode(codes, "audio/x-alaw"), "audio/x-alaw") == codes
+
+def test_encode_tables_cover_every_sample():
+    assert MULAW_ENCODE.shape == ALAW_ENCODE.shape == (65536,)
+
+def test_l16_decode_drops_a_trailing_odd_byte():
+    samples = audio_codec.decode(pcm(1, -2).tobytes() + b"\x07", "audio/x-l16")
+    assert samples.tolist() == [1, -2]
+    assert audio_codec.decode(b"\x07", "audio/x-l16").size == 0
+
+def test_upsample_interpolates_between_neighbours():
+    assert audio_codec.upsample_2x(pcm(0, 100, -100)).tolist() == [0, 50, 100, 0, -100, -100]
+    assert audio_codec.upsample_2x(pcm()).size == 0
+
+def test_upsample_does_not_overflow_at_full_scale():
+    assert audio_codec.upsample_2x(pcm(32767, 32767)).tolist() == [32767] * 4
+
+def test_downsample_averages_pairs_and_ignores_an_odd_sample():
+    assert audio_codec.downsample_2x(pcm(10, 20, -30, -50, 7)).tolist() == [15, -40]
+
+def test_resample_rejects_unsupported_ratios():
+    with pytest.raises(ValueError):
+        audio_codec.resample(pcm(1, 2, 3), 8000, 48000)
+
+def test_parse_content_type_normalizes_and_rejects_unknown_types():
+    assert audio_codec.parse_content_type("Audio/X-Mulaw; rate=8000") == ("audio/x-mulaw", 8000)
+    with pytest.raises(ValueError):
+        audio_codec.parse_content_type("audio/x-opus;rate=48000")
+
+@pytest.mark.parametrize("narrowband", [MULAW_8K, ALAW_8K, L16_8K])
+def test_transcoding_through_narrowband_keeps_a_low_tone(narrowband):
+    t = np.arange(320)
+    tone = (8000 * np.sin(2 * np.pi * 200 * t / 16000)).astype(np.int16)
+    narrow = audio_codec.transcode(tone.tobytes(), L16_16K, narrowband)
+    assert len(narrow) == 160 * (2 if narrowband == L16_8K else 1)
+
+    back = np.frombuffer(audio_codec.transcode(narrow, narrowband, L16_16K), dtype=np.int16)
+    assert back.shape == tone.shape
+    assert np.max(np.abs(back.astype(np.int32) - tone)) < 600
+
+def test_matching_content_types_pass_payloads_through():
+    payload = b"\x01\x02\x03"
+    assert audio_codec.transcode(payload, L16_16K, "audio/x-l16; rate=16000") is payload
+
+def test_stream_transcoder_forwards_malformed_caller_frames():
+    transcoder = StreamTranscoder(L16_8K)
+    assert json.loads(transcoder.caller_event({"event": "media"})) == {"event": "media"}
+    assert json.loads(transcoder.caller_event({"event": "media", "media": {}})) == {"event": "media", "media": {}}
+
+def test_stream_transcoder_handles_odd_length_caller_frames():
+    transcoder = StreamTranscoder(L16_8K)
+    odd = base64.b64encode(pcm(100, 200).tobytes() + b"\x01").decode("ascii")
+    event = json.loads(transcoder.caller_event({"event": "media", "media": {"payload": odd}}))
+    assert np.frombuffer(base64.b64decode(event["media"]["payload"]), dtype=np.int16).tolist() == [100, 150, 200, 200]
@@ -0,0 +1,127 @@
+import time
+
+import pytest
+
+from app.services.call_registry import CallRegistry, ID_FIELDS
+
+IDS = {
+    "request_uuid": "req-1",
+    "call_uuid": "plivo-1",
+    "ultravox_call_id": "uv-1",
+    "join_url": "wss://ultravox.example/join/1"
+}
+
+def prune(registry):
+    registry._last_prune = 0.0
+    registry._prune()
+
+@pytest.fixture
+def registry():
+    return CallRegistry(db_path="", ttl=60, max_age=3600)
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "calls.db")
+
+@pytest.mark.parametrize("name", ID_FIELDS)
+def test_finds_a_call_by_each_id(registry, name):
+    record = registry.register(to_number="+15550100", **IDS)
+    assert registry.get(IDS[name]) is record
+    assert registry.get("unknown") is None
+
+def test_ids_registered_later_are_merged_into_one_record(registry):
+    record = registry.register(request_uuid="req-1", to_number="+15550100")
+    assert registry.register(request_uuid="req-1", ultravox_call_id="uv-1", join_url="wss://join/1") is record
+
+    assert registry.update(status="ringing", join_url="wss://join/1", call_uuid="plivo-1") is record
+    assert registry.get("plivo-1") is record
+    assert record.to_dict() | {"created_at": None, "updated_at": None} == {
+        "request_uuid": "req-1", "call_uuid": "plivo-1", "ultravox_call_id": "uv-1",
+        "join_url": "wss://join/1", "to_number": "+15550100", "status": "ringing",
+        "end_reason": None, "created_at": None, "updated_at": None, "ended_at": None
+    }
+
+def test_update_keeps_fields_it_is_not_given(registry):
+    record = registry.register(**IDS)
+    registry.update(status="completed", end_reason="hangup", call_uuid="plivo-1")
+    registry.update(status="completed", ultravox_call_id="uv-1")
+    assert record.end_reason == "hangup"
+    assert record.call_uuid == "plivo-1"
+
+def test_update_of_an_unknown_call_returns_none(registry):
+    assert registry.update(status="completed", call_uuid="nobody") is None
+
+def test_final_status_ends_the_call_once(registry):
+    record = registry.register(**IDS)
+    assert registry.stats()["active"] == 1
+
+    registry.update(status="completed", call_uuid="plivo-1")
+    ended_at = record.ended_at
+    registry.update(status="ended", ultravox_call_id="uv-1")
+    assert record.ended_at == ended_at
+    assert registry.stats()["active"] == 0
+    assert registry.stats()["finished"] == 1
+
+def test_finished_calls_are_evicted_after_the_ttl(registry):
+    record = registry.register(**IDS)
+    registry.update(status="completed", request_uuid="req-1")
+    record.ended_at -= 61
+    registry._ended[0] = (record.ended_at, record)
+
+    prune(registry)
+    assert registry.get("req-1") is None
+    assert registry.stats()["evicted"] == 1
+
+def test_stale_unfinished_calls_are_evicted_after_the_max_age(registry):
+    registry.register(request_uuid="stale", created_at=time.time() - 3601)
+    registry.register(request_uuid="fresh")
+
+    prune(registry)
+    assert registry.get("stale") is None
+    assert registry.get("fresh") is not None
+    assert registry.stats()["active"] == 1
+
+def test_persisted_calls_survive_a_restart(db_path):
+    first = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    first.register(to_number="+15550100", **IDS)
+    first.update(status="in-progress", call_uuid="plivo-1")
+
+    second = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    for value in IDS.values():
+        record = second.get(value)
+        assert record.request_uuid == "req-1"
+        assert record.status == "in-progress"
+        assert record.to_number == "+15550100"
+
+def test_updates_reach_calls_loaded_from_the_database(db_path):
+    CallRegistry(db_path=db_path, ttl=60, max_age=3600).register(**IDS)
+
+    second = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    record = second.update(status="completed", end_reason="hangup", ultravox_call_id="uv-1")
+    assert record.request_uuid == "req-1"
+    assert second.stats()["active"] == 0
+
+    third = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    assert third.get("plivo-1").to_dict() == record.to_dict()
+
+def test_adopted_calls_are_kept_in_time_order(db_path):
+    now = time.time()
+    first = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    first.register(request_uuid="old-finished", created_at=now - 500, ended_at=now - 400)
+    first.register(request_uuid="old-stale", created_at=now - 4000)
+
+    second = CallRegistry(db_path=db_path, ttl=60, max_age=3600)
+    second.register(request_uuid="new")
+    second.update(status="completed", request_uuid="new")
+    second.update(status="completed", request_uuid="old-finished")
+    second.update(status="ringing", request_uuid="old-stale")
+
+    assert [record.request_uuid for record in second._created] == ["old-stale", "old-finished", "new"]
+    assert [record.request_uuid for _, record in second._ended] == ["old-finished", "new"]
+
+    # Both reloaded calls are past their limits and go on the next prune, ahead of the newer call
+    prune(second)
+    assert [record.request_uuid for record in second._created] == ["new"]
+    assert [record.request_uuid for _, record in second._ended] == ["new"]
+    assert second.stats()["active"] == 0
+    assert second.get("new") is not None
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import services
+from app.api.services import InitiationRequest, handle_initiate_call
+from app.services import idempotency as idempotency_module
+from app.services.idempotency import IdempotencyConflict, IdempotencyStore, request_fingerprint
+
+OK = ({"message": "Call initiated successfully"}, 200)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(idempotency_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(key_ttl=60, window=5, max_entries=100)
+
+def test_key_for_prefers_the_client_key(store):
+    assert store.key_for("abc", "f1") == ("key:abc", 60)
+    assert store.key_for(None, "f1") == ("auto:f1", 5)
+    assert IdempotencyStore(key_ttl=60, window=0, max_entries=100).key_for(None, "f1") == (None, 0.0)
+
+def test_fingerprint_ignores_parameter_order():
+    assert request_fingerprint(a=1, b={"x": 1, "y": 2}) == request_fingerprint(b={"y": 2, "x": 1}, a=1)
+    assert request_fingerprint(a=1) != request_fingerprint(a=2)
+
+def test_concurrent_claims_have_one_owner(store):
+    barrier = threading.Barrier(8)
+    claims = []
+
+    def claim():
+        barrier.wait()
+        claims.append(store.claim("key:k", "f1", 60))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    owners = [future for owner, future in claims if owner]
+    assert len(owners) == 1
+    assert all(future is owners[0] for _, future in claims)
+    assert not owners[0].done()
+
+    store.resolve("key:k", owners[0], OK, keep=True)
+    assert all(future.result() == OK for _, future in claims)
+    assert store.stats()["started"] == 1
+    assert store.stats()["coalesced"] == 7
+
+def test_a_different_fingerprint_under_the_same_key_conflicts(store):
+    owner, future = store.claim("key:k", "f1", 60)
+    with pytest.raises(IdempotencyConflict):
+        store.claim("key:k", "f2", 60)
+
+    store.resolve("key:k", future, OK, keep=True)
+    with pytest.raises(IdempotencyConflict):
+        store.claim("key:k", "f2", 60)
+    assert store.stats()["conflicts"] == 2
+
+def test_kept_responses_are_replayed(store):
+    _, future = store.claim("key:k", "f1", 60)
+    store.resolve("key:k", future, OK, keep=True)
+
+    owner, replay = store.claim("key:k", "f1", 60)
+    assert not owner
+    assert replay.result() == OK
+    assert store.stats()["replayed"] == 1
+
+def test_responses_that_are_not_kept_let_a_retry_run(store):
+    _, future = store.claim("key:k", "f1", 60)
+    owner, waiter = store.claim("key:k", "f1", 60)
+    store.resolve("key:k", future, ({"error": "boom"}, 500), keep=False)
+
+    assert not owner
+    assert waiter.result() == ({"error": "boom"}, 500)
+    owner, retry = store.claim("key:k", "f1", 60)
+    assert owner
+    assert retry is not future
+
+def test_kept_responses_expire_after_their_ttl(store, clock):
+    _, future = store.claim("auto:f1", "f1", 5)
+    store.resolve("auto:f1", future, OK, keep=True)
+
+    clock.now += 4.9
+    assert store.claim("auto:f1", "f1", 5)[0] is False
+    clock.now += 0.1
+    assert store.claim("auto:f1", "f1", 5)[0] is True
+
+def test_in_flight_claims_never_expire(store, clock):
+    _, future = store.claim("key:k", "f1", 60)
+    clock.now += 3600
+    owner, waiter = store.claim("key:k", "f1", 60)
+    assert not owner
+    assert waiter is future
+
+def test_expired_entries_are_pruned(store, clock):
+    for n in range(3):
+        key = f"auto:{n}"
+        _, future = store.claim(key, str(n), 5)
+        store.resolve(key, future, OK, keep=True)
+    store.claim("key:in-flight", "f1", 60)
+
+    clock.now += 10
+    store.claim("key:other", "f1", 60)
+    assert store.stats()["entries"] == 2
+    assert store.stats()["in_flight"] == 2
+
+def test_full_store_drops_the_oldest_responses_but_not_in_flight_claims(clock):
+    store = IdempotencyStore(key_ttl=60, window=5, max_entries=3)
+    store.claim("key:in-flight", "f", 60)
+    for n in range(2):
+        _, future = store.claim(f"key:{n}", "f", 60)
+        store.resolve(f"key:{n}", future, OK, keep=True)
+
+    store.claim("key:new", "f", 60)
+    assert store.claim("key:in-flight", "f", 60)[0] is False
+    assert store.claim("key:0", "f", 60)[0] is True
+
+@pytest.fixture
+def initiations(monkeypatch):
+    """Replace the initiation pipeline with a gated fake that records its calls."""
+    monkeypatch.setattr(services, "idempotency", IdempotencyStore(key_ttl=60, window=5, max_entries=100))
+    fake = SimpleNamespace(calls=0, responses=[], gate=None)
+
+    async def initiate(params, start_time):
+        fake.calls += 1
+        if fake.gate is not None:
+            await fake.gate.wait()
+        return fake.responses.pop(0) if fake.responses else OK
+
+    monkeypatch.setattr(services, "_initiate", initiate)
+    return fake
+
+def request(client_key="k1", to_number="+15550100"):
+    return InitiationRequest({"to_number": to_number}, client_key=client_key)
+
+def test_concurrent_initiations_with_one_key_dial_once(initiations):
+    async def run():
+        initiations.gate = asyncio.Event()
+        first = asyncio.create_task(handle_initiate_call(request(), 0.0))
+        second = asyncio.create_task(handle_initiate_call(request(), 0.0))
+        await asyncio.sleep(0)
+        initiations.gate.set()
+        return await first, await second
+
+    first, second = asyncio.run(run())
+    assert initiations.calls == 1
+    assert first == OK
+    assert second == (OK[0], 200, {"Idempotent-Replayed": "true"})
+
+def test_initiation_with_a_reused_key_and_other_parameters_is_rejected(initiations):
+    async def run():
+        await handle_initiate_call(request(), 0.0)
+        return await handle_initiate_call(request(to_number="+15550199"), 0.0)
+
+    body, status = asyncio.run(run())
+    assert status == 422
+    assert "different parameters" in body["error"]
+    assert initiations.calls == 1
+
+@pytest.mark.parametrize("failure", [
+    ({"error": "No target phone number provided (TO_NUMBER)"}, 400),
+    ({"error": "Queue full"}, 503),
+    ({"error": "boom"}, 500),
+])
+def test_failed_initiations_are_not_replayed(initiations, failure):
+    initiations.responses = [failure]
+
+    async def run():
+        return await handle_initiate_call(request(), 0.0), await handle_initiate_call(request(), 0.0)
+
+    first, second = asyncio.run(run())
+    assert first == failure
+    assert second == OK
+    assert initiations.calls == 2
+
+def test_successful_initiations_are_replayed(initiations):
+    async def run():
+        return await handle_initiate_call(request(), 0.0), await handle_initiate_call(request(), 0.0)
+
+    first, second = asyncio.run(run())
+    assert initiations.calls == 1
+    assert second == (OK[0], 200, {"Idempotent-Replayed": "true"})
+
+def test_waiters_give_up_without_cancelling_the_owner(initiations, monkeypatch):
+    monkeypatch.setattr(services.settings, "IDEMPOTENCY_WAIT_TIMEOUT", 0.01)
+
+    async def run():
+        initiations.gate = asyncio.Event()
+        first = asyncio.create_task(handle_initiate_call(request(), 0.0))
+        await asyncio.sleep(0)
+        second = await handle_initiate_call(request(), 0.0)
+        initiations.gate.set()
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first == OK
+    assert second == services.IDEMPOTENCY_PENDING
@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+from app.core.config import DEFAULT_RESPONSE_TEMPLATES
+from app.services.intent_router import IntentRouter, check_intents, check_templates, compile_intents
+
+@pytest.fixture(autouse=True)
+def no_env_templates(monkeypatch):
+    monkeypatch.delenv("RESPONSE_TEMPLATES", raising=False)
+
+def write_json(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    # Make every write visible to the mtime check, however fast the test runs
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def make_router(path=None, **data):
+    if data:
+        write_json(path, data)
+    return IntentRouter(templates_file=str(path) if path else "", reload_interval=0)
+
+def test_routes_each_default_intent():
+    router = make_router()
+    assert router.route("Hello there") == ("greeting", DEFAULT_RESPONSE_TEMPLATES["greeting"])
+    assert router.route("how is the WEATHER") == ("weather", DEFAULT_RESPONSE_TEMPLATES["weather"])
+    assert router.route("what is your name") == ("name", DEFAULT_RESPONSE_TEMPLATES["name"])
+    assert router.route("ok, see you") == ("goodbye", DEFAULT_RESPONSE_TEMPLATES["goodbye"])
+
+def test_unmatched_text_uses_the_default_template():
+    assert make_router().route("book a table") == ("default", "I heard you say: book a table. How can I help with that?")
+
+def test_higher_priority_intent_wins_wherever_it_appears():
+    router = make_router()
+    assert router.route("weather first, then hello")[0] == "greeting"
+    assert router.route("goodbye, what is your name")[0] == "name"
+
+def test_overlapping_keywords_follow_intent_order(tmp_path):
+    path = tmp_path / "templates.json"
+    first = make_router(path, templates={"long": "L", "short": "S"}, intents={"long": ["see you"], "short": ["see"]})
+    assert first.route("see you soon") == ("long", "L")
+
+    second = make_router(path, templates={"long": "L", "short": "S"}, intents={"short": ["see"], "long": ["see you"]})
+    assert second.route("see you soon") == ("short", "S")
+
+def test_longer_keyword_of_one_intent_is_not_shadowed_by_its_prefix():
+    pattern = compile_intents({"goodbye": ["bye", "goodbye"]})
+    assert [m.group(1) for m in pattern.finditer("goodbye")] == ["goodbye"]
+
+def test_keywords_match_whole_words_only():
+    router = make_router()
+    assert router.route("this is something")[0] == "default"
+    assert router.route("the nameless one")[0] == "default"
+    assert router.route("hi!")[0] == "greeting"
+    assert router.route("(hey) you")[0] == "greeting"
+    assert router.route("names")[0] == "default"
+
+def test_intent_without_keywords_keeps_later_intents_aligned(tmp_path):
+    router = make_router(tmp_path / "templates.json", templates={"empty": "E", "weather": "W"},
+                         intents={"empty": [], "weather": ["weather"]})
+    assert router.route("the weather") == ("weather", "W")
+
+def test_intent_without_template_falls_back_to_default_text(tmp_path):
+    router = make_router(tmp_path / "templates.json", templates={}, intents={"billing": ["invoice"]})
+    assert router.route("my invoice") == ("billing", "I heard you say: my invoice. How can I help with that?")
+
+def test_reloads_when_the_environment_changes(monkeypatch):
+    router = make_router()
+    reloads = router.reloads
+    monkeypatch.setenv("RESPONSE_TEMPLATES", json.dumps({"greeting": "Hi from env"}))
+    assert router.route("hello") == ("greeting", "Hi from env")
+    assert router.reloads == reloads + 1
+    assert router.reload() is False
+
+def test_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / "templates.json"
+    router = make_router(path, greeting="Version one")
+    assert router.route("hello") == ("greeting", "Version one")
+
+    write_json(path, {"greeting": "Version two"})
+    assert router.route("hello") == ("greeting", "Version two")
+
+def test_reload_is_throttled_by_the_interval(tmp_path):
+    path = tmp_path / "templates.json"
+    write_json(path, {"greeting": "Version one"})
+    router = IntentRouter(templates_file=str(path), reload_interval=3600)
+
+    write_json(path, {"greeting": "Version two"})
+    assert router.route("hello") == ("greeting", "Version one")
+    assert router.reload(force=True) is True
+    assert router.route("hello") == ("greeting", "Version two")
+
+def test_file_intents_replace_the_defaults(tmp_path):
+    router = make_router(tmp_path / "templates.json", templates={"help": "Help is on the way"},
+                         intents={"help": ["help"]})
+    assert router.route("help me") == ("help", "Help is on the way")
+    assert router.route("hello")[0] == "default"
+
+@pytest.mark.parametrize("data", [
+    ["not", "an", "object"],
+    {"greeting": 3},
+    {"default": "Hi {name}"},
+    {"default": "Unclosed {"},
+    {"default": "Positional {}"},
+    {"templates": {"a": "A"}, "intents": "a"},
+    {"templates": {"a": "A"}, "intents": {"a": "hello"}},
+    {"templates": {"a": "A"}, "intents": {"a": ["hello", 3]}},
+])
+def test_bad_sources_are_rejected_and_previous_templates_kept(tmp_path, data):
+    path = tmp_path / "templates.json"
+    router = make_router(path, greeting="Good version")
+
+    write_json(path, data)
+    assert router.reload() is False
+    assert router.route("hello") == ("greeting", "Good version")
+
+def test_bad_environment_templates_are_rejected(monkeypatch):
+    monkeypatch.setenv("RESPONSE_TEMPLATES", json.dumps({"default": "{missing}"}))
+    router = make_router()
+    assert router.reloads == 0
+    assert router.route("anything")[0] == "default"
+
+def test_escaped_braces_are_allowed():
+    assert check_templates({"default": "{{literal}} {text}"}, "test") == {"default": "{{literal}} {text}"}
+
+def test_checks_name_the_offending_entry():
+    with pytest.raises(ValueError, match="'greeting'"):
+        check_templates({"greeting": "{who}"}, "test")
+    with pytest.raises(ValueError, match="'weather'"):
+        check_intents({"weather": "sunny"}, "test")
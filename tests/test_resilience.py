@@ -0,0 +1,248 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import httpx # type: ignore
+import pytest
+
+from app.utils import resilience
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, Upstream, classify, parse_retry_after
+
+class Clock:
+    """Stands in for the time module, so waits advance instantly."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://upstream.example/calls")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+def make_upstream(attempts=3, threshold=5, deadline=30.0):
+    breaker = CircuitBreaker("test", failure_threshold=threshold, reset_timeout=10.0)
+    return Upstream("test", deadline=deadline, timeout=5.0, attempts=attempts,
+                    base_delay=0.5, max_delay=4.0, breaker=breaker)
+
+class Flaky:
+    """An operation that raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def __call__(self, timeout):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10.0)
+    for _ in range(2):
+        assert breaker.before_call() is False
+        breaker.record_failure()
+    breaker.record_success()
+    assert breaker.consecutive_failures == 0
+
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 10.0
+    assert breaker.to_dict()["rejected"] == 1
+
+def open_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout(clock):
+    breaker = open_breaker()
+    clock.now += 9.9
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 0.1
+    assert breaker.before_call() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.before_call() is False
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10.0)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+    assert breaker.to_dict()["retry_in"] == 10.0
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_abandoned_probe_frees_the_probe_slot(clock):
+    breaker = open_breaker()
+    clock.now += 10
+    assert breaker.before_call() is True
+    breaker.abandon()
+    assert breaker.before_call() is True
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120.0),
+    ("1.5", 1.5),
+    ("-3", 0.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+def test_parse_retry_after_http_date(clock):
+    date = format_datetime(datetime.fromtimestamp(clock.now + 30, timezone.utc), usegmt=True)
+    assert parse_retry_after(date) == pytest.approx(30.0)
+
+def test_parse_retry_after_http_date_in_the_past(clock):
+    date = format_datetime(datetime.fromtimestamp(clock.now - 30, timezone.utc), usegmt=True)
+    assert parse_retry_after(date) == 0.0
+
+@pytest.mark.parametrize("status, idempotent, expected", [
+    (429, False, (True, True, None)),
+    (503, False, (True, True, None)),
+    (502, False, (True, False, None)),
+    (504, False, (True, False, None)),
+    (502, True, (True, True, None)),
+    (504, True, (True, True, None)),
+    (500, True, (True, False, None)),
+    (404, True, (False, False, None)),
+])
+def test_classify_statuses(status, idempotent, expected):
+    assert classify(status_error(status), idempotent) == expected
+
+def test_classify_transport_errors():
+    request = httpx.Request("POST", "https://upstream.example/calls")
+    assert classify(httpx.ConnectError("refused", request=request)) == (True, True, None)
+    assert classify(httpx.ReadTimeout("slow", request=request)) == (True, False, None)
+    assert classify(ValueError("bad payload")) == (False, False, None)
+
+def test_classify_reads_retry_after():
+    assert classify(status_error(429, {"Retry-After": "7"})) == (True, True, 7.0)
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_gateway_errors_are_retried_only_when_idempotent(clock, status):
+    upstream = make_upstream()
+    creation = Flaky(status_error(status))
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.call(creation)
+    assert creation.attempts == 1
+
+    lookup = Flaky(status_error(status))
+    assert upstream.call(lookup, idempotent=True) == "ok"
+    assert lookup.attempts == 2
+    assert upstream.retries == 1
+
+def test_rejected_requests_are_retried_even_when_not_idempotent(clock):
+    upstream = make_upstream()
+    operation = Flaky(status_error(429), status_error(503))
+    assert upstream.call(operation) == "ok"
+    assert operation.attempts == 3
+
+def test_retry_waits_at_least_retry_after(clock):
+    upstream = make_upstream()
+    assert upstream.call(Flaky(status_error(429, {"Retry-After": "3"}))) == "ok"
+    assert 3.0 <= clock.sleeps[0] <= 3.5
+
+def test_retries_stop_at_the_attempt_limit(clock):
+    upstream = make_upstream(attempts=2)
+    operation = Flaky(*[status_error(503)] * 3)
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.call(operation)
+    assert operation.attempts == 2
+
+def test_retries_stop_before_passing_the_deadline(clock):
+    upstream = make_upstream(deadline=2.0)
+    operation = Flaky(status_error(429, {"Retry-After": "5"}))
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.call(operation)
+    assert operation.attempts == 1
+    assert upstream.deadline_exceeded == 1
+
+def test_client_errors_are_not_retried_and_do_not_trip_the_breaker(clock):
+    upstream = make_upstream(threshold=1)
+    operation = Flaky(status_error(400))
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.call(operation)
+    assert operation.attempts == 1
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+def test_open_breaker_fails_calls_without_contacting_the_upstream(clock):
+    upstream = make_upstream(attempts=1, threshold=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.call(Flaky(status_error(503)))
+
+    operation = Flaky()
+    with pytest.raises(CircuitOpenError):
+        upstream.call(operation)
+    assert operation.attempts == 0
+
+def test_async_calls_follow_the_same_policy():
+    upstream = Upstream("test", deadline=30.0, timeout=5.0, attempts=3, base_delay=0.001, max_delay=0.01,
+                        breaker=CircuitBreaker("test", failure_threshold=5, reset_timeout=10.0))
+    creation, lookup = Flaky(status_error(502)), Flaky(status_error(502))
+
+    async def run(operation, idempotent):
+        async def attempt(timeout):
+            return operation(timeout)
+        return await upstream.call_async(attempt, idempotent=idempotent)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run(creation, False))
+    assert asyncio.run(run(lookup, True)) == "ok"
+    assert (creation.attempts, lookup.attempts) == (1, 2)
+
+def test_cancelled_probe_releases_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    upstream = Upstream("test", deadline=30.0, timeout=5.0, attempts=1, base_delay=0.001, max_delay=0.01,
+                        breaker=breaker)
+
+    async def run():
+        task = asyncio.create_task(upstream.call_async(lambda timeout: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.before_call() is True